@@ -0,0 +1,88 @@
+# app/api/admin_api.py
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, List
+
+from ..auth import User, get_current_admin_user
+from ..db.instrumentation import query_stats, read_stats_snapshot, MONITOR_DB_STATS_FILE
+from ..db import settings_db
+from ..core.request_metrics import route_stats
+from ..core.profiler import request_profiler, MONITOR_PROFILE_FILE
+
+router = APIRouter()
+
+# --- Diagnóstico SQL ---
+@router.get("/admin/db/statements")
+def api_get_top_statements(
+    limit: int = Query(20, ge=1, le=500),
+    current_user: User = Depends(get_current_admin_user)
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Sentencias SQL ordenadas por tiempo total, por proceso: las de la API
+    (en vivo) y las del monitor (último volcado, cada 30 s).
+    """
+    monitor_snapshot = read_stats_snapshot(MONITOR_DB_STATS_FILE) or {}
+    return {
+        "api": query_stats.top(limit),
+        "monitor": monitor_snapshot.get("statements", [])[:limit],
+    }
+
+@router.get("/admin/db/slow-queries")
+def api_get_slow_queries(current_user: User = Depends(get_current_admin_user)) -> Dict[str, List[Dict[str, Any]]]:
+    """Consultas que superaron 'slow_query_ms', con su EXPLAIN QUERY PLAN, por proceso."""
+    monitor_snapshot = read_stats_snapshot(MONITOR_DB_STATS_FILE) or {}
+    return {
+        "api": query_stats.slow_queries(),
+        "monitor": monitor_snapshot.get("slow_queries", []),
+    }
+
+@router.delete("/admin/db/statements", status_code=status.HTTP_204_NO_CONTENT)
+def api_reset_statement_stats(current_user: User = Depends(get_current_admin_user)):
+    """Reinicia las estadísticas SQL del proceso de la API."""
+    query_stats.reset()
+
+# --- Latencia de la API y perfilado ---
+@router.get("/admin/requests")
+def api_get_request_stats(current_user: User = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """Percentiles de latencia (últimas 2048 peticiones), tamaños y errores por ruta."""
+    return {"in_flight": route_stats.in_flight, "routes": route_stats.summary()}
+
+@router.post("/admin/profile/requests", status_code=status.HTTP_202_ACCEPTED)
+def api_arm_request_profiler(
+    count: int = Query(10, ge=1, le=1000),
+    current_user: User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """Arma el perfilador de muestreo para las próximas `count` peticiones."""
+    request_profiler.arm(count)
+    return request_profiler.status()
+
+@router.get("/admin/profile/requests")
+def api_get_request_profile(
+    format: str = Query("json", pattern="^(json|folded)$"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Estado de la sesión de perfilado. Con format=folded devuelve las pilas en
+    formato 'collapsed' (flamegraph.pl, speedscope) cuando la sesión terminó.
+    """
+    if format == "folded":
+        folded = request_profiler.result()
+        if folded is None:
+            raise HTTPException(status_code=404, detail="No hay un perfil terminado.")
+        return PlainTextResponse(folded)
+    return request_profiler.status()
+
+@router.post("/admin/profile/monitor", status_code=status.HTTP_202_ACCEPTED)
+def api_request_monitor_profile(current_user: User = Depends(get_current_admin_user)) -> Dict[str, str]:
+    """Pide al monitor que perfile su próximo ciclo completo."""
+    settings_db.update_settings({"profile_monitor_cycle": "1"})
+    return {"status": "El próximo ciclo del monitor se perfilará."}
+
+@router.get("/admin/profile/monitor", response_class=PlainTextResponse)
+def api_get_monitor_profile(current_user: User = Depends(get_current_admin_user)):
+    """Último perfil de ciclo del monitor en formato 'collapsed'."""
+    if not os.path.exists(MONITOR_PROFILE_FILE):
+        raise HTTPException(status_code=404, detail="El monitor aún no ha generado un perfil.")
+    with open(MONITOR_PROFILE_FILE, "r", encoding="utf-8") as f:
+        return PlainTextResponse(f.read())
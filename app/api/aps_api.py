@@ -1,17 +1,38 @@
 # app/api/aps_api.py
 import sqlite3
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional, Dict, Any
+import time
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 
 from ..auth import User, get_current_active_user
 from ..core.ap_client import UbiquitiClient
+from ..core.airos_parser import StatusSnapshot, parse_status
+from ..core.live_cache import LiveDataCache
+from ..core.limiter import device_limiter, DeviceBusyError
 from ..db import aps_db, settings_db, stats_db
 from ..db.base import get_stats_db_connection
+from .etag import check_not_modified
 
 router = APIRouter()
 
+# Caché compartida por todas las peticiones de /aps/{host}/live de este proceso
+live_cache = LiveDataCache()
+
+# Límite global de lecturas en vivo simultáneas para POST /aps/live.
+# Usa su propio pool para no ocupar los hilos de los endpoints síncronos.
+LIVE_BATCH_MAX_CONCURRENCY = 32
+_live_batch_executor = ThreadPoolExecutor(max_workers=LIVE_BATCH_MAX_CONCURRENCY, thread_name_prefix="LiveBatch")
+
+# Segundos que una lectura en vivo espera su turno si el AP está ocupado (p. ej. por el monitor)
+DEVICE_WAIT_TIMEOUT = 30
+
 # --- Modelos Pydantic (Completos) ---
 class AP(BaseModel):
     host: str
@@ -82,6 +103,11 @@ class CPEDetail(BaseModel):
 class APLiveDetail(AP):
     clients: List[CPEDetail]
 
+class APLiveBatchRequest(BaseModel):
+    hosts: List[str] = []
+    zona_id: Optional[int] = None
+    max_age: Optional[int] = Field(None, ge=0)
+
 class HistoryDataPoint(BaseModel):
     timestamp: datetime
     client_count: Optional[int] = None
@@ -118,7 +144,12 @@ def create_ap(ap: APCreate, current_user: User = Depends(get_current_active_user
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/aps", response_model=List[AP])
-def get_all_aps(current_user: User = Depends(get_current_active_user)):
+def get_all_aps(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
+    # El mes forma parte del ETag porque la consulta lee el archivo stats_YYYY_MM del mes actual
+    stats_month = datetime.utcnow().strftime('%Y_%m')
+    not_modified = check_not_modified(request, response, "aps", "zonas", "ap_stats", extra=stats_month)
+    if not_modified:
+        return not_modified
     return aps_db.get_all_aps_with_stats()
 
 @router.get("/aps/{host}", response_model=AP)
@@ -155,78 +186,124 @@ def get_cpes_for_ap(host: str, current_user: User = Depends(get_current_active_u
     """Obtiene los CPEs conectados a un AP específico desde el último snapshot guardado."""
     return stats_db.get_cpes_for_ap_from_stats(host)
 
+def _build_live_detail(host: str, username: str, snapshot: StatusSnapshot) -> APLiveDetail:
+    """Convierte el status.cgi parseado en el modelo APLiveDetail."""
+    # Los campos de los registros se llaman como los del modelo; los sobrantes se ignoran
+    return APLiveDetail(
+        host=host,
+        username=username,
+        is_enabled=True,
+        last_status='online',
+        **snapshot.ap._asdict(),
+        clients=[CPEDetail(**sta._asdict()) for sta in snapshot.stations]
+    )
+
+def _live_detail_from_last_poll(host: str, max_age: int) -> Tuple[Optional[APLiveDetail], Optional[float]]:
+    """
+    Reconstruye la vista 'en vivo' a partir del último sondeo guardado por el
+    monitor, si es más reciente que 'max_age' segundos.
+    """
+    ap_info = aps_db.get_ap_by_host_with_stats(host)
+    if not ap_info or ap_info.get('last_status') != 'online' or not ap_info.get('last_seen'):
+        return None, None
+
+    last_seen = datetime.fromisoformat(str(ap_info['last_seen']))
+    age = (datetime.utcnow() - last_seen).total_seconds()
+    if age > max_age:
+        return None, None
+
+    # Solo los CPEs del último snapshot (todos comparten el mismo timestamp)
+    cpes = stats_db.get_cpes_for_ap_from_stats(host)
+    latest_ts = max((cpe['timestamp'] for cpe in cpes), default=None)
+    clients = [cpe for cpe in cpes if cpe['timestamp'] == latest_ts]
+
+    detail = APLiveDetail(**{**ap_info, "clients": clients})
+    return detail, time.time() - age
+
+def _get_live_cache_ttl() -> int:
+    ttl_str = settings_db.get_setting('live_cache_ttl')
+    return int(ttl_str) if ttl_str and ttl_str.isdigit() else 10
+
+def _get_live_detail(host: str, credentials: Dict[str, Any], max_age: int) -> Optional[APLiveDetail]:
+    """Lectura en vivo de un AP a través de la caché compartida."""
+    def fetch() -> Tuple[Optional[APLiveDetail], Optional[float]]:
+        if max_age > 0:
+            detail, fetched_at = _live_detail_from_last_poll(host, max_age)
+            if detail:
+                return detail, fetched_at
+
+        client = UbiquitiClient(host=host, username=credentials['username'], password=credentials['password'])
+        # Turno del AP compartido con el monitor (una sola petición a la vez por equipo)
+        with device_limiter.acquire(host, credentials.get('zona_id'), timeout=DEVICE_WAIT_TIMEOUT):
+            raw_status = client.get_status_raw()
+        if not raw_status:
+            return None, None
+        try:
+            snapshot = parse_status(raw_status)
+        except ValueError:
+            return None, None
+        return _build_live_detail(host, credentials['username'], snapshot), None
+
+    # Peticiones concurrentes para el mismo host comparten una sola lectura
+    return live_cache.get(host, max_age, fetch)
+
+def _live_batch_item(host: str, max_age: int) -> Dict[str, Any]:
+    """Procesa un AP del lote y devuelve la línea NDJSON correspondiente (como dict)."""
+    try:
+        credentials = aps_db.get_ap_credentials(host)
+        if not credentials:
+            return {"host": host, "status": "error", "detail": "AP no encontrado en el inventario."}
+        live_detail = _get_live_detail(host, credentials, max_age)
+        if not live_detail:
+            return {"host": host, "status": "error", "detail": "No se pudo obtener datos del AP. Puede estar offline."}
+        return {"host": host, "status": "ok", "data": live_detail.model_dump(mode="json")}
+    except Exception as e:
+        return {"host": host, "status": "error", "detail": str(e)}
+
+@router.post("/aps/live")
+async def get_aps_live_batch(batch: APLiveBatchRequest, current_user: User = Depends(get_current_active_user)):
+    """
+    Obtiene datos en vivo de varios APs (lista de hosts y/o una zona) en paralelo.
+    Devuelve NDJSON: una línea por AP en el orden en que van respondiendo.
+    """
+    hosts = list(dict.fromkeys(batch.hosts))
+    if batch.zona_id is not None:
+        zona_hosts = await run_in_threadpool(aps_db.get_ap_hosts_by_zona, batch.zona_id)
+        hosts.extend(h for h in zona_hosts if h not in hosts)
+    if not hosts:
+        raise HTTPException(status_code=400, detail="No se proporcionaron hosts o la zona no tiene APs activos.")
+
+    max_age = batch.max_age if batch.max_age is not None else await run_in_threadpool(_get_live_cache_ttl)
+
+    async def stream_results():
+        loop = asyncio.get_running_loop()
+        pending = [loop.run_in_executor(_live_batch_executor, _live_batch_item, host, max_age) for host in hosts]
+        for next_done in asyncio.as_completed(pending):
+            item = await next_done
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @router.get("/aps/{host}/live", response_model=APLiveDetail)
-def get_ap_live_data(host: str, current_user: User = Depends(get_current_active_user)):
+def get_ap_live_data(
+    host: str,
+    max_age: Optional[int] = Query(None, ge=0, description="Antigüedad máxima aceptable en segundos. 0 fuerza una lectura nueva; por defecto usa 'live_cache_ttl'."),
+    current_user: User = Depends(get_current_active_user)
+):
     ap_credentials = aps_db.get_ap_credentials(host)
     if not ap_credentials:
         raise HTTPException(status_code=404, detail="AP no encontrado en el inventario.")
 
-    client = UbiquitiClient(host=host, username=ap_credentials['username'], password=ap_credentials['password'])
-    status_data = client.get_status_data()
+    if max_age is None:
+        max_age = _get_live_cache_ttl()
 
-    if not status_data:
+    try:
+        live_detail = _get_live_detail(host, ap_credentials, max_age)
+    except DeviceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not live_detail:
         raise HTTPException(status_code=503, detail="No se pudo obtener datos del AP. Puede estar offline.")
-    
-    host_info = status_data.get("host", {})
-    wireless_info = status_data.get("wireless", {})
-    ath0_status = status_data.get("interfaces", [{}, {}])[1].get("status", {})
-    gps_info = status_data.get("gps", {})
-    throughput_info = wireless_info.get("throughput", {})
-    polling_info = wireless_info.get("polling", {})
-    
-    clients_list = []
-    for cpe_data in wireless_info.get("sta", []):
-        remote = cpe_data.get("remote", {})
-        stats_data = cpe_data.get("stats", {})
-        airmax = cpe_data.get("airmax", {})
-        eth_info = remote.get("ethlist", [{}])[0]
-        chainrssi = cpe_data.get('chainrssi', [None, None, None])
-
-        clients_list.append(CPEDetail(
-            cpe_mac=cpe_data.get("mac"),
-            cpe_hostname=remote.get("hostname"),
-            ip_address=cpe_data.get("lastip"),
-            signal=cpe_data.get("signal"),
-            signal_chain0=chainrssi[0],
-            signal_chain1=chainrssi[1],
-            noisefloor=cpe_data.get("noisefloor"),
-            dl_capacity=airmax.get("dl_capacity"),
-            ul_capacity=airmax.get("ul_capacity"),
-            throughput_rx_kbps=remote.get('rx_throughput'),
-            throughput_tx_kbps=remote.get('tx_throughput'),
-            total_rx_bytes=stats_data.get('rx_bytes'),
-            total_tx_bytes=stats_data.get('tx_bytes'),
-            cpe_uptime=remote.get('uptime'),
-            eth_plugged=eth_info.get('plugged'),
-            eth_speed=eth_info.get('speed')
-        ))
-
-    return APLiveDetail(
-        host=host,
-        username=ap_credentials['username'],
-        is_enabled=True,
-        hostname=host_info.get("hostname"),
-        model=host_info.get("devmodel"),
-        mac=status_data.get("interfaces", [{}, {}])[1].get("hwaddr"),
-        firmware=host_info.get("fwversion"),
-        last_status='online',
-        client_count=wireless_info.get("count"),
-        noise_floor=wireless_info.get("noisef"),
-        chanbw=wireless_info.get("chanbw"),
-        frequency=wireless_info.get("frequency"),
-        essid=wireless_info.get("essid"),
-        total_tx_bytes=ath0_status.get("tx_bytes"),
-        total_rx_bytes=ath0_status.get("rx_bytes"),
-        gps_lat=gps_info.get("lat"),
-        gps_lon=gps_info.get("lon"),
-        gps_sats=gps_info.get("sats"),
-        total_throughput_tx=throughput_info.get("tx"),
-        total_throughput_rx=throughput_info.get("rx"),
-        airtime_total_usage=polling_info.get("use"),
-        airtime_tx_usage=polling_info.get("tx_use"),
-        airtime_rx_usage=polling_info.get("rx_use"),
-        clients=clients_list
-    )
+    return live_detail
 
 @router.get("/aps/{host}/history", response_model=APHistoryResponse)
 def get_ap_history(
@@ -1,12 +1,14 @@
 # app/api/clients_api.py
-from fastapi import APIRouter, Depends, HTTPException, status
+import sqlite3
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
 from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from ..auth import User, get_current_active_user
 # --- CAMBIO: Importar los nuevos módulos de DB ---
-from ..db import clients_db
+from ..db import clients_db, traffic_db
+from .etag import check_not_modified
 
 router = APIRouter()
 
@@ -24,6 +26,7 @@ class Client(BaseModel):
     service_status: str
     suspension_method: Optional[str] = None
     billing_day: Optional[int] = None
+    pppoe_username: Optional[str] = None
     created_at: datetime
     cpe_count: Optional[int] = 0 
     model_config = ConfigDict(from_attributes=True)
@@ -38,6 +41,7 @@ class ClientCreate(BaseModel):
     suspension_method: Optional[str] = None
     billing_day: Optional[int] = None
     notes: Optional[str] = None
+    pppoe_username: Optional[str] = None
 
 class ClientUpdate(BaseModel):
     name: Optional[str] = None
@@ -49,16 +53,28 @@ class ClientUpdate(BaseModel):
     suspension_method: Optional[str] = None
     billing_day: Optional[int] = None
     notes: Optional[str] = None
+    pppoe_username: Optional[str] = None
 
 class AssignedCPE(BaseModel):
     mac: str
     hostname: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+class ClientUsage(BaseModel):
+    period: str
+    bytes_up: int
+    bytes_down: int
+    packets_up: int
+    packets_down: int
+
 # --- Endpoints de la API ---
 
 @router.get("/clients", response_model=List[Client])
-def api_get_all_clients(current_user: User = Depends(get_current_active_user)):
+def api_get_all_clients(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
+    # 'cpes' cubre los cambios de asignación que alteran cpe_count
+    not_modified = check_not_modified(request, response, "clients", "cpes")
+    if not_modified:
+        return not_modified
     return clients_db.get_all_clients_with_cpe_count()
 
 @router.post("/clients", response_model=Client, status_code=status.HTTP_201_CREATED)
@@ -75,7 +91,10 @@ def api_update_client(client_id: int, client_update: ClientUpdate, current_user:
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields to update provided.")
         
-    updated_client = clients_db.update_client(client_id, update_fields)
+    try:
+        updated_client = clients_db.update_client(client_id, update_fields)
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"Database error: {e}")
     if not updated_client:
         raise HTTPException(status_code=404, detail="Client not found.")
     return updated_client
@@ -89,4 +108,32 @@ def api_delete_client(client_id: int, current_user: User = Depends(get_current_a
 
 @router.get("/clients/{client_id}/cpes", response_model=List[AssignedCPE])
 def api_get_cpes_for_client(client_id: int, current_user: User = Depends(get_current_active_user)):
-    return clients_db.get_cpes_for_client(client_id)
\ No newline at end of file
+    return clients_db.get_cpes_for_client(client_id)
+
+@router.get("/clients/{client_id}/usage", response_model=List[ClientUsage])
+def api_get_client_usage(
+    client_id: int,
+    granularity: str = Query("hourly", pattern="^(hourly|monthly)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Consumo del cliente según los contadores de sus colas (usuario PPPoE
+    enlazado). Por defecto: las últimas 24 horas ('hourly') o los últimos
+    12 meses ('monthly').
+    """
+    try:
+        subscriber = traffic_db.get_client_subscriber(client_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Client not found.")
+    if not subscriber:
+        raise HTTPException(status_code=400, detail="Client has no PPPoE username linked.")
+    end = end or datetime.utcnow()
+    if granularity == "monthly":
+        start = start or end - timedelta(days=365)
+        return traffic_db.get_monthly_usage(subscriber, start.strftime('%Y-%m'), end.strftime('%Y-%m'))
+    start = start or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'start' must be before 'end'.")
+    return traffic_db.get_hourly_usage(subscriber, start, end)
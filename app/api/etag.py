@@ -0,0 +1,33 @@
+# app/api/etag.py
+from typing import Optional
+from fastapi import Request, Response, status
+
+from ..db import versions_db
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil: se ignora el prefijo W/ en ambos lados
+    bare_etag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare_etag:
+            return True
+    return False
+
+def check_not_modified(request: Request, response: Response, *tables: str, extra: str = "") -> Optional[Response]:
+    """
+    Calcula el ETag de un endpoint a partir de las versiones de sus tablas.
+    Devuelve una respuesta 304 si el cliente ya tiene esa versión; si no,
+    añade el ETag a la respuesta normal y devuelve None.
+    """
+    etag = versions_db.get_etag(*tables, extra=extra)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
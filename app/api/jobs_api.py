@@ -0,0 +1,44 @@
+# app/api/jobs_api.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+
+from ..auth import User, get_current_active_user
+from ..db import jobs_db
+
+router = APIRouter()
+
+# --- Pydantic Models ---
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    target: Optional[str] = None
+    status: str
+    progress: int = 0
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# --- API Endpoints ---
+@router.get("/jobs", response_model=List[JobResponse])
+def get_jobs(
+    status: Optional[str] = Query(None, description="queued, running, succeeded o failed"),
+    kind: Optional[str] = None,
+    target: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_active_user)
+):
+    return jobs_db.list_jobs(status=status, kind=kind, target=target, limit=limit)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: int, current_user: User = Depends(get_current_active_user)):
+    """Estado y progreso de un trabajo en segundo plano."""
+    job = jobs_db.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
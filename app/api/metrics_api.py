@@ -0,0 +1,48 @@
+# app/api/metrics_api.py
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import PlainTextResponse
+
+from ..auth import get_current_active_user, oauth2_scheme
+from ..db.settings_db import get_setting
+from ..core.metrics import registry, render_prometheus, read_snapshot, MONITOR_METRICS_FILE
+from ..core.telemetry import TelemetryFileReader, TELEMETRY_FILE
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# El monitor renderiza la telemetría en cada ciclo; aquí solo se sirve el archivo
+telemetry_reader = TelemetryFileReader(TELEMETRY_FILE)
+
+async def verify_metrics_access(request: Request, token_from_bearer: Optional[str] = Depends(oauth2_scheme)):
+    """
+    Permite el scrape con el token del ajuste 'metrics_token' (Bearer) o,
+    si no se usa, con la sesión normal de un usuario.
+    """
+    metrics_token = get_setting('metrics_token')
+    if metrics_token and token_from_bearer and secrets.compare_digest(token_from_bearer, metrics_token):
+        return
+    await get_current_active_user(token_from_bearer, request)
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(verify_metrics_access)])
+def get_metrics():
+    """
+    Métricas en formato de texto de Prometheus: las del proceso de la API y
+    las del monitor (leídas del snapshot que vuelca periódicamente).
+    """
+    snapshots = [("api", registry.snapshot())]
+    monitor_snapshot = read_snapshot(MONITOR_METRICS_FILE)
+    if monitor_snapshot:
+        snapshots.append(("monitor", monitor_snapshot))
+    return PlainTextResponse(render_prometheus(snapshots), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get("/metrics/devices", response_class=PlainTextResponse, dependencies=[Depends(verify_metrics_access)])
+def get_device_metrics():
+    """
+    Telemetría de radio y de routers (último estado conocido) como gauges de
+    Prometheus, generada por el monitor sin consultar el historial.
+    """
+    return Response(content=telemetry_reader.read(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,13 +1,27 @@
 # app/api/routers_api.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from pydantic import BaseModel, ConfigDict
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 import time
+import json
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import ssl # <-- AÑADIR IMPORTACIÓN
-from typing import List, Optional, Dict, Any
+import sqlite3
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Literal
 
 # Importaciones de módulos del proyecto
 from ..auth import User, get_current_active_user
-from ..db import router_db
+from ..db import router_db, ppp_sessions_db, jobs_db, backups_db
+from ..db.base import get_stats_db_connection
+from ..core.limiter import device_limiter, DeviceBusyError
+from ..core.jobs import job_runner, JobContext
+from ..core.router_backup import backup_router, diff_objects, load_object
+from .etag import check_not_modified
+from .jobs_api import JobResponse
 
 # --- IMPORTACIONES ACTUALIZADAS ---
 from routeros_api import RouterOsApiPool # <-- USAR RouterOsApiPool
@@ -38,11 +52,22 @@ from ..core.mikrotik_client import (
     create_pppoe_secret,
     update_pppoe_secret,
     enable_disable_pppoe_secret,
-    remove_pppoe_secret
+    remove_pppoe_secret,
+    apply_pppoe_secret_changes,
+    router_api_session
 )
 
 router = APIRouter()
 
+# Segundos que una petición espera su turno si el router está ocupado (p. ej. por el monitor)
+DEVICE_WAIT_TIMEOUT = 30
+# En segundo plano no hay cliente esperando: se tolera más cola
+JOB_DEVICE_WAIT_TIMEOUT = 600
+
+# Routers atendidos a la vez en las operaciones masivas de PPPoE
+PPPOE_BULK_MAX_ROUTERS = 8
+_pppoe_bulk_executor = ThreadPoolExecutor(max_workers=PPPOE_BULK_MAX_ROUTERS, thread_name_prefix="PppoeBulk")
+
 # --- Modelos Pydantic (Sin cambios) ---
 class RouterBase(BaseModel):
     host: str
@@ -73,6 +98,11 @@ class ProvisionRequest(BaseModel):
     new_api_user: str
     new_api_password: str
 
+class ProvisionBatchRequest(BaseModel):
+    hosts: List[str] = Field(..., min_length=1)
+    new_api_user: str
+    new_api_password: str
+
 class ProvisionResponse(BaseModel):
     status: str
     message: str
@@ -88,6 +118,14 @@ class SystemResource(BaseModel):
 class CoreConfigRequest(BaseModel):
     pppoe_interface: str
 
+class ReconcileResponse(BaseModel):
+    status: str
+    message: str
+    dry_run: bool = False
+    applied: bool = False
+    changes: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+
 class AddIpRequest(BaseModel):
     interface: str
     address: str
@@ -134,8 +172,72 @@ class PppoeSecretUpdate(BaseModel):
 class PppoeSecretDisable(BaseModel):
     disable: bool = True
 
+class PppoeBulkChange(BaseModel):
+    router_host: str
+    username: str
+    action: Literal["disable", "enable", "remove", "update"]
+    # Solo para action='update'
+    password: Optional[str] = None
+    profile: Optional[str] = None
+    comment: Optional[str] = None
+
+class PppoeBulkRequest(BaseModel):
+    changes: List[PppoeBulkChange] = Field(..., min_length=1)
+
+class RouterHistoryPoint(BaseModel):
+    timestamp: datetime
+    cpu_load: Optional[int] = None
+    free_memory: Optional[int] = None
+    total_memory: Optional[int] = None
+    ppp_active_count: Optional[int] = None
+    queue_count: Optional[int] = None
+
+class InterfaceRatePoint(BaseModel):
+    timestamp: datetime
+    rx_bps: Optional[float] = None
+    tx_bps: Optional[float] = None
+    running: Optional[bool] = None
+
+class InterfaceHistory(BaseModel):
+    interface: str
+    history: List[InterfaceRatePoint]
+
+class RouterHistoryResponse(BaseModel):
+    host: str
+    hostname: Optional[str] = None
+    history: List[RouterHistoryPoint]
+    interfaces: List[InterfaceHistory]
+
+class PppSession(BaseModel):
+    router_host: str
+    router_hostname: Optional[str] = None
+    session_id: str
+    username: Optional[str] = None
+    address: Optional[str] = None
+    caller_id: Optional[str] = None
+    service: Optional[str] = None
+    uptime: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+class RouterBackup(BaseModel):
+    id: int
+    router_host: str
+    sha256: str
+    size_bytes: Optional[int] = None
+    taken_at: datetime
+    last_seen_at: datetime
+    changed: Optional[bool] = None
+
 # --- Dependencias (Refactorizadas) ---
 
+def get_stats_db():
+    conn = get_stats_db_connection()
+    try:
+        yield conn
+    finally:
+        if conn:
+            conn.close()
+
 def get_router_creds(host: str) -> Dict[str, Any]:
     router_creds = router_db.get_router_by_host(host)
     if not router_creds:
@@ -147,6 +249,8 @@ def get_router_api_connection(creds: dict = Depends(get_router_creds)):
     """
     Dependencia que proporciona una conexión API-SSL a un router aprovisionado
     usando un Pool y asegurando su cierre.
+    La conexión ocupa el turno del router (y de su zona) en el limitador
+    compartido con el monitor.
     """
     if creds['api_port'] != creds['api_ssl_port']:
          raise HTTPException(status_code=400, detail="Router is not provisioned. Please provision first.")
@@ -158,31 +262,43 @@ def get_router_api_connection(creds: dict = Depends(get_router_creds)):
     
     pool: Optional[RouterOsApiPool] = None
     try:
-        # 1. Crear el Pool (el 'connection' de tu ejemplo)
-        pool = RouterOsApiPool(
-            creds['host'], 
-            username=creds['username'], 
-            password=creds['password'], 
-            port=creds['api_ssl_port'],
-            use_ssl=True,
-            ssl_context=ssl_context,
-            plaintext_login=True
-        )
-        # 2. Obtener el objeto 'api' del pool
-        api = pool.get_api()
-        yield api # Entregar el objeto 'api' al endpoint
+        with device_limiter.acquire(creds['host'], creds.get('zona_id'), timeout=DEVICE_WAIT_TIMEOUT):
+            # 1. Crear el Pool (el 'connection' de tu ejemplo)
+            pool = RouterOsApiPool(
+                creds['host'], 
+                username=creds['username'], 
+                password=creds['password'], 
+                port=creds['api_ssl_port'],
+                use_ssl=True,
+                ssl_context=ssl_context,
+                plaintext_login=True
+            )
+            # 2. Obtener el objeto 'api' del pool
+            api = pool.get_api()
+            try:
+                yield api # Entregar el objeto 'api' al endpoint
+            finally:
+                # 3. Llamar a .disconnect() SOBRE EL POOL (antes de liberar el turno)
+                pool.disconnect()
+                pool = None
         
+    except DeviceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"API Connection Error: {e}")
     finally:
-        # 3. Llamar a .disconnect() SOBRE EL POOL
         if pool:
             pool.disconnect()
 # --- FIN DE CORRECCIÓN ---
 
 # --- Endpoints CRUD (Sin cambios) ---
 @router.get("/routers", response_model=List[RouterResponse])
-def get_all_routers(current_user: User = Depends(get_current_active_user)):
+def get_all_routers(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
+    not_modified = check_not_modified(request, response, "routers")
+    if not_modified:
+        return not_modified
     return router_db.get_all_routers()
 
 @router.post("/routers", response_model=RouterResponse, status_code=status.HTTP_201_CREATED)
@@ -217,52 +333,110 @@ def delete_router(host: str, current_user: User = Depends(get_current_active_use
 
 # --- Endpoints de Operaciones ---
 
+def _job_accepted(job_id: int) -> JSONResponse:
+    """Respuesta 202 con el trabajo recién encolado (para consultar luego en /jobs/{id})."""
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED,
+                        content=jsonable_encoder(JobResponse(**jobs_db.get_job(job_id))))
+
+def _reconcile_failed(result: Dict[str, Any], status_code: int) -> JSONResponse:
+    """
+    Error de una reconciliación: 'detail' es texto legible (la interfaz lo
+    muestra tal cual) y los cambios fallidos van aparte en 'errors'.
+    """
+    errors = result.get("errors", [])
+    reasons = "; ".join(f"{e.get('op')} {e.get('path')}: {e.get('error')}" for e in errors)
+    detail = f"{result['message'].rstrip('.')}: {reasons}" if reasons else result["message"]
+    return JSONResponse(status_code=status_code, content=jsonable_encoder({"detail": detail, "errors": errors}))
+
 # --- CORRECCIÓN DE FUGA #2 (Usando RouterOsApiPool) ---
-@router.post("/routers/{host}/provision", response_model=ProvisionResponse)
+def _provision_router(creds: Dict[str, Any], new_api_user: str, new_api_password: str,
+                      progress=None, wait_timeout: float = DEVICE_WAIT_TIMEOUT) -> Dict[str, str]:
+    """
+    Aprovisiona API-SSL con la conexión sin cifrar (turno del router en el
+    limitador) y, si sale bien, guarda las nuevas credenciales.
+    """
+    with device_limiter.acquire(creds['host'], creds.get('zona_id'), timeout=wait_timeout):
+        # Pool sin SSL para aprovisionamiento; se cierra antes de liberar el turno
+        with router_api_session(creds['host'], creds['username'], creds['password'], creds['api_port'],
+                                use_ssl=False) as admin_api:
+            result = provision_router_api_ssl(
+                admin_api, 
+                creds['host'], 
+                new_api_user, 
+                new_api_password,
+                progress=progress
+            )
+
+    if result["status"] == "success":
+        update_data = {
+            "username": new_api_user,
+            "password": new_api_password,
+            "api_port": creds['api_ssl_port']
+        }
+        router_db.update_router_in_db(creds['host'], update_data)
+    return result
+
+@router.post("/routers/{host}/provision", response_model=ProvisionResponse, responses={202: {"model": JobResponse}})
 def provision_router(
     host: str, 
     data: ProvisionRequest,
+    background: bool = Query(False, description="Encola el aprovisionamiento y devuelve el trabajo (202)"),
     creds: dict = Depends(get_router_creds),
     current_user: User = Depends(get_current_active_user)
 ):
-    admin_pool: Optional[RouterOsApiPool] = None # Definir pool fuera del try
-    try:
-        # 1. Crear el Pool (sin SSL para aprovisionamiento)
-        admin_pool = RouterOsApiPool(
-            creds['host'], 
-            username=creds['username'], 
-            password=creds['password'], 
-            port=creds['api_port'],
-            use_ssl=False,
-            plaintext_login=True
-        )
-        # 2. Obtener el objeto 'api' del pool
-        admin_api = admin_pool.get_api()
-        
-        result = provision_router_api_ssl(
-            admin_api, 
-            creds['host'], 
-            data.new_api_user, 
-            data.new_api_password
-        )
-
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["message"])
-        
-        update_data = {
-            "username": data.new_api_user,
-            "password": data.new_api_password,
-            "api_port": creds['api_ssl_port']
-        }
-        router_db.update_router_in_db(host, update_data)
-        
-        return result
+    if background:
+        job_id = job_runner.submit("provision_router", host, data.model_dump(), created_by=current_user.username)
+        return _job_accepted(job_id)
+    try:
+        result = _provision_router(creds, data.new_api_user, data.new_api_password)
+    except DeviceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # 3. Llamar a .disconnect() SOBRE EL POOL
-        if 'admin_pool' in locals() and admin_pool:
-            admin_pool.disconnect()
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@router.post("/routers/provision-batch", response_model=List[JobResponse], status_code=status.HTTP_202_ACCEPTED)
+def provision_routers_batch(data: ProvisionBatchRequest, current_user: User = Depends(get_current_active_user)):
+    """Encola el aprovisionamiento de varios routers; se ejecutan en paralelo en el pool de trabajos."""
+    hosts = list(dict.fromkeys(data.hosts))
+    missing = [host for host in hosts if not router_db.get_router_by_host(host)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Routers not found in database: {', '.join(missing)}")
+    params = {"new_api_user": data.new_api_user, "new_api_password": data.new_api_password}
+    job_ids = [job_runner.submit("provision_router", host, params, created_by=current_user.username) for host in hosts]
+    return [jobs_db.get_job(job_id) for job_id in job_ids]
+
+def _provision_router_job(job: JobContext, host: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    creds = router_db.get_router_by_host(host)
+    if not creds:
+        raise ValueError("Router not found in database")
+    if creds['api_port'] == creds['api_ssl_port'] and creds['username'] == params['new_api_user']:
+        # Reintento tras un reinicio: el aprovisionamiento ya había terminado
+        return {"status": "success", "message": "El router ya estaba aprovisionado."}
+    result = _provision_router(creds, params['new_api_user'], params['new_api_password'],
+                               progress=job.progress, wait_timeout=JOB_DEVICE_WAIT_TIMEOUT)
+    if result["status"] == "error":
+        raise RuntimeError(result["message"])
+    return result
+
+def _install_core_config_job(job: JobContext, host: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    creds = router_db.get_router_by_host(host)
+    if not creds:
+        raise ValueError("Router not found in database")
+    if creds['api_port'] != creds['api_ssl_port']:
+        raise ValueError("Router is not provisioned. Please provision first.")
+    with device_limiter.acquire(host, creds.get('zona_id'), timeout=JOB_DEVICE_WAIT_TIMEOUT):
+        job.progress(20, "Leyendo la configuración actual")
+        with router_api_session(host, creds['username'], creds['password'], creds['api_ssl_port']) as api:
+            result = install_core_config(api, params['pppoe_interface'], dry_run=params.get('dry_run', False))
+    if result["status"] == "error":
+        raise RuntimeError(result["message"])
+    return result
+
+job_runner.register("provision_router", _provision_router_job)
+job_runner.register("install_core_config", _install_core_config_job)
 # --- FIN DE CORRECCIÓN ---
 
 @router.get("/routers/{host}/resources", response_model=SystemResource)
@@ -276,15 +450,160 @@ def get_router_resources(host: str, api: RouterOsApi = Depends(get_router_api_co
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/routers/{host}/install-core-config", response_model=ProvisionResponse)
-def install_router_core_config(host: str, config_data: CoreConfigRequest, api: RouterOsApi = Depends(get_router_api_connection), current_user: User = Depends(get_current_active_user)):
+def _counter_rate(previous: Optional[int], current: Optional[int], seconds: float) -> Optional[float]:
+    """bits/s entre dos lecturas de un contador; None si se reinició (reboot) o falta dato."""
+    if previous is None or current is None or seconds <= 0 or current < previous:
+        return None
+    return round((current - previous) * 8 / seconds, 1)
+
+@router.get("/routers/{host}/history", response_model=RouterHistoryResponse)
+def get_router_history(
+    host: str,
+    period: str = "24h",
+    interface: Optional[str] = Query(None, description="Limitar las series de tráfico a esta interfaz"),
+    stats_conn: Optional[sqlite3.Connection] = Depends(get_stats_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    router_info = router_db.get_router_by_host(host)
+    if not router_info:
+        raise HTTPException(status_code=404, detail="Router not found.")
+
+    if not stats_conn:
+        return RouterHistoryResponse(host=host, hostname=router_info.get('hostname'), history=[], interfaces=[])
+
+    if period == "7d":
+        start_time = datetime.utcnow() - timedelta(days=7)
+    elif period == "30d":
+        start_time = datetime.utcnow() - timedelta(days=30)
+    else:
+        start_time = datetime.utcnow() - timedelta(hours=24)
+
+    rows = stats_conn.execute(
+        """SELECT timestamp, cpu_load, free_memory, total_memory, ppp_active_count, queue_count
+           FROM router_stats_history WHERE router_host = ? AND timestamp >= ? ORDER BY timestamp ASC""",
+        (host, start_time)
+    ).fetchall()
+
+    query = """SELECT timestamp, interface, rx_bytes, tx_bytes, running FROM router_interface_stats_history
+               WHERE router_host = ? AND timestamp >= ?"""
+    params: List[Any] = [host, start_time]
+    if interface:
+        query += " AND interface = ?"
+        params.append(interface)
+    query += " ORDER BY interface, timestamp ASC"
+
+    # Los contadores se convierten en tasas (bits/s) entre muestras consecutivas
+    series: Dict[str, List[InterfaceRatePoint]] = {}
+    previous: Dict[str, Any] = {}
+    for row in stats_conn.execute(query, params):
+        timestamp = datetime.fromisoformat(str(row['timestamp']))
+        last = previous.get(row['interface'])
+        previous[row['interface']] = (timestamp, row['rx_bytes'], row['tx_bytes'])
+        if last is None:
+            continue
+        seconds = (timestamp - last[0]).total_seconds()
+        series.setdefault(row['interface'], []).append(InterfaceRatePoint(
+            timestamp=timestamp,
+            rx_bps=_counter_rate(last[1], row['rx_bytes'], seconds),
+            tx_bps=_counter_rate(last[2], row['tx_bytes'], seconds),
+            running=bool(row['running']) if row['running'] is not None else None,
+        ))
+
+    return RouterHistoryResponse(
+        host=host,
+        hostname=router_info.get('hostname'),
+        history=[dict(row) for row in rows],
+        interfaces=[InterfaceHistory(interface=name, history=points) for name, points in series.items()]
+    )
+
+@router.post("/routers/{host}/install-core-config", response_model=ReconcileResponse, responses={202: {"model": JobResponse}})
+def install_router_core_config(
+    host: str,
+    config_data: CoreConfigRequest,
+    dry_run: bool = Query(False, description="Solo devuelve los cambios que se aplicarían"),
+    background: bool = Query(False, description="Encola la instalación y devuelve el trabajo (202)"),
+    creds: dict = Depends(get_router_creds),
+    current_user: User = Depends(get_current_active_user)
+):
+    if creds['api_port'] != creds['api_ssl_port']:
+        raise HTTPException(status_code=400, detail="Router is not provisioned. Please provision first.")
+    if background:
+        params = {"pppoe_interface": config_data.pppoe_interface, "dry_run": dry_run}
+        job_id = job_runner.submit("install_core_config", host, params, created_by=current_user.username)
+        return _job_accepted(job_id)
     try:
-        result = install_core_config(api, config_data.pppoe_interface)
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["message"])
-        return result
+        with device_limiter.acquire(host, creds.get('zona_id'), timeout=DEVICE_WAIT_TIMEOUT):
+            with router_api_session(host, creds['username'], creds['password'], creds['api_ssl_port']) as api:
+                result = install_core_config(api, config_data.pppoe_interface, dry_run=dry_run)
+    except DeviceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"API Connection Error: {e}")
+    if result["status"] == "error":
+        return _reconcile_failed(result, status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return result
+
+# --- Copias de configuración (/export) ---
+@router.get("/routers/{host}/backups", response_model=List[RouterBackup])
+def get_router_backups(host: str, limit: int = Query(100, ge=1, le=1000), c: User = Depends(get_current_active_user)):
+    """Versiones distintas de la configuración del router, de la más reciente a la más antigua."""
+    return backups_db.list_backups(host, limit=limit)
+
+@router.post("/routers/{host}/backups", response_model=RouterBackup)
+def create_router_backup(host: str, creds: dict = Depends(get_router_creds), c: User = Depends(get_current_active_user)):
+    """Exporta ahora la configuración; 'changed' indica si es una versión nueva."""
+    if creds['api_port'] != creds['api_ssl_port']:
+        raise HTTPException(status_code=400, detail="Router is not provisioned. Please provision first.")
+    try:
+        return backup_router(creds, wait_timeout=DEVICE_WAIT_TIMEOUT)
+    except DeviceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar la configuración: {e}")
+
+def _get_backup_or_404(host: str, backup_id: int) -> Dict[str, Any]:
+    backup = backups_db.get_backup(backup_id)
+    if not backup or backup['router_host'] != host:
+        raise HTTPException(status_code=404, detail="Backup not found.")
+    return backup
+
+@router.get("/routers/{host}/backups/diff", response_class=PlainTextResponse)
+def diff_router_backups(
+    host: str,
+    from_id: Optional[int] = Query(None, description="Versión de origen (por defecto, la anterior a 'to_id')"),
+    to_id: Optional[int] = Query(None, description="Versión de destino (por defecto, la más reciente)"),
+    c: User = Depends(get_current_active_user)
+):
+    """Diff unificado entre dos versiones de la configuración (vacío si son iguales)."""
+    if to_id is None or from_id is None:
+        versions = backups_db.list_backups(host, limit=1000)
+        if to_id is None:
+            if not versions:
+                raise HTTPException(status_code=404, detail="El router no tiene copias.")
+            to_id = versions[0]['id']
+        if from_id is None:
+            older = [v for v in versions if v['id'] < to_id]
+            if not older:
+                raise HTTPException(status_code=404, detail="No hay una versión anterior con la que comparar.")
+            from_id = older[0]['id']
+    before, after = _get_backup_or_404(host, from_id), _get_backup_or_404(host, to_id)
+    try:
+        return diff_objects(before['sha256'], after['sha256'],
+                            f"{host}@{before['taken_at']}", f"{host}@{after['taken_at']}")
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="El contenido de alguna de las versiones ya no está en el almacén.")
+
+@router.get("/routers/{host}/backups/{backup_id}", response_class=PlainTextResponse)
+def download_router_backup(host: str, backup_id: int, c: User = Depends(get_current_active_user)):
+    """Descarga el script (.rsc) de una versión."""
+    backup = _get_backup_or_404(host, backup_id)
+    try:
+        text = load_object(backup['sha256'])
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="El contenido de esta versión ya no está en el almacén.")
+    taken_at = datetime.fromisoformat(str(backup['taken_at']))
+    filename = f"{host}-{taken_at:%Y%m%d-%H%M%S}.rsc"
+    return PlainTextResponse(text, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 # --- ENDPOINT EFICIENTE PARA DETALLES ---
 @router.get("/routers/{host}/full-details", response_model=RouterFullDetails)
@@ -366,13 +685,20 @@ def read_router_ip_pools(api: RouterOsApi = Depends(get_router_api_connection),
 
 
 # --- Endpoints de Escritura (ADD) (Sin cambios) ---
-@router.post("/routers/{host}/write/create-plan", response_model=Dict[str, Any])
-def write_create_service_plan(data: CreatePlanRequest, api: RouterOsApi = Depends(get_router_api_connection), c: User = Depends(get_current_active_user)):
+@router.post("/routers/{host}/write/create-plan", response_model=ReconcileResponse)
+def write_create_service_plan(
+    data: CreatePlanRequest,
+    dry_run: bool = Query(False, description="Solo devuelve los cambios que se aplicarían"),
+    api: RouterOsApi = Depends(get_router_api_connection),
+    c: User = Depends(get_current_active_user)
+):
     try:
-        result = create_service_plan(api, data.plan_name, data.bandwidth, data.pool_range, data.local_address, data.comment)
+        result = create_service_plan(api, data.plan_name, data.bandwidth, data.pool_range, data.local_address, data.comment, dry_run=dry_run)
         if result["status"] == "error":
-            raise HTTPException(status_code=400, detail=result["message"])
+            return _reconcile_failed(result, status.HTTP_400_BAD_REQUEST)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -457,6 +783,24 @@ def api_get_pppoe_secrets(host: str, api: RouterOsApi = Depends(get_router_api_c
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Índice local de sesiones PPP (lo mantiene el monitor con 'listen') ---
+@router.get("/pppoe/sessions", response_model=List[PppSession])
+def find_ppp_sessions(
+    username: Optional[str] = None,
+    address: Optional[str] = None,
+    caller_id: Optional[str] = Query(None, description="MAC del cliente (caller-id)"),
+    c: User = Depends(get_current_active_user)
+):
+    """Busca en qué router está conectado un abonado sin consultar ningún router."""
+    if not (username or address or caller_id):
+        raise HTTPException(status_code=400, detail="Indique username, address o caller_id.")
+    return ppp_sessions_db.find_sessions(username=username, address=address, caller_id=caller_id)
+
+@router.get("/routers/{host}/pppoe/sessions", response_model=List[PppSession])
+def get_indexed_ppp_sessions(host: str, creds: dict = Depends(get_router_creds), c: User = Depends(get_current_active_user)):
+    """Sesiones activas del router según el índice local (sin abrir conexión con el router)."""
+    return ppp_sessions_db.find_sessions(router_host=host)
+
 @router.get("/routers/{host}/pppoe/active", response_model=List[Dict[str, Any]])
 def api_get_pppoe_active_connections(host: str, api: RouterOsApi = Depends(get_router_api_connection), c: User = Depends(get_current_active_user)):
     """Obtiene todas las conexiones PPPoE activas en este momento."""
@@ -521,4 +865,62 @@ def api_remove_pppoe_secret(host: str, secret_id: str, api: RouterOsApi = Depend
         return
     except Exception as e:
         # Podría fallar si el ID no existe
-        raise HTTPException(status_code=404, detail=f"No se pudo eliminar el 'secret' con ID {decoded_secret_id}. Causa: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=f"No se pudo eliminar el 'secret' con ID {decoded_secret_id}. Causa: {e}")
+# --- Operaciones masivas de PPPoE (varios routers a la vez) ---
+def _apply_router_bulk(host: str, changes: List[Dict[str, Any]], emit) -> None:
+    """
+    Aplica los cambios de un router en una sola sesión (con su turno en el
+    limitador) y emite una línea por cambio a medida que se completa.
+    """
+    pending = list(changes)
+
+    def fail_pending(detail: str):
+        for change in pending:
+            emit({"index": change["index"], "router_host": host, "username": change["username"],
+                  "action": change["action"], "status": "error", "detail": detail})
+
+    try:
+        creds = router_db.get_router_by_host(host)
+        if not creds:
+            return fail_pending("Router not found in database")
+        if creds['api_port'] != creds['api_ssl_port']:
+            return fail_pending("Router is not provisioned. Please provision first.")
+        with device_limiter.acquire(host, creds.get('zona_id'), timeout=DEVICE_WAIT_TIMEOUT):
+            with router_api_session(host, creds['username'], creds['password'], creds['api_ssl_port']) as api:
+                for change, result in zip(changes, apply_pppoe_secret_changes(api, changes)):
+                    emit({"index": change["index"], "router_host": host, **result})
+                    pending.remove(change)
+    except Exception as e:
+        fail_pending(str(e) or type(e).__name__)
+
+@router.post("/pppoe/secrets/bulk")
+async def api_bulk_pppoe_secrets(batch: PppoeBulkRequest, c: User = Depends(get_current_active_user)):
+    """
+    Suspende, reactiva, modifica o elimina muchos 'secrets' PPPoE en varios
+    routers. Los cambios se agrupan por router (una sesión por router) y los
+    routers se procesan en paralelo. Devuelve NDJSON: una línea por cambio,
+    con su 'index' en la petición, en el orden en que se van completando.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = OrderedDict()
+    for index, change in enumerate(batch.changes):
+        if change.action == "update" and not (change.password or change.profile or change.comment is not None):
+            raise HTTPException(status_code=400, detail=f"El cambio {index} ('update') no tiene campos para actualizar.")
+        groups.setdefault(change.router_host, []).append({"index": index, **change.model_dump(exclude={"router_host"})})
+
+    async def stream_results():
+        loop = asyncio.get_running_loop()
+        results: asyncio.Queue = asyncio.Queue()
+
+        def emit(item: Dict[str, Any]):
+            loop.call_soon_threadsafe(results.put_nowait, item)
+
+        pending = [loop.run_in_executor(_pppoe_bulk_executor, _apply_router_bulk, host, changes, emit)
+                   for host, changes in groups.items()]
+        remaining = len(batch.changes)
+        while remaining:
+            item = await results.get()
+            remaining -= 1
+            yield json.dumps(item) + "\n"
+        await asyncio.gather(*pending)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
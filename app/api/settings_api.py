@@ -1,18 +1,23 @@
 # app/api/settings_api.py
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, status, Request, Response
 from typing import Dict
 
 from ..auth import User, get_current_active_user
 from ..db import settings_db  # <-- CAMBIO AQUÍ
+from .etag import check_not_modified
 
 router = APIRouter()
 
 # --- API Endpoints ---
 @router.get("/settings", response_model=Dict[str, str])
-def api_get_settings(current_user: User = Depends(get_current_active_user)):
+def api_get_settings(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
     """
     Retrieves all global settings from the database.
+    Answers 304 when the client's If-None-Match matches the settings version.
     """
+    not_modified = check_not_modified(request, response, "settings")
+    if not_modified:
+        return not_modified
     return settings_db.get_all_settings()
 
 @router.put("/settings", status_code=status.HTTP_204_NO_CONTENT)
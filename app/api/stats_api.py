@@ -1,8 +1,9 @@
 # app/api/stats_api.py
 import sqlite3
 import os
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+import re
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Optional
 
@@ -10,6 +11,7 @@ from ..auth import User, get_current_active_user
 # --- CAMBIOS EN IMPORTACIONES DE DB ---
 from ..db.base import get_db_connection, get_stats_db_connection
 from ..db.cpes_db import get_all_cpes_globally # Reutilizamos una función ya creada
+from ..db import traffic_db, flows_db
 
 router = APIRouter()
 
@@ -27,6 +29,26 @@ class TopCPE(BaseModel):
     signal: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
+class TopTalker(BaseModel):
+    subscriber: str
+    client_id: Optional[int] = None
+    client_name: Optional[str] = None
+    routers: Optional[str] = None
+    bytes_up: int
+    bytes_down: int
+    packets_up: int
+    packets_down: int
+
+class FlowUsage(BaseModel):
+    subscriber_ip: str
+    subscriber: Optional[str] = None
+    protocol: int
+    bytes_up: int
+    bytes_down: int
+    packets_up: int
+    packets_down: int
+    flows: int
+
 # --- Dependencias de DB ---
 def get_inventory_db():
     conn = get_db_connection()
@@ -118,4 +140,39 @@ def get_cpe_total_count(
         count = cursor.fetchone()[0]
         return {"total_cpes": count}
     except sqlite3.Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+
+@router.get("/stats/top-talkers", response_model=List[TopTalker])
+def get_top_talkers(
+    month: Optional[str] = None,
+    hours: Optional[int] = Query(None, ge=1, le=24 * 31),
+    limit: int = Query(10, ge=1, le=500),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Abonados con más tráfico según los contadores de las colas: de un mes
+    ('YYYY-MM', por defecto el actual) o de las últimas `hours` horas.
+    """
+    if hours is not None:
+        end = datetime.utcnow()
+        return traffic_db.get_top_talkers_between(end - timedelta(hours=hours), end, limit)
+    month = month or datetime.utcnow().strftime('%Y-%m')
+    if not re.fullmatch(r"\d{4}-\d{2}", month):
+        raise HTTPException(status_code=400, detail="'month' must be YYYY-MM.")
+    return traffic_db.get_top_talkers_by_month(month, limit)
+
+
+@router.get("/stats/flows", response_model=List[FlowUsage])
+def get_flow_usage(
+    hours: int = Query(1, ge=1, le=24 * 31),
+    subscriber: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=1000),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Tráfico por abonado y protocolo según los flujos NetFlow/IPFIX de las
+    últimas `hours` horas. `subscriber` acepta el usuario PPP, la MAC del CPE o la IP.
+    """
+    end = datetime.utcnow()
+    return flows_db.get_flow_usage(end - timedelta(hours=hours), end, subscriber, limit)
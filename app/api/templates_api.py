@@ -0,0 +1,180 @@
+# app/api/templates_api.py
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+
+from ..auth import User, get_current_active_user
+from ..core.config_templates import BUILTIN_PARAMETERS, apply_template_to_router, template_placeholders
+from ..db import router_db, templates_db
+
+router = APIRouter()
+
+# Routers configurados a la vez al aplicar una plantilla (además, el limitador
+# respeta el máximo por zona y el turno de cada router)
+TEMPLATE_APPLY_MAX_CONCURRENCY = 16
+_template_apply_executor = ThreadPoolExecutor(max_workers=TEMPLATE_APPLY_MAX_CONCURRENCY, thread_name_prefix="TemplateApply")
+
+# Segundos que cada router espera su turno durante un despliegue
+DEVICE_WAIT_TIMEOUT = 120
+
+# --- Pydantic Models ---
+class TemplateIpAddress(BaseModel):
+    address: str
+    interface: str
+    comment: str = "Managed by µMonitor"
+
+class TemplateNat(BaseModel):
+    out_interface: str
+    comment: str = "NAT-WAN (µMonitor)"
+
+class TemplatePppoeServer(BaseModel):
+    service_name: str
+    interface: str
+    default_profile: str = "default"
+    authentication: str = "mschap2"
+
+class TemplateServicePlan(BaseModel):
+    plan_name: str
+    bandwidth: str
+    pool_range: str
+    local_address: str
+    comment: str = "Managed by µMonitor"
+
+class TemplateBody(BaseModel):
+    # Parámetros '{nombre}' que admite la plantilla; None = obligatorio al aplicar
+    parameters: Dict[str, Optional[str]] = {}
+    ip_addresses: List[TemplateIpAddress] = []
+    nat: List[TemplateNat] = []
+    pppoe_servers: List[TemplatePppoeServer] = []
+    service_plans: List[TemplateServicePlan] = []
+
+class TemplateCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    body: TemplateBody
+
+class TemplateUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    body: Optional[TemplateBody] = None
+
+class TemplateResponse(TemplateCreate):
+    id: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class TemplateApplyRequest(BaseModel):
+    zona_id: Optional[int] = None
+    hosts: List[str] = []
+    params: Dict[str, str] = {}
+    # Valores específicos por router: {host: {parametro: valor}}
+    host_params: Dict[str, Dict[str, str]] = {}
+    dry_run: bool = False
+
+def _validate_body(body: TemplateBody):
+    undeclared = template_placeholders(body.model_dump()) - set(body.parameters) - set(BUILTIN_PARAMETERS)
+    if undeclared:
+        raise HTTPException(status_code=400, detail=f"Parámetros no declarados en 'parameters': {', '.join(sorted(undeclared))}")
+
+def _get_template_or_404(template_id: int) -> Dict[str, Any]:
+    template = templates_db.get_template(template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found.")
+    return template
+
+# --- API Endpoints ---
+@router.get("/templates", response_model=List[TemplateResponse])
+def get_all_templates(current_user: User = Depends(get_current_active_user)):
+    return templates_db.get_all_templates()
+
+@router.post("/templates", response_model=TemplateResponse, status_code=status.HTTP_201_CREATED)
+def create_template(template: TemplateCreate, current_user: User = Depends(get_current_active_user)):
+    _validate_body(template.body)
+    try:
+        return templates_db.create_template(template.name, template.description, template.body.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/templates/{template_id}", response_model=TemplateResponse)
+def get_template(template_id: int, current_user: User = Depends(get_current_active_user)):
+    return _get_template_or_404(template_id)
+
+@router.put("/templates/{template_id}", response_model=TemplateResponse)
+def update_template(template_id: int, template: TemplateUpdate, current_user: User = Depends(get_current_active_user)):
+    _get_template_or_404(template_id)
+    updates = template.model_dump(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update provided.")
+    if template.body is not None:
+        _validate_body(template.body)
+        updates["body"] = template.body.model_dump()
+    try:
+        templates_db.update_template(template_id, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return templates_db.get_template(template_id)
+
+@router.delete("/templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_template(template_id: int, current_user: User = Depends(get_current_active_user)):
+    if templates_db.delete_template(template_id) == 0:
+        raise HTTPException(status_code=404, detail="Template not found.")
+    return
+
+def _apply_to_host(host: str, body: Dict[str, Any], params: Dict[str, str], dry_run: bool) -> Dict[str, Any]:
+    """Procesa un router del despliegue y devuelve su línea NDJSON (como dict)."""
+    router_data = router_db.get_router_by_host(host)
+    if not router_data:
+        return {"host": host, "status": "error", "changes": [], "errors": [], "detail": "Router not found in database"}
+    if router_data['api_port'] != router_data['api_ssl_port']:
+        return {"host": host, "status": "error", "changes": [], "errors": [],
+                "detail": "Router is not provisioned. Please provision first."}
+    return apply_template_to_router(router_data, body, params, dry_run=dry_run, wait_timeout=DEVICE_WAIT_TIMEOUT)
+
+@router.post("/templates/{template_id}/apply")
+async def apply_template(template_id: int, request: TemplateApplyRequest, current_user: User = Depends(get_current_active_user)):
+    """
+    Aplica la plantilla a una zona y/o una lista de routers, en paralelo y por
+    diferencias (con dry_run=true solo muestra los cambios de cada router).
+    Devuelve NDJSON: una línea por router en el orden en que terminan y una
+    última línea con el resumen del despliegue.
+    """
+    template = await run_in_threadpool(_get_template_or_404, template_id)
+    body = template["body"]
+    hosts = list(dict.fromkeys(request.hosts))
+    if request.zona_id is not None:
+        zona_hosts = await run_in_threadpool(router_db.get_enabled_router_hosts_by_zona, request.zona_id)
+        hosts.extend(h for h in zona_hosts if h not in hosts)
+    if not hosts:
+        raise HTTPException(status_code=400, detail="No se proporcionaron hosts o la zona no tiene routers aprovisionados.")
+    missing = {name for name, value in (body.get("parameters") or {}).items() if value is None} - set(request.params)
+    for host in hosts:
+        if missing - set(request.host_params.get(host, {})):
+            raise HTTPException(status_code=400, detail=f"Faltan parámetros para {host}: {', '.join(sorted(missing))}")
+
+    async def stream_results():
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        pending = [
+            loop.run_in_executor(_template_apply_executor, _apply_to_host, host, body,
+                                 {**request.params, **request.host_params.get(host, {})}, request.dry_run)
+            for host in hosts
+        ]
+        counts = {"applied": 0, "planned": 0, "unchanged": 0, "error": 0}
+        total_changes = 0
+        for next_done in asyncio.as_completed(pending):
+            line = await next_done
+            counts[line["status"]] += 1
+            total_changes += len(line["changes"])
+            yield json.dumps(line) + "\n"
+        summary = {"routers": len(hosts), **counts, "changes": total_changes, "dry_run": request.dry_run,
+                   "elapsed_ms": round((time.monotonic() - started) * 1000)}
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
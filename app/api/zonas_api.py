@@ -2,13 +2,14 @@
 import os
 import uuid
 import aiofiles
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Request, Response
 from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 from datetime import date, datetime
 
 from ..auth import User, get_current_active_user
 from ..db import zonas_db
+from .etag import check_not_modified
 
 router = APIRouter()
 
@@ -67,7 +68,10 @@ def create_zona(zona: ZonaCreate, current_user: User = Depends(get_current_activ
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/zonas", response_model=List[Zona])
-def get_all_zonas(current_user: User = Depends(get_current_active_user)):
+def get_all_zonas(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
+    not_modified = check_not_modified(request, response, "zonas")
+    if not_modified:
+        return not_modified
     return zonas_db.get_all_zonas()
 
 @router.get("/zonas/{zona_id}", response_model=Zona)
@@ -28,6 +28,7 @@ class TokenData(BaseModel):
 
 class User(BaseModel):
     username: str
+    role: str = 'admin'
     disabled: bool = False
 
 # --- Funciones de Contraseña ---
@@ -87,4 +88,10 @@ async def get_current_active_user(
     if user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
         
-    return User(**user.model_dump())
\ No newline at end of file
+    return User(**user.model_dump())
+
+async def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    """Dependencia para endpoints de diagnóstico: exige el rol 'admin'."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -0,0 +1,161 @@
+# app/core/airos_parser.py
+
+from typing import Any, List, NamedTuple, Optional, Union
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # Dependencia opcional: json de la biblioteca estándar (más lento)
+    import json
+
+    loads = json.loads
+
+# Los registros son tuplas con nombre: compactas, sin dict por instancia, y
+# sus primeros campos van en el orden de las columnas del histórico, así que
+# (timestamp, host, *registro[:N]) es directamente una fila para executemany.
+
+
+class APMetrics(NamedTuple):
+    # Columnas de ap_stats_history (tras timestamp y ap_host)
+    uptime: Optional[int]
+    cpuload: Optional[float]
+    freeram: Optional[int]
+    client_count: Optional[int]
+    noise_floor: Optional[int]
+    total_throughput_tx: Optional[int]
+    total_throughput_rx: Optional[int]
+    airtime_total_usage: Optional[int]
+    airtime_tx_usage: Optional[int]
+    airtime_rx_usage: Optional[int]
+    frequency: Optional[int]
+    chanbw: Optional[int]
+    essid: Optional[str]
+    total_tx_bytes: Optional[int]
+    total_rx_bytes: Optional[int]
+    gps_lat: Optional[float]
+    gps_lon: Optional[float]
+    gps_sats: Optional[int]
+    # Metadatos del inventario
+    hostname: Optional[str]
+    model: Optional[str]
+    firmware: Optional[str]
+    mac: Optional[str]
+
+
+AP_HISTORY_FIELDS = 18
+
+
+class StationRow(NamedTuple):
+    # Columnas de cpe_stats_history (tras timestamp y ap_host)
+    cpe_mac: Optional[str]
+    cpe_hostname: Optional[str]
+    ip_address: Optional[str]
+    signal: Optional[int]
+    signal_chain0: Optional[int]
+    signal_chain1: Optional[int]
+    noisefloor: Optional[int]
+    cpe_tx_power: Optional[int]
+    distance: Optional[int]
+    dl_capacity: Optional[int]
+    ul_capacity: Optional[int]
+    airmax_cinr_rx: Optional[float]
+    airmax_usage_rx: Optional[float]
+    airmax_cinr_tx: Optional[float]
+    airmax_usage_tx: Optional[float]
+    throughput_rx_kbps: Optional[int]
+    throughput_tx_kbps: Optional[int]
+    total_rx_bytes: Optional[int]
+    total_tx_bytes: Optional[int]
+    cpe_uptime: Optional[int]
+    eth_plugged: Optional[bool]
+    eth_speed: Optional[int]
+    eth_cable_len: Optional[int]
+    # Metadatos del inventario de CPEs
+    model: Optional[str]
+    firmware: Optional[str]
+
+
+STATION_HISTORY_FIELDS = 23
+
+
+class DisconnectRow(NamedTuple):
+    cpe_mac: Optional[str]
+    cpe_hostname: Optional[str]
+    reason_code: Optional[int]
+    connection_duration: Optional[int]
+
+
+class StatusSnapshot:
+    """Resultado del parseo de un status.cgi: métricas del AP, estaciones y desconexiones."""
+    __slots__ = ("ap", "stations", "disconnects")
+
+    def __init__(self, ap: APMetrics, stations: List[StationRow], disconnects: List[DisconnectRow]):
+        self.ap = ap
+        self.stations = stations
+        self.disconnects = disconnects
+
+
+_EMPTY: dict = {}
+
+
+def _parse_station(sta: dict) -> StationRow:
+    get = sta.get
+    remote = get("remote") or _EMPTY
+    stats = get("stats") or _EMPTY
+    airmax = get("airmax") or _EMPTY
+    airmax_rx = airmax.get("rx") or _EMPTY
+    airmax_tx = airmax.get("tx") or _EMPTY
+    ethlist = remote.get("ethlist")
+    eth = ethlist[0] if ethlist else _EMPTY
+    chainrssi = get("chainrssi") or ()
+    return StationRow(
+        get("mac"), remote.get("hostname"), get("lastip"), get("signal"),
+        chainrssi[0] if len(chainrssi) > 0 else None, chainrssi[1] if len(chainrssi) > 1 else None,
+        get("noisefloor"), remote.get("tx_power"), get("distance"),
+        airmax.get("dl_capacity"), airmax.get("ul_capacity"),
+        airmax_rx.get("cinr"), airmax_rx.get("usage"), airmax_tx.get("cinr"), airmax_tx.get("usage"),
+        remote.get("rx_throughput"), remote.get("tx_throughput"),
+        stats.get("rx_bytes"), stats.get("tx_bytes"), remote.get("uptime"),
+        eth.get("plugged"), eth.get("speed"), eth.get("cable_len"),
+        remote.get("platform"), get("version"),
+    )
+
+
+def parse_status(payload: Union[bytes, str, dict]) -> StatusSnapshot:
+    """
+    Convierte la respuesta de status.cgi (bytes crudos o el dict ya
+    decodificado) en un StatusSnapshot, extrayendo solo los campos que usan
+    el histórico, el inventario, la telemetría y la vista en vivo. Lanza
+    ValueError si la respuesta no es un JSON de estado (p. ej. la página de
+    login HTML).
+    """
+    data: Any = payload if isinstance(payload, dict) else loads(payload)
+    if not isinstance(data, dict):
+        raise ValueError("La respuesta de status.cgi no es un objeto JSON.")
+
+    host = data.get("host") or _EMPTY
+    wireless = data.get("wireless") or _EMPTY
+    throughput = wireless.get("throughput") or _EMPTY
+    polling = wireless.get("polling") or _EMPTY
+    interfaces = data.get("interfaces") or ()
+    ath0 = interfaces[1] if len(interfaces) > 1 and interfaces[1] else _EMPTY
+    ath0_status = ath0.get("status") or _EMPTY
+    gps = data.get("gps") or _EMPTY
+
+    ap = APMetrics(
+        host.get("uptime"), host.get("cpuload"), host.get("freeram"), wireless.get("count"),
+        wireless.get("noisef"), throughput.get("tx"), throughput.get("rx"),
+        polling.get("use"), polling.get("tx_use"), polling.get("rx_use"),
+        wireless.get("frequency"), wireless.get("chanbw"), wireless.get("essid"),
+        ath0_status.get("tx_bytes"), ath0_status.get("rx_bytes"),
+        gps.get("lat"), gps.get("lon"), gps.get("sats"),
+        host.get("hostname"), host.get("devmodel"), host.get("fwversion"), ath0.get("hwaddr"),
+    )
+    stations = [_parse_station(sta) for sta in wireless.get("sta") or () if sta]
+    disconnects = [
+        DisconnectRow(event.get("mac"), event.get("hostname"), event.get("reason_code"),
+                      event.get("disconnect_duration"))
+        for event in wireless.get("sta_disconnected") or () if event
+    ]
+    return StatusSnapshot(ap, stations, disconnects)
@@ -3,6 +3,7 @@
 import requests
 # --- CAMBIO: Importación relativa para apuntar a app/db/settings_db.py ---
 from ..db.settings_db import get_setting
+from .metrics import ALERT_DURATION, ALERTS_SENT
 
 def send_telegram_alert(message: str):
     """
@@ -21,6 +22,7 @@ def send_telegram_alert(message: str):
         print("La siguiente alerta solo se mostrará en la consola.")
         print(message)
         print("--------------------------\n")
+        ALERTS_SENT.inc(result="simulated")
         return
 
     api_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
@@ -32,9 +34,12 @@ def send_telegram_alert(message: str):
     }
     
     try:
-        response = requests.post(api_url, json=payload, timeout=10)
+        with ALERT_DURATION.time():
+            response = requests.post(api_url, json=payload, timeout=10)
         response.raise_for_status()
         print(f"Alerta enviada exitosamente a Telegram.")
+        ALERTS_SENT.inc(result="sent")
         
     except requests.exceptions.RequestException as e:
-        print(f"Error crítico: No se pudo enviar la alerta de Telegram. Causa: {e}")
\ No newline at end of file
+        print(f"Error crítico: No se pudo enviar la alerta de Telegram. Causa: {e}")
+        ALERTS_SENT.inc(result="failed")
\ No newline at end of file
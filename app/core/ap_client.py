@@ -3,10 +3,25 @@
 import requests
 import urllib3
 
+from .metrics import AP_REQUEST_DURATION, AP_REQUEST_ERRORS
+from .airos_parser import loads
+
 # Desactivar los warnings de SSL ya que los dispositivos de red a menudo
 # usan certificados autofirmados, lo cual es normal en una red interna.
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+def _classify_error(e: Exception) -> str:
+    """Traduce una excepción de requests a la razón usada en las métricas."""
+    if isinstance(e, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(e, requests.exceptions.JSONDecodeError):
+        return "json_error"
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None and e.response.status_code in (401, 403):
+        return "auth_failure"
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return "connection_error"
+    return "error"
+
 class UbiquitiClient:
     """
     Un cliente para interactuar con la API de dispositivos Ubiquiti AirOS.
@@ -27,6 +42,8 @@ class UbiquitiClient:
         self.password = password
         self.session = requests.Session()
         self.session.verify = verify_ssl
+        # Razón del último fallo (timeout, auth_failure, json_error...) para métricas y logs
+        self.last_error = None
         # Añadimos un User-Agent estándar para simular un navegador
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -45,7 +62,8 @@ class UbiquitiClient:
         payload = {"username": self.username, "password": self.password}
         
         try:
-            response = self.session.post(auth_url, data=payload, timeout=15)
+            with AP_REQUEST_DURATION.time(op="auth"):
+                response = self.session.post(auth_url, data=payload, timeout=15)
             # Lanza una excepción si el código de estado es un error (4xx o 5xx)
             response.raise_for_status() 
 
@@ -55,22 +73,26 @@ class UbiquitiClient:
                 return True
             
             print(f"Error de autenticación en {self.base_url}: No se recibió el token CSRF.")
+            self._record_error("auth", "auth_failure")
             return False
 
         except requests.exceptions.RequestException as e:
             # Captura errores de red, timeouts, errores HTTP, etc.
             print(f"Error de red durante la autenticación en {self.base_url}: {e}")
+            self._record_error("auth", _classify_error(e))
             return False
 
-    def get_status_data(self) -> dict | None:
-        """
-        Obtiene los datos completos de 'status.cgi' como un diccionario.
+    def _record_error(self, op: str, reason: str):
+        self.last_error = reason
+        AP_REQUEST_ERRORS.inc(op=op, reason=reason)
 
-        Primero intenta autenticarse. Si tiene éxito, solicita los datos de estado.
+    def get_status_raw(self) -> bytes | None:
+        """
+        Obtiene el cuerpo crudo (bytes JSON) de 'status.cgi', sin decodificarlo,
+        para que el parser extraiga solo lo necesario o se capture tal cual.
 
         Returns:
-            dict | None: Un diccionario con los datos del AP si todo fue exitoso,
-                         o None si hubo algún error.
+            bytes | None: El JSON crudo si todo fue exitoso, o None si hubo algún error.
         """
         if not self._authenticate():
             print(f"Fallo en la autenticación para {self.base_url}, no se pueden obtener datos.")
@@ -78,16 +100,38 @@ class UbiquitiClient:
         
         status_url = self.base_url + "/status.cgi"
         try:
-            response = self.session.get(status_url, timeout=15)
+            with AP_REQUEST_DURATION.time(op="status"):
+                response = self.session.get(status_url, timeout=15)
             response.raise_for_status()
-            
-            # Intenta decodificar la respuesta como JSON
-            return response.json()
-
         except requests.exceptions.RequestException as e:
             print(f"Error de red al obtener datos de estado de {self.base_url}: {e}")
+            self._record_error("status", _classify_error(e))
             return None
-        except requests.exceptions.JSONDecodeError:
+
+        content = response.content
+        if not content.lstrip().startswith(b"{"):
             print(f"Error: La respuesta de {self.base_url} no es un JSON válido.")
             # Esto puede pasar si el login falló silenciosamente y devolvió una página HTML de login
-            return None
\ No newline at end of file
+            self._record_error("status", "json_error")
+            return None
+        return content
+
+    def get_status_data(self) -> dict | None:
+        """
+        Obtiene los datos completos de 'status.cgi' como un diccionario.
+
+        Primero intenta autenticarse. Si tiene éxito, solicita los datos de estado.
+
+        Returns:
+            dict | None: Un diccionario con los datos del AP si todo fue exitoso,
+                         o None si hubo algún error.
+        """
+        content = self.get_status_raw()
+        if content is None:
+            return None
+        try:
+            return loads(content)
+        except ValueError:
+            print(f"Error: La respuesta de {self.base_url} no es un JSON válido.")
+            self._record_error("status", "json_error")
+            return None
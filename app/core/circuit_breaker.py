@@ -0,0 +1,108 @@
+# app/core/circuit_breaker.py
+
+import socket
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+# --- Constantes ---
+FAILURE_THRESHOLD = 3        # Fallos consecutivos antes de abrir el circuito
+BASE_BACKOFF_SECONDS = 60    # Primer intervalo entre sondeos con el circuito abierto
+MAX_BACKOFF_SECONDS = 3600   # Tope del retroceso exponencial
+PROBE_TIMEOUT_SECONDS = 2
+
+
+def split_host_port(host: str, default_port: int) -> Tuple[str, int]:
+    """Separa 'ip:puerto' (los APs pueden registrarse con puerto) en sus partes."""
+    if host.count(":") == 1:
+        address, _, port = host.partition(":")
+        if port.isdigit():
+            return address, int(port)
+    return host, default_port
+
+
+def tcp_probe(host: str, port: int, timeout: float = PROBE_TIMEOUT_SECONDS) -> bool:
+    """Sondeo barato: solo comprueba que el puerto acepta conexiones TCP."""
+    address, port = split_host_port(host, port)
+    try:
+        with socket.create_connection((address, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+@dataclass
+class _BreakerState:
+    failures: int = 0
+    next_probe_at: float = 0.0
+    backoff: float = 0.0
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por dispositivo, en memoria del proceso del monitor.
+
+    - Cerrado: el dispositivo se sondea completo en cada ciclo.
+    - Abierto (tras FAILURE_THRESHOLD fallos seguidos): se omite hasta que
+      vence su retroceso; entonces se hace un sondeo TCP barato y solo si
+      responde se vuelve a intentar el sondeo completo.
+    Cada sondeo fallido con el circuito abierto duplica el retroceso.
+    """
+    def __init__(self, threshold: int = FAILURE_THRESHOLD,
+                 base_backoff: float = BASE_BACKOFF_SECONDS,
+                 max_backoff: float = MAX_BACKOFF_SECONDS):
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._states: Dict[str, _BreakerState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> _BreakerState:
+        with self._lock:
+            return self._states.setdefault(host, _BreakerState())
+
+    def is_open(self, host: str) -> bool:
+        return self._state(host).failures >= self.threshold
+
+    def allow_poll(self, host: str, probe: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Indica si el dispositivo debe sondearse completo en este ciclo.
+        Con el circuito abierto ejecuta `probe` (si se da) al vencer el retroceso.
+        """
+        state = self._state(host)
+        if state.failures < self.threshold:
+            return True
+        if time.monotonic() < state.next_probe_at:
+            return False
+        if probe is None or probe():
+            logging.info(f"Circuito de {host}: el dispositivo responde, se reintenta el sondeo completo.")
+            return True
+        self.record_failure(host)
+        return False
+
+    def record_success(self, host: str):
+        state = self._state(host)
+        if state.failures >= self.threshold:
+            logging.info(f"Circuito de {host} cerrado: se restablece el sondeo completo.")
+        state.failures = 0
+        state.backoff = 0.0
+        state.next_probe_at = 0.0
+
+    def record_failure(self, host: str):
+        state = self._state(host)
+        state.failures += 1
+        if state.failures < self.threshold:
+            return
+        state.backoff = min(self.max_backoff, state.backoff * 2 if state.backoff else self.base_backoff)
+        state.next_probe_at = time.monotonic() + state.backoff
+        logging.info(f"Circuito de {host} abierto ({state.failures} fallos). Próximo sondeo en {int(state.backoff)}s.")
+
+    def forget(self, host: str):
+        with self._lock:
+            self._states.pop(host, None)
+
+
+# Instancia compartida por los hilos del monitor
+circuit_breaker = CircuitBreaker()
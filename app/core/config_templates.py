@@ -0,0 +1,94 @@
+# app/core/config_templates.py
+
+import string
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from .limiter import device_limiter
+from .mikrotik_client import router_api_session, service_plan_state
+from .router_reconciler import MenuState, merge_states, reconcile
+
+# Parámetros que se rellenan solos con los datos de cada router
+BUILTIN_PARAMETERS = ("host", "hostname", "zona_id")
+# Secciones de una plantilla, en el orden en que se aplican (los planes
+# antes que los servidores PPPoE, que pueden usar su perfil por defecto)
+SECTIONS = ("ip_addresses", "nat", "service_plans", "pppoe_servers")
+
+
+def template_placeholders(body: Dict[str, Any]) -> Set[str]:
+    """Nombres de los parámetros '{nombre}' que usa la plantilla."""
+    names = set()
+    formatter = string.Formatter()
+    for section in SECTIONS:
+        for item in body.get(section) or []:
+            for value in item.values():
+                if isinstance(value, str):
+                    names.update(field for _, field, _, _ in formatter.parse(value) if field)
+    return names
+
+
+def resolve_parameters(body: Dict[str, Any], router: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Valores para un router: datos propios del router, valores por defecto de la plantilla y los de la petición."""
+    values = {"host": router.get("host"), "hostname": router.get("hostname") or router.get("host"),
+              "zona_id": router.get("zona_id")}
+    values.update({name: value for name, value in (body.get("parameters") or {}).items() if value is not None})
+    values.update(params)
+    return values
+
+
+def render_template(body: Dict[str, Any], values: Dict[str, Any]) -> List[MenuState]:
+    """Sustituye los parámetros y traduce la plantilla al estado deseado del reconciliador."""
+    def render(item: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return {key: value.format_map(values) if isinstance(value, str) else value for key, value in item.items()}
+        except KeyError as e:
+            raise ValueError(f"Falta el parámetro '{e.args[0]}'.")
+
+    states: List[MenuState] = []
+    for item in map(render, body.get("ip_addresses") or []):
+        states.append(MenuState("/ip/address", key="address", present={
+            item["address"]: {"interface": item["interface"], "comment": item.get("comment", "")},
+        }))
+    for item in map(render, body.get("nat") or []):
+        # La regla se identifica por su comentario, igual que en add_nat_masquerade
+        states.append(MenuState("/ip/firewall/nat", key="comment", present={
+            item["comment"]: {"chain": "srcnat", "action": "masquerade", "out-interface": item["out_interface"]},
+        }))
+    for item in map(render, body.get("service_plans") or []):
+        states += service_plan_state(item["plan_name"], item["bandwidth"], item["pool_range"],
+                                     item["local_address"], item.get("comment", ""))
+    for item in map(render, body.get("pppoe_servers") or []):
+        states.append(MenuState("/interface/pppoe-server/server", key="service-name", present={
+            item["service_name"]: {"interface": item["interface"], "default-profile": item.get("default_profile", "default"),
+                                   "authentication": item.get("authentication", "mschap2"), "disabled": "no"},
+        }))
+    return merge_states(states)
+
+
+def apply_template_to_router(router: Dict[str, Any], body: Dict[str, Any], params: Dict[str, Any],
+                             dry_run: bool = False, wait_timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Aplica (o previsualiza) la plantilla en un router con una sola sesión y su
+    turno en el limitador. Devuelve el resumen del router: 'status' es
+    'applied', 'planned' (dry-run), 'unchanged' o 'error'.
+    """
+    started = time.monotonic()
+    host = router["host"]
+    line = {"host": host, "hostname": router.get("hostname"), "status": "error",
+            "changes": [], "errors": [], "detail": None}
+    try:
+        states = render_template(body, resolve_parameters(body, router, params))
+        with device_limiter.acquire(host, router.get("zona_id"), timeout=wait_timeout):
+            with router_api_session(host, router["username"], router["password"], router["api_ssl_port"]) as api:
+                result = reconcile(api, states, dry_run=dry_run)
+        line.update(changes=result["changes"], errors=result["errors"])
+        if result["errors"]:
+            line["detail"] = f"{len(result['errors'])} de {len(result['changes'])} cambios fallaron."
+        elif not result["changes"]:
+            line["status"] = "unchanged"
+        else:
+            line["status"] = "planned" if dry_run else "applied"
+    except Exception as e:
+        line["detail"] = str(e) or type(e).__name__
+    line["duration_ms"] = round((time.monotonic() - started) * 1000)
+    return line
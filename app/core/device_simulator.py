@@ -0,0 +1,624 @@
+# app/core/device_simulator.py
+
+import asyncio
+import datetime
+import ipaddress
+import json
+import logging
+import os
+import random
+import secrets
+import ssl
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from routeros_api.base_api import encode_length
+
+# --- Constantes ---
+AIROS_PORT = 8443          # Puerto sin privilegios para el HTTPS de los APs simulados
+ROUTEROS_API_SSL_PORT = 8729
+DEFAULT_AP_NETWORK = "127.10.0.0/16"
+DEFAULT_ROUTER_NETWORK = "127.20.0.0/16"
+SIM_USERNAME = "sim"
+SIM_PASSWORD = "sim"
+
+HTML_LOGIN_PAGE = (
+    b"<!DOCTYPE html><html><head><title>Login</title></head><body>"
+    b"<form method=\"post\" action=\"/api/auth\"><input name=\"username\"><input name=\"password\" type=\"password\">"
+    b"</form></body></html>"
+)
+
+
+@dataclass
+class DeviceProfile:
+    """Comportamiento configurable de un dispositivo simulado."""
+    stations: int = 20                 # CPEs asociados (solo APs)
+    latency_ms: float = 0.0            # Latencia añadida a cada respuesta
+    jitter_ms: float = 0.0
+    failure_rate: float = 0.0          # Probabilidad de cortar la conexión sin responder
+    html_login_rate: float = 0.0       # Probabilidad de responder la página HTML de login en status.cgi
+    auth_failure_rate: float = 0.0     # Probabilidad de 401 en /api/auth
+    offline: bool = False              # El puerto no acepta conexiones
+
+
+def generate_self_signed_cert(directory: Optional[str] = None) -> Tuple[str, str]:
+    """Genera un certificado autofirmado (como el de los equipos reales). Devuelve (cert, key)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    directory = directory or tempfile.mkdtemp(prefix="umonitor-sim-")
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "umonitor-simulator")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=3650))
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "sim_cert.pem")
+    key_path = os.path.join(directory, "sim_key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def _server_ssl_context(cert_path: str, key_path: str) -> ssl.SSLContext:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+async def _simulate_latency(profile: DeviceProfile):
+    delay = profile.latency_ms + (random.uniform(-profile.jitter_ms, profile.jitter_ms) if profile.jitter_ms else 0.0)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+
+# --- AirOS ---
+
+class SimulatedAP:
+    """AP AirOS simulado: /api/auth + /status.cgi con CPEs que evolucionan en el tiempo."""
+    def __init__(self, address: str, port: int, profile: DeviceProfile, index: int = 0):
+        self.address = address
+        self.port = port
+        self.profile = profile
+        self.hostname = f"SIM-AP-{index:05d}"
+        self.mac = "FC:EC:DA:%02X:%02X:%02X" % ((index >> 16) & 0xFF, (index >> 8) & 0xFF, index & 0xFF)
+        self.started_at = time.time()
+        self.tokens: set = set()
+        self._rng = random.Random(index)
+        self.stations = [self._new_station(index, i) for i in range(profile.stations)]
+        self.requests = 0
+
+    @property
+    def host(self) -> str:
+        return f"{self.address}:{self.port}"
+
+    def _new_station(self, ap_index: int, i: int) -> Dict[str, Any]:
+        return {
+            "mac": "24:5A:4C:%02X:%02X:%02X" % ((ap_index >> 8) & 0xFF, ap_index & 0xFF, i & 0xFF),
+            "hostname": f"SIM-CPE-{ap_index:05d}-{i:03d}",
+            "ip": f"10.{(ap_index >> 8) & 0xFF}.{ap_index & 0xFF}.{(i % 250) + 2}",
+            "signal": self._rng.randint(-80, -50),
+            "distance": self._rng.randint(100, 8000),
+            "rx_bytes": self._rng.randint(10 ** 6, 10 ** 9),
+            "tx_bytes": self._rng.randint(10 ** 6, 10 ** 9),
+        }
+
+    def status(self) -> Dict[str, Any]:
+        uptime = int(time.time() - self.started_at)
+        sta = []
+        total_rx = total_tx = 0
+        for s in self.stations:
+            s["signal"] = max(-95, min(-40, s["signal"] + self._rng.randint(-1, 1)))
+            rx_kbps, tx_kbps = self._rng.randint(100, 20000), self._rng.randint(50, 5000)
+            s["rx_bytes"] += rx_kbps * 125
+            s["tx_bytes"] += tx_kbps * 125
+            total_rx += rx_kbps
+            total_tx += tx_kbps
+            sta.append({
+                "mac": s["mac"], "lastip": s["ip"], "signal": s["signal"],
+                "chainrssi": [s["signal"] - 2, s["signal"] - 3, 0], "noisefloor": -95,
+                "distance": s["distance"], "version": "WA.V8.7.11",
+                "airmax": {
+                    "dl_capacity": self._rng.randint(50000, 250000), "ul_capacity": self._rng.randint(20000, 120000),
+                    "rx": {"cinr": self._rng.randint(10, 30), "usage": self._rng.randint(0, 60)},
+                    "tx": {"cinr": self._rng.randint(10, 30), "usage": self._rng.randint(0, 60)},
+                },
+                "remote": {
+                    "hostname": s["hostname"], "platform": "LiteBeam 5AC", "tx_power": self._rng.randint(10, 25),
+                    "rx_throughput": rx_kbps, "tx_throughput": tx_kbps, "uptime": uptime,
+                    "ethlist": [{"plugged": True, "speed": 100, "cable_len": self._rng.randint(1, 60)}],
+                },
+                "stats": {"rx_bytes": s["rx_bytes"], "tx_bytes": s["tx_bytes"]},
+            })
+        return {
+            "host": {
+                "hostname": self.hostname, "devmodel": "Rocket 5AC Prism", "fwversion": "XC.v8.7.11",
+                "uptime": uptime, "cpuload": self._rng.randint(5, 60), "freeram": 60000,
+            },
+            "interfaces": [
+                {"ifname": "eth0", "hwaddr": self.mac, "status": {}},
+                {"ifname": "ath0", "hwaddr": self.mac,
+                 "status": {"rx_bytes": sum(s["rx_bytes"] for s in self.stations),
+                            "tx_bytes": sum(s["tx_bytes"] for s in self.stations)}},
+            ],
+            "wireless": {
+                "essid": f"SIM-{self.hostname}", "frequency": 5800, "chanbw": 20, "noisef": -95,
+                "count": len(sta), "throughput": {"rx": total_rx, "tx": total_tx},
+                "polling": {"use": self._rng.randint(10, 90), "tx_use": self._rng.randint(5, 45),
+                            "rx_use": self._rng.randint(5, 45)},
+                "sta": sta, "sta_disconnected": [],
+            },
+            "gps": {"lat": None, "lon": None, "sats": None},
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = b""
+                if headers.get("content-length"):
+                    body = await reader.readexactly(int(headers["content-length"]))
+
+                self.requests += 1
+                await _simulate_latency(self.profile)
+                if self.profile.failure_rate and self._rng.random() < self.profile.failure_rate:
+                    break
+                status, extra_headers, payload, content_type = self._route(method, target.split("?")[0], headers, body)
+                head = [f"HTTP/1.1 {status}", f"Content-Type: {content_type}", f"Content-Length: {len(payload)}"]
+                head += [f"{k}: {v}" for k, v in extra_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        if method == "POST" and path == "/api/auth":
+            if self.profile.auth_failure_rate and self._rng.random() < self.profile.auth_failure_rate:
+                return "401 Unauthorized", {}, b'{"error": "invalid credentials"}', "application/json"
+            token = secrets.token_hex(16)
+            self.tokens.add(token)
+            return ("200 OK", {"X-CSRF-ID": token, "Set-Cookie": f"AIROS_SESSIONID={token}; Path=/"},
+                    b'{"authenticated": true}', "application/json")
+        if method == "GET" and path == "/status.cgi":
+            if headers.get("x-csrf-id") not in self.tokens or (
+                    self.profile.html_login_rate and self._rng.random() < self.profile.html_login_rate):
+                # AirOS responde 200 con la página de login cuando la sesión no es válida
+                return "200 OK", {}, HTML_LOGIN_PAGE, "text/html"
+            return "200 OK", {}, json.dumps(self.status()).encode(), "application/json"
+        return "404 Not Found", {}, b"Not Found", "text/plain"
+
+
+# --- RouterOS API-SSL ---
+
+async def _read_length(reader: asyncio.StreamReader) -> int:
+    first = (await reader.readexactly(1))[0]
+    if first < 0x80:
+        return first
+    if first < 0xC0:
+        return ((first & 0x3F) << 8) | (await reader.readexactly(1))[0]
+    if first < 0xE0:
+        return ((first & 0x1F) << 16) | int.from_bytes(await reader.readexactly(2), "big")
+    if first < 0xF0:
+        return ((first & 0x0F) << 24) | int.from_bytes(await reader.readexactly(3), "big")
+    if first == 0xF0:
+        return int.from_bytes(await reader.readexactly(4), "big")
+    raise ValueError("Longitud de palabra RouterOS inválida")
+
+
+async def _read_sentence(reader: asyncio.StreamReader) -> List[str]:
+    words = []
+    while True:
+        length = await _read_length(reader)
+        if length == 0:
+            return words
+        words.append((await reader.readexactly(length)).decode("utf-8", errors="replace"))
+
+
+def _encode_sentence(words: List[str]) -> bytes:
+    out = bytearray()
+    for word in words:
+        data = word.encode("utf-8")
+        out += encode_length(len(data)) + data
+    out += b"\x00"
+    return bytes(out)
+
+
+def _match_query(item: Dict[str, str], queries: List[str]) -> bool:
+    """
+    Evalúa las palabras de consulta de RouterOS como una pila: '?k=v' (igual),
+    '?k' (tiene la propiedad), '?-k' (no la tiene) y '?#' con los operadores
+    '|', '&' y '!'. Al final, todos los valores de la pila se combinan con AND.
+    """
+    stack: List[bool] = []
+    for query in queries:
+        if query.startswith("#"):
+            for op in query[1:]:
+                if op == "!" and stack:
+                    stack.append(not stack.pop())
+                elif op in "|&" and len(stack) >= 2:
+                    right, left = stack.pop(), stack.pop()
+                    stack.append(left or right if op == "|" else left and right)
+        elif query.startswith("-"):
+            stack.append(query[1:] not in item)
+        elif "=" in query:
+            key, _, value = query.partition("=")
+            stack.append(item.get(key) == value)
+        else:
+            stack.append(query in item)
+    return all(stack)
+
+
+class SimulatedRouter:
+    """
+    Router RouterOS simulado por API-SSL: login en texto plano, print con
+    consultas '?' y '=.proplist=', add/set/remove sobre tablas en memoria,
+    'sign' de certificados y eco de '.tag' para comandos en paralelo.
+    """
+    def __init__(self, address: str, port: int, profile: DeviceProfile, index: int = 0, ppp_secrets: int = 0):
+        self.address = address
+        self.port = port
+        self.profile = profile
+        self.index = index
+        self.started_at = time.time()
+        self._rng = random.Random(index)
+        self._next_id = 1
+        self.tables: Dict[str, List[Dict[str, str]]] = {}
+        # Suscripciones 'listen' abiertas: ruta -> [(writer, tag)]
+        self._listeners: Dict[str, List[Tuple[Any, Optional[str]]]] = {}
+        self._seed(ppp_secrets)
+
+    def _new_id(self) -> str:
+        value = f"*{self._next_id:X}"
+        self._next_id += 1
+        return value
+
+    def _insert(self, path: str, item: Dict[str, str]) -> str:
+        item = {".id": self._new_id(), **item}
+        self.tables.setdefault(path, []).append(item)
+        return item[".id"]
+
+    def _seed(self, ppp_secrets: int):
+        self._insert("/system/identity", {"name": f"SIM-RTR-{self.index:04d}"})
+        self._insert("/system/resource", {
+            "board-name": "CCR2004-1G-12S+2XS", "version": "7.15.3 (stable)", "architecture-name": "arm64",
+            "total-memory": "4294967296", "total-hdd-space": "134217728",
+        })
+        for i, kind in enumerate(["ether", "ether", "sfp-sfpplus", "bridge", "vlan"]):
+            self._insert("/interface", {"name": f"{kind}{i + 1}", "type": kind, "running": "true", "disabled": "false"})
+        self._insert("/ip/address", {"address": "192.168.88.1/24", "interface": "ether2", "comment": "lan"})
+        self._insert("/ip/service", {"name": "api", "port": "8728", "disabled": "false"})
+        self._insert("/ip/service", {"name": "api-ssl", "port": str(ROUTEROS_API_SSL_PORT), "disabled": "false"})
+        self._insert("/user/group", {"name": "full", "policy": "local,ssh,read,write,api,rest-api"})
+        self._insert("/user", {"name": SIM_USERNAME, "group": "full"})
+        for i in range(ppp_secrets):
+            name = f"sim{self.index:04d}-{i:05d}"
+            self._insert("/ppp/secret", {"name": name, "password": "x", "profile": "default", "service": "pppoe",
+                                         "disabled": "false", "comment": f"SIM cliente {i}"})
+            if self._rng.random() < 0.9:
+                self._insert("/ppp/active", {
+                    "name": name, "service": "pppoe", "caller-id": "24:5A:4C:%02X:%02X:%02X" % (
+                        self.index & 0xFF, (i >> 8) & 0xFF, i & 0xFF),
+                    "address": f"100.{64 + (self.index % 64)}.{(i >> 8) & 0xFF}.{i & 0xFF}",
+                    "uptime": f"{self._rng.randint(1, 72)}h{self._rng.randint(0, 59)}m",
+                })
+                address = f"100.{64 + (self.index % 64)}.{(i >> 8) & 0xFF}.{i & 0xFF}"
+                self._insert("/queue/simple", {"name": f"<pppoe-{name}>", "target": f"{address}/32",
+                                               "max-limit": "10M/50M", "dynamic": "true"})
+
+    def _dynamic(self, path: str, item: Dict[str, str]) -> Dict[str, str]:
+        if path == "/system/resource":
+            uptime = int(time.time() - self.started_at)
+            d, rem = divmod(uptime, 86400)
+            h, rem = divmod(rem, 3600)
+            m, s = divmod(rem, 60)
+            return {**item, "uptime": f"{d}d{h}h{m}m{s}s", "cpu-load": str(self._rng.randint(1, 40)),
+                    "free-memory": str(self._rng.randint(2, 3) * 10 ** 9), "free-hdd-space": "90000000"}
+        # Contadores crecientes con el tiempo, distintos por fila
+        elapsed = time.time() - self.started_at
+        rate = 1000 + int(item.get(".id", "*0")[1:], 16) * 7919 % 50000
+        if path == "/interface":
+            return {**item, "rx-byte": str(int(elapsed * rate * 40)), "tx-byte": str(int(elapsed * rate * 8))}
+        if path == "/queue/simple":
+            return {**item, "bytes": f"{int(elapsed * rate)}/{int(elapsed * rate * 5)}",
+                    "packets": f"{int(elapsed * rate / 600)}/{int(elapsed * rate * 5 / 1200)}"}
+        return item
+
+    def _notify(self, path: str, item: Dict[str, str], dead: bool = False):
+        """Envía el cambio de una fila a las sesiones con 'listen' sobre esa ruta."""
+        for writer, tag in list(self._listeners.get(path, ())):
+            tag_words = [f".tag={tag}"] if tag is not None else []
+            words = ["!re", f"=.id={item['.id']}", "=.dead=yes"] if dead else \
+                ["!re"] + [f"={k}={v}" for k, v in item.items()]
+            writer.write(_encode_sentence(words + tag_words))
+
+    def _drop_listeners(self, writer):
+        for path in self._listeners:
+            self._listeners[path] = [(w, t) for w, t in self._listeners[path] if w is not writer]
+
+    def churn_ppp_sessions(self, count: int):
+        """Desconecta `count` sesiones PPP activas y conecta otras tantas (para probar 'listen')."""
+        active = self.tables.setdefault("/ppp/active", [])
+        for item in self._rng.sample(active, min(count, len(active))):
+            active.remove(item)
+            self._notify("/ppp/active", item, dead=True)
+        for _ in range(count):
+            n = self._next_id
+            item = {"name": f"sim{self.index:04d}-churn{n}", "service": "pppoe",
+                    "caller-id": "24:5A:4D:%02X:%02X:%02X" % (self.index & 0xFF, (n >> 8) & 0xFF, n & 0xFF),
+                    "address": f"100.127.{(n >> 8) & 0xFF}.{n & 0xFF}", "uptime": "0s"}
+            self._insert("/ppp/active", item)
+            self._notify("/ppp/active", active[-1])
+
+    # Tablas de estado (no de configuración) que no aparecen en /export
+    _NOT_EXPORTED = ("/ppp/active", "/system/resource", "/file", "/certificate", "/user", "/interface")
+
+    def export_config(self) -> str:
+        """Texto al estilo de '/export': una sección por menú con sus filas estáticas."""
+        resource = self.tables["/system/resource"][0]
+        lines = [f"# {datetime.datetime.now():%Y-%m-%d %H:%M:%S} by RouterOS {resource['version'].split()[0]}",
+                 f"# software id = SIM-{self.index:04d}", "#", f"# model = {resource['board-name']}"]
+        for path in sorted(self.tables):
+            if path in self._NOT_EXPORTED:
+                continue
+            rows = [row for row in self.tables[path] if row.get("dynamic") != "true"]
+            if not rows:
+                continue
+            lines.append(path.replace("/", " ").strip().join(["/", ""]))
+            verb = "set" if path == "/system/identity" else "add"
+            for row in rows:
+                values = " ".join(f"{k}={v}" if " " not in v else f'{k}="{v}"' for k, v in row.items()
+                                  if k not in (".id", "dynamic", "bytes"))
+                lines.append(f"{verb} {values}")
+        return "\n".join(lines) + "\n"
+
+    def _execute(self, words: List[str], writer: Any = None) -> List[List[str]]:
+        command = words[0]
+        attributes: Dict[str, str] = {}
+        queries: List[str] = []
+        tag = None
+        for word in words[1:]:
+            if word.startswith("="):
+                key, _, value = word[1:].partition("=")
+                attributes[key] = value
+            elif word.startswith("?"):
+                queries.append(word[1:])
+            elif word.startswith(".tag="):
+                tag = word[5:]
+        tag_words = [f".tag={tag}"] if tag is not None else []
+
+        path, _, verb = command.rpartition("/")
+        if command == "/login":
+            return [["!done"] + tag_words]
+        if command == "/cancel":
+            cancelled = attributes.get("tag")
+            replies = []
+            for listen_path, listeners in self._listeners.items():
+                if (writer, cancelled) in listeners:
+                    listeners.remove((writer, cancelled))
+                    replies += [["!trap", "=category=2", "=message=interrupted", f".tag={cancelled}"],
+                                ["!done", f".tag={cancelled}"]]
+            return replies + [["!done"] + tag_words]
+
+        if command == "/export":
+            # Con 'file=' el resultado queda en /file como <nombre>.rsc
+            name = attributes.get("file")
+            if not name:
+                return [["!trap", "=message=export sin file= no está soportado por el simulador"] + tag_words,
+                        ["!done"] + tag_words]
+            name = name if name.endswith(".rsc") else f"{name}.rsc"
+            contents = self.export_config()
+            self.tables["/file"] = [f for f in self.tables.get("/file", []) if f.get("name") != name]
+            self._insert("/file", {"name": name, "type": "script", "size": str(len(contents.encode())),
+                                   "contents": contents})
+            return [["!done"] + tag_words]
+        if command == "/file/read":
+            files = [f for f in self.tables.get("/file", []) if f.get("name") == attributes.get("file")]
+            if not files:
+                return [["!trap", "=message=no such file"] + tag_words, ["!done"] + tag_words]
+            data = files[0]["contents"].encode()
+            offset, size = int(attributes.get("offset", 0)), int(attributes.get("chunk-size", 4096))
+            return [["!re", f"=data={data[offset:offset + size].decode()}"] + tag_words, ["!done"] + tag_words]
+
+        table = self.tables.setdefault(path, [])
+        if verb == "listen":
+            # Sin respuesta inmediata: los cambios llegan como '!re' hasta '/cancel'
+            self._listeners.setdefault(path, []).append((writer, tag))
+            return []
+        if verb in ("print", "getall"):
+            proplist = attributes.get(".proplist")
+            keys = proplist.split(",") if proplist else None
+            replies = []
+            for item in table:
+                if queries and not _match_query(item, queries):
+                    continue
+                item = self._dynamic(path, item)
+                shown = {k: item[k] for k in keys if k in item} if keys else item
+                replies.append(["!re"] + [f"={k}={v}" for k, v in shown.items()] + tag_words)
+            return replies + [["!done"] + tag_words]
+        if verb == "add":
+            if path == "/queue/simple":
+                attributes.setdefault("dynamic", "false")
+            new_id = self._insert(path, attributes)
+            self._notify(path, table[-1])
+            return [["!done", f"=ret={new_id}"] + tag_words]
+        if verb in ("set", "remove", "enable", "disable", "sign"):
+            ids = set((attributes.get(".id") or attributes.get("numbers") or "").split(","))
+            matched = [item for item in table if item.get(".id") in ids]
+            if not matched:
+                return [["!trap", "=message=no such item"] + tag_words, ["!done"] + tag_words]
+            for item in matched:
+                if verb == "remove":
+                    table.remove(item)
+                    self._notify(path, item, dead=True)
+                    continue
+                elif verb == "set":
+                    item.update({k: v for k, v in attributes.items() if k not in (".id", "numbers")})
+                elif verb in ("enable", "disable"):
+                    item["disabled"] = "true" if verb == "disable" else "false"
+                elif verb == "sign":
+                    item["trusted"] = "true"
+                    item["private-key"] = "true"
+                self._notify(path, item)
+            return [["!done"] + tag_words]
+        return [["!trap", f"=message=no such command ({command})"] + tag_words, ["!done"] + tag_words]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                words = await _read_sentence(reader)
+                if not words:
+                    continue
+                await _simulate_latency(self.profile)
+                if self.profile.failure_rate and self._rng.random() < self.profile.failure_rate:
+                    break
+                writer.write(b"".join(_encode_sentence(reply) for reply in self._execute(words, writer)))
+                await writer.drain()
+                if words[0] == "/quit":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, ssl.SSLError):
+            pass
+        finally:
+            self._drop_listeners(writer)
+            writer.close()
+
+
+# --- Granja de dispositivos ---
+
+@dataclass
+class DeviceFarm:
+    """
+    Conjunto de APs y Routers simulados sobre direcciones 127.x.y.z (en Linux
+    todo 127.0.0.0/8 llega a loopback sin configurar alias).
+    """
+    ap_count: int = 0
+    router_count: int = 0
+    ap_profile: DeviceProfile = field(default_factory=DeviceProfile)
+    router_profile: DeviceProfile = field(default_factory=DeviceProfile)
+    ppp_secrets_per_router: int = 0
+    ap_network: str = DEFAULT_AP_NETWORK
+    router_network: str = DEFAULT_ROUTER_NETWORK
+    ap_port: int = AIROS_PORT
+    router_port: int = ROUTEROS_API_SSL_PORT
+
+    def __post_init__(self):
+        self.aps: List[SimulatedAP] = []
+        self.routers: List[SimulatedRouter] = []
+        self._servers: List[asyncio.base_events.Server] = []
+        self._connections: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _addresses(network: str, count: int) -> List[str]:
+        hosts = ipaddress.ip_network(network).hosts()
+        addresses = []
+        for address in hosts:
+            if len(addresses) >= count:
+                break
+            addresses.append(str(address))
+        if len(addresses) < count:
+            raise ValueError(f"La red {network} no tiene {count} direcciones.")
+        return addresses
+
+    def _tracked(self, handler):
+        """Registra la tarea de cada conexión para poder cerrarlas al parar la granja."""
+        async def _handle(reader, writer):
+            task = asyncio.current_task()
+            self._connections.add(task)
+            try:
+                await handler(reader, writer)
+            except asyncio.CancelledError:
+                writer.transport.abort()
+            finally:
+                self._connections.discard(task)
+        return _handle
+
+    async def start(self):
+        cert_path, key_path = generate_self_signed_cert()
+        context = _server_ssl_context(cert_path, key_path)
+        for i, address in enumerate(self._addresses(self.ap_network, self.ap_count)):
+            ap = SimulatedAP(address, self.ap_port, self.ap_profile, index=i)
+            self.aps.append(ap)
+            if not ap.profile.offline:
+                self._servers.append(await asyncio.start_server(self._tracked(ap.handle), address, self.ap_port, ssl=context))
+        for i, address in enumerate(self._addresses(self.router_network, self.router_count)):
+            router = SimulatedRouter(address, self.router_port, self.router_profile, index=i,
+                                     ppp_secrets=self.ppp_secrets_per_router)
+            self.routers.append(router)
+            if not router.profile.offline:
+                self._servers.append(await asyncio.start_server(self._tracked(router.handle), address, self.router_port, ssl=context))
+        logging.info(f"Simulador: {len(self.aps)} APs en {self.ap_network}:{self.ap_port} y "
+                     f"{len(self.routers)} Routers en {self.router_network}:{self.router_port}.")
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers.clear()
+
+    def start_in_thread(self) -> "DeviceFarm":
+        """Arranca la granja en un hilo propio (para usarla dentro de otro proceso, p. ej. benchmarks)."""
+        ready = threading.Event()
+        errors: List[BaseException] = []
+
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start())
+            except BaseException as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, name="DeviceFarm", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def call_in_loop(self, fn, *args):
+        """Ejecuta fn(*args) en el bucle de la granja (p. ej. router.churn_ppp_sessions) y espera el resultado."""
+        async def _call():
+            return fn(*args)
+        return asyncio.run_coroutine_threadsafe(_call(), self._loop).result()
+
+    def stop_thread(self):
+        if self._loop and self._thread:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
@@ -0,0 +1,331 @@
+# app/core/flow_collector.py
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..db import flows_db
+from ..db.settings_db import get_setting
+
+# --- Constantes ---
+DEFAULT_PORT = 2055
+BUCKET_SECONDS = 300            # Intervalo de agregación
+FLUSH_INTERVAL = 10             # Segundos entre escrituras de agregados
+MAX_PENDING_KEYS = 200_000      # Con más claves en memoria se escribe sin esperar al intervalo
+ADDRESS_REFRESH_SECONDS = 60    # Recarga de las IPs de abonados (sesiones PPP y CPEs)
+STATS_LOG_INTERVAL = 60
+RECEIVE_BUFFER_BYTES = 8 * 1024 * 1024
+
+NETFLOW_V9 = 9
+IPFIX = 10
+_V9_HEADER = struct.Struct("!HHIIII")    # versión, registros, sysUptime, unix_secs, secuencia, source_id
+_IPFIX_HEADER = struct.Struct("!HHIII")  # versión, longitud, export_time, secuencia, dominio de observación
+_SET_HEADER = struct.Struct("!HH")       # id del set, longitud
+_PAIR = struct.Struct("!HH")             # (id de plantilla, campos) o (tipo, longitud)
+_TEMPLATE_SET_IDS = {NETFLOW_V9: 0, IPFIX: 2}
+_FIRST_DATA_SET_ID = 256
+_ENTERPRISE_BIT = 0x8000
+_VARIABLE_LENGTH = 0xFFFF
+
+# Elementos de información que se usan (mismos IDs en NetFlow v9 e IPFIX)
+FIELD_BYTES = 1
+FIELD_PACKETS = 2
+FIELD_PROTOCOL = 4
+FIELD_IPV4_SRC = 8
+FIELD_IPV4_DST = 12
+FIELD_IPV6_SRC = 27
+FIELD_IPV6_DST = 28
+_UINT_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+_ADDRESS_FORMATS = {(FIELD_IPV4_SRC, 4): "I", (FIELD_IPV4_DST, 4): "I",
+                    (FIELD_IPV6_SRC, 16): "16s", (FIELD_IPV6_DST, 16): "16s"}
+
+
+class FlowTemplate:
+    """
+    Plantilla compilada: un struct.Struct que cubre el registro entero (los
+    campos que no interesan se saltan con 'x') y la posición en la tupla
+    desempaquetada de cada campo útil. Las IPv4 se leen como enteros y las
+    IPv6 como 16 bytes, que es como se indexan las IPs de los abonados.
+    """
+    __slots__ = ("record", "length", "src", "dst", "protocol", "bytes", "packets")
+
+    def __init__(self, record: struct.Struct, positions: Dict[int, int]):
+        self.record = record
+        self.length = record.size
+        self.src = positions.get(FIELD_IPV4_SRC, positions.get(FIELD_IPV6_SRC))
+        self.dst = positions.get(FIELD_IPV4_DST, positions.get(FIELD_IPV6_DST))
+        self.protocol = positions[FIELD_PROTOCOL]
+        self.bytes = positions[FIELD_BYTES]
+        self.packets = positions[FIELD_PACKETS]
+
+
+def compile_template(fields: Sequence[Tuple[int, int]]) -> Optional[FlowTemplate]:
+    """
+    Compila los campos (tipo, longitud) de una plantilla. Devuelve None si no
+    sirve para contabilizar (le faltan direcciones, protocolo o contadores, o
+    tiene campos de longitud variable).
+    """
+    codes = ["!"]
+    positions: Dict[int, int] = {}
+    for field_type, length in fields:
+        if length == _VARIABLE_LENGTH:
+            return None
+        if field_type in (FIELD_BYTES, FIELD_PACKETS, FIELD_PROTOCOL):
+            code = _UINT_FORMATS.get(length)
+        else:
+            code = _ADDRESS_FORMATS.get((field_type, length))
+        if code is None or field_type in positions:
+            codes.append(f"{length}x")
+            continue
+        positions[field_type] = len(positions)
+        codes.append(code)
+    has_addresses = (FIELD_IPV4_SRC in positions and FIELD_IPV4_DST in positions) or \
+                    (FIELD_IPV6_SRC in positions and FIELD_IPV6_DST in positions)
+    if not has_addresses or not {FIELD_PROTOCOL, FIELD_BYTES, FIELD_PACKETS} <= positions.keys():
+        return None
+    record = struct.Struct("".join(codes))
+    return FlowTemplate(record, positions) if record.size else None
+
+
+def _address_key(address: str) -> Any:
+    ip = ipaddress.ip_address(address)
+    return int(ip) if ip.version == 4 else ip.packed
+
+
+def _address_text(key: Any) -> str:
+    return str(ipaddress.IPv4Address(key) if isinstance(key, int) else ipaddress.IPv6Address(key))
+
+
+_MISSING = object()
+
+
+class FlowAggregator:
+    """
+    Decodifica datagramas NetFlow v9 / IPFIX y acumula en memoria, por
+    (intervalo, IP del abonado, protocolo): bytes y paquetes de subida y
+    bajada y número de flujos. Un flujo cuenta como bajada si su destino es
+    una IP de abonado y como subida si lo es su origen; los demás se
+    descartan. Los datos se recorren con memoryview e iter_unpack, sin copiar
+    el datagrama ni crear objetos por campo.
+
+    El intervalo se toma del reloj del colector al recibir el datagrama (el
+    de los routers puede no estar sincronizado).
+    """
+    def __init__(self, bucket_seconds: int = BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        # (exportador, source_id/dominio, id de plantilla) -> plantilla (None: no útil)
+        self.templates: Dict[Tuple[str, int, int], Optional[FlowTemplate]] = {}
+        self.addresses: Dict[Any, str] = {}
+        self.aggregates: Dict[Tuple[int, Any, int], List[int]] = {}
+        self.stats = {"datagrams": 0, "flows": 0, "attributed": 0, "no_template": 0, "malformed": 0}
+
+    def set_addresses(self, pairs: Iterable[Tuple[str, str]]):
+        """Sustituye el mapa IP -> abonado (usuario PPP o MAC del CPE)."""
+        addresses = {}
+        for address, subscriber in pairs:
+            try:
+                addresses[_address_key(address)] = subscriber
+            except ValueError:
+                continue
+        self.addresses = addresses
+
+    def feed(self, data: bytes, exporter: str, received_at: Optional[float] = None):
+        self.stats["datagrams"] += 1
+        try:
+            self._parse(memoryview(data), exporter, received_at or time.time())
+        except (struct.error, ValueError):
+            self.stats["malformed"] += 1
+
+    def _parse(self, view: memoryview, exporter: str, received_at: float):
+        version = _PAIR.unpack_from(view)[0]
+        if version == NETFLOW_V9:
+            domain = _V9_HEADER.unpack_from(view)[5]
+            offset, end = _V9_HEADER.size, len(view)
+        elif version == IPFIX:
+            _, length, _, _, domain = _IPFIX_HEADER.unpack_from(view)
+            offset, end = _IPFIX_HEADER.size, min(length, len(view))
+        else:
+            raise ValueError(f"versión {version} no soportada")
+        bucket = int(received_at) - int(received_at) % self.bucket_seconds
+
+        while offset + _SET_HEADER.size <= end:
+            set_id, set_length = _SET_HEADER.unpack_from(view, offset)
+            if set_length < _SET_HEADER.size or offset + set_length > end:
+                raise ValueError("longitud de set inválida")
+            body = view[offset + _SET_HEADER.size:offset + set_length]
+            if set_id >= _FIRST_DATA_SET_ID:
+                self._data_set(exporter, domain, set_id, body, bucket)
+            elif set_id == _TEMPLATE_SET_IDS[version]:
+                self._template_set(exporter, domain, body, version == IPFIX)
+            # Las plantillas de opciones no se usan: sus datos se saltan por longitud
+            offset += set_length
+
+    def _template_set(self, exporter: str, domain: int, body: memoryview, ipfix: bool):
+        pos = 0
+        while pos + _PAIR.size <= len(body):
+            template_id, field_count = _PAIR.unpack_from(body, pos)
+            pos += _PAIR.size
+            if template_id < _FIRST_DATA_SET_ID:
+                break  # Relleno al final del set
+            fields = []
+            for _ in range(field_count):
+                field_type, length = _PAIR.unpack_from(body, pos)
+                pos += _PAIR.size
+                if ipfix and field_type & _ENTERPRISE_BIT:
+                    # Campo de empresa: número de empresa detrás; nunca coincide con los estándar
+                    pos += 4
+                fields.append((field_type, length))
+            if pos > len(body):
+                raise ValueError("plantilla truncada")
+            self.templates[(exporter, domain, template_id)] = compile_template(fields)
+
+    def _data_set(self, exporter: str, domain: int, set_id: int, body: memoryview, bucket: int):
+        template = self.templates.get((exporter, domain, set_id), _MISSING)
+        if template is _MISSING:
+            self.stats["no_template"] += 1
+            return
+        if template is None:
+            return
+        count = len(body) // template.length
+        if not count:
+            return
+        addresses, aggregates = self.addresses, self.aggregates
+        src, dst, protocol = template.src, template.dst, template.protocol
+        octets, packets = template.bytes, template.packets
+        attributed = 0
+        for record in template.record.iter_unpack(body[:count * template.length]):
+            address = record[dst]
+            if address in addresses:
+                key = (bucket, address, record[protocol])
+                entry = aggregates.get(key)
+                if entry is None:
+                    entry = aggregates[key] = [0, 0, 0, 0, 0]
+                entry[1] += record[octets]
+                entry[3] += record[packets]
+                entry[4] += 1
+                attributed += 1
+                continue
+            address = record[src]
+            if address in addresses:
+                key = (bucket, address, record[protocol])
+                entry = aggregates.get(key)
+                if entry is None:
+                    entry = aggregates[key] = [0, 0, 0, 0, 0]
+                entry[0] += record[octets]
+                entry[2] += record[packets]
+                entry[4] += 1
+                attributed += 1
+        self.stats["flows"] += count
+        self.stats["attributed"] += attributed
+
+    def drain(self) -> List[Tuple]:
+        """Entrega los agregados acumulados como filas para flows_db y empieza de cero."""
+        aggregates, self.aggregates = self.aggregates, {}
+        addresses = self.addresses
+        return [
+            (datetime.utcfromtimestamp(bucket), _address_text(address), addresses.get(address), protocol, *counters)
+            for (bucket, address, protocol), counters in aggregates.items()
+        ]
+
+
+class _FlowProtocol(asyncio.DatagramProtocol):
+    def __init__(self, collector: "FlowCollector"):
+        self.collector = collector
+
+    def datagram_received(self, data: bytes, addr):
+        aggregator = self.collector.aggregator
+        aggregator.feed(data, addr[0])
+        if len(aggregator.aggregates) > MAX_PENDING_KEYS:
+            self.collector.flush_now.set()
+
+
+class FlowCollector:
+    """
+    Colector UDP de Traffic-Flow (NetFlow v9 / IPFIX) de los routers. Todo
+    el decodificado ocurre en el hilo del bucle asyncio; las escrituras en
+    SQLite y la recarga de IPs van a un único hilo aparte, en orden.
+    """
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "0.0.0.0", bucket_seconds: int = BUCKET_SECONDS):
+        self.host = host
+        self.port = port
+        self.aggregator = FlowAggregator(bucket_seconds)
+        self.flush_now: Optional[asyncio.Event] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Flow-DB")
+
+    async def _refresh_addresses(self):
+        loop = asyncio.get_running_loop()
+        try:
+            pairs = await loop.run_in_executor(self._executor, flows_db.get_subscriber_addresses)
+            self.aggregator.set_addresses(pairs)
+        except Exception as e:
+            logging.error(f"No se pudieron cargar las IPs de los abonados: {e}")
+
+    async def flush(self):
+        rows = self.aggregator.drain()
+        if not rows:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, flows_db.save_flow_aggregates, rows)
+        except Exception as e:
+            logging.error(f"No se pudieron guardar {len(rows)} agregados de flujos: {e}")
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        self.flush_now = asyncio.Event()
+        await self._refresh_addresses()
+        transport, _ = await loop.create_datagram_endpoint(lambda: _FlowProtocol(self),
+                                                           local_addr=(self.host, self.port))
+        try:
+            # Búfer grande: absorbe las ráfagas mientras el bucle está ocupado
+            transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+        except OSError:
+            pass
+        logging.info(f"Colector de flujos escuchando en UDP {self.host}:{self.port} "
+                     f"({len(self.aggregator.addresses)} IPs de abonados).")
+        last_refresh = last_log = time.monotonic()
+        last_flows = 0
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self.flush_now.wait(), FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self.flush_now.clear()
+                await self.flush()
+                now = time.monotonic()
+                if now - last_refresh >= ADDRESS_REFRESH_SECONDS:
+                    await self._refresh_addresses()
+                    last_refresh = now
+                if now - last_log >= STATS_LOG_INTERVAL:
+                    stats = self.aggregator.stats
+                    logging.info(f"Flujos: {(stats['flows'] - last_flows) / (now - last_log):.0f}/s; "
+                                 f"totales {stats}.")
+                    last_flows, last_log = stats['flows'], now
+        finally:
+            transport.close()
+            await self.flush()
+            self._executor.shutdown(wait=True)
+
+
+def run_flow_collector():
+    """Punto de entrada del proceso del colector (lo lanza launcher.py si está activado)."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - [FlowCollector] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    try:
+        port = int(get_setting('flow_collector_port') or DEFAULT_PORT)
+    except ValueError:
+        port = DEFAULT_PORT
+    try:
+        asyncio.run(FlowCollector(port).serve())
+    except KeyboardInterrupt:
+        logging.info("Señal de interrupción recibida en el colector de flujos.")
@@ -0,0 +1,94 @@
+# app/core/jobs.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..db import jobs_db
+from ..db.settings_db import get_setting
+
+# --- Constantes ---
+DEFAULT_MAX_WORKERS = 4
+# Reinicios del servicio que puede sobrevivir un trabajo antes de darlo por fallido
+MAX_ATTEMPTS = 3
+
+
+class JobContext:
+    """Lo que recibe cada manejador: el ID del trabajo y un modo de informar su progreso."""
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+
+    def progress(self, percent: int, message: Optional[str] = None):
+        jobs_db.update_progress(self.job_id, max(0, min(100, int(percent))), message)
+
+
+JobHandler = Callable[[JobContext, Optional[str], Dict[str, Any]], Dict[str, Any]]
+
+
+class JobRunner:
+    """
+    Cola de trabajos persistente: cada trabajo se anota en la tabla 'jobs' y
+    lo ejecuta un pool de hilos acotado ('job_max_workers'). Al arrancar se
+    reencolan los que quedaron a medias, así que los manejadores deben ser
+    idempotentes. Un manejador devuelve un dict con el resultado o lanza una
+    excepción si falla.
+    """
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                try:
+                    workers = max(1, int(get_setting('job_max_workers') or DEFAULT_MAX_WORKERS))
+                except ValueError:
+                    workers = DEFAULT_MAX_WORKERS
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Job")
+            return self._executor
+
+    def start(self):
+        """Reencola los trabajos interrumpidos y lanza todos los pendientes."""
+        requeued = jobs_db.requeue_interrupted_jobs(MAX_ATTEMPTS)
+        if requeued:
+            logging.info(f"Trabajos: {requeued} reencolados tras el reinicio.")
+        for job_id in jobs_db.get_queued_job_ids():
+            self._get_executor().submit(self._run, job_id)
+
+    def submit(self, kind: str, target: Optional[str], params: Dict[str, Any],
+               created_by: Optional[str] = None) -> int:
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        job_id = jobs_db.create_job(kind, target, params, created_by)
+        self._get_executor().submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id: int):
+        claimed = jobs_db.claim_job(job_id)
+        if not claimed:
+            return
+        kind, target, params = claimed
+        handler = self._handlers.get(kind)
+        try:
+            if handler is None:
+                raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+            result = handler(JobContext(job_id), target, params)
+            jobs_db.finish_job(job_id, "succeeded", (result or {}).get("message"), result)
+        except Exception as e:
+            logging.error(f"Trabajo {job_id} ({kind} {target}) falló: {e}")
+            jobs_db.finish_job(job_id, "failed", str(e) or type(e).__name__)
+
+    def stop(self):
+        """No espera a los trabajos en curso: si el proceso termina, se reencolan al arrancar."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_runner = JobRunner()
@@ -0,0 +1,205 @@
+# app/core/limiter.py
+
+import os
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl  # Solo en Linux/Unix: permite el bloqueo entre procesos
+except ImportError:
+    fcntl = None
+
+from ..db.settings_db import get_setting
+
+# --- Constantes ---
+LOCK_DIR = "locks"
+DEFAULT_ZONE_MAX_CONCURRENCY = 4
+SETTINGS_REFRESH_SECONDS = 60
+LOCK_POLL_INTERVAL = 0.05
+
+class DeviceBusyError(TimeoutError):
+    """No se consiguió turno para el dispositivo dentro del tiempo de espera."""
+
+class _FairSemaphore:
+    """Semáforo con cola FIFO: los hilos obtienen el turno en orden de llegada."""
+    def __init__(self, value: int):
+        self.value = value
+        self._in_use = 0
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            ticket = object()
+            self._waiters.append(ticket)
+            try:
+                while self._waiters[0] is not ticket or self._in_use >= self.value:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self._in_use += 1
+                return True
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify_all()
+
+class DeviceLimiter:
+    """
+    Limita las peticiones simultáneas a los dispositivos de red.
+
+    - Por dispositivo (host): una sola petición en curso. Se aplica entre
+      hilos y, en Linux, también entre procesos (monitor y API) mediante un
+      archivo de bloqueo por host.
+    - Por zona (zona_id): como máximo 'zone_max_concurrency' peticiones en
+      curso dentro de cada proceso, atendidas en orden de llegada.
+
+    El orden de adquisición es siempre host -> zona, así nunca se retiene un
+    turno de zona mientras se espera a un dispositivo ocupado.
+    """
+    def __init__(self, lock_dir: str = LOCK_DIR):
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._zone_semaphores: Dict[Hashable, _FairSemaphore] = {}
+        self._zone_limit = DEFAULT_ZONE_MAX_CONCURRENCY
+        self._zone_limit_loaded_at = 0.0
+
+    def zone_limit(self) -> int:
+        """Límite por zona, releído de la configuración cada cierto tiempo."""
+        now = time.monotonic()
+        if now - self._zone_limit_loaded_at > SETTINGS_REFRESH_SECONDS:
+            self._zone_limit_loaded_at = now
+            try:
+                value = get_setting('zone_max_concurrency')
+                self._zone_limit = int(value) if value and value.isdigit() and int(value) > 0 else DEFAULT_ZONE_MAX_CONCURRENCY
+            except Exception as e:
+                logging.warning(f"No se pudo leer 'zone_max_concurrency': {e}")
+        return self._zone_limit
+
+    def _get_host_lock(self, host: str) -> threading.Lock:
+        with self._lock:
+            return self._host_locks.setdefault(host, threading.Lock())
+
+    def _get_zone_semaphore(self, zona_id: Hashable) -> _FairSemaphore:
+        limit = self.zone_limit()
+        with self._lock:
+            semaphore = self._zone_semaphores.get(zona_id)
+            if semaphore is None:
+                semaphore = self._zone_semaphores[zona_id] = _FairSemaphore(limit)
+            semaphore.value = limit
+            return semaphore
+
+    def _lock_file_path(self, host: str) -> str:
+        safe_host = re.sub(r'[^A-Za-z0-9_.-]', '_', host)
+        return os.path.join(self.lock_dir, f"{safe_host}.lock")
+
+    def _acquire_file_lock(self, host: str, deadline: Optional[float]):
+        if fcntl is None:
+            return None
+        os.makedirs(self.lock_dir, exist_ok=True)
+        lock_file = open(self._lock_file_path(host), "a")
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    lock_file.close()
+                    return False
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    @contextmanager
+    def acquire(self, host: str, zona_id: Optional[Hashable] = None, timeout: Optional[float] = None):
+        """
+        Context manager que reserva el turno del dispositivo (y de su zona).
+        Lanza DeviceBusyError si no lo consigue antes de 'timeout' segundos.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        host_lock = self._get_host_lock(host)
+        if not host_lock.acquire(timeout=-1 if deadline is None else remaining()):
+            raise DeviceBusyError(f"El dispositivo {host} está ocupado.")
+        lock_file = None
+        zone_semaphore = None
+        try:
+            lock_file = self._acquire_file_lock(host, deadline)
+            if lock_file is False:
+                lock_file = None
+                raise DeviceBusyError(f"El dispositivo {host} está ocupado por otro proceso.")
+            if zona_id is not None:
+                zone_semaphore = self._get_zone_semaphore(zona_id)
+                if not zone_semaphore.acquire(timeout=remaining()):
+                    zone_semaphore = None
+                    raise DeviceBusyError(f"La zona {zona_id} tiene demasiadas peticiones en curso.")
+            yield
+        finally:
+            if zone_semaphore is not None:
+                zone_semaphore.release()
+            if lock_file is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+            host_lock.release()
+
+def run_fair_by_zone(tasks: Iterable[Tuple[Optional[Hashable], Callable[[], Any]]], max_workers: int, zone_limit: int) -> List[Any]:
+    """
+    Ejecuta tareas (zona, función) en un pool de hilos repartiendo los turnos
+    por zona en round-robin. Una zona no recibe más de 'zone_limit' hilos a la
+    vez, de modo que una zona grande no acapara el pool ni deja hilos
+    bloqueados esperando su semáforo mientras otras zonas esperan.
+    """
+    queues: "OrderedDict[Optional[Hashable], deque]" = OrderedDict()
+    for zona_id, func in tasks:
+        queues.setdefault(zona_id, deque()).append(func)
+
+    running: Dict[Optional[Hashable], int] = {}
+    zone_of_future = {}
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        while queues or pending:
+            submitted = True
+            while submitted and len(pending) < max_workers:
+                submitted = False
+                for zona_id in list(queues.keys()):
+                    if len(pending) >= max_workers:
+                        break
+                    if running.get(zona_id, 0) >= zone_limit:
+                        continue
+                    future = executor.submit(queues[zona_id].popleft())
+                    pending.add(future)
+                    zone_of_future[future] = zona_id
+                    running[zona_id] = running.get(zona_id, 0) + 1
+                    submitted = True
+                    if queues[zona_id]:
+                        queues.move_to_end(zona_id)
+                    else:
+                        del queues[zona_id]
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                running[zone_of_future.pop(future)] -= 1
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logging.exception(f"Error no controlado en una tarea del monitor: {e}")
+    return results
+
+# Instancia compartida por todos los módulos de este proceso
+device_limiter = DeviceLimiter()
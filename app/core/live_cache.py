@@ -0,0 +1,67 @@
+# app/core/live_cache.py
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+class LiveDataCache:
+    """
+    Caché en memoria con coalescencia de peticiones ("singleflight") para
+    lecturas en vivo de dispositivos.
+
+    - Si hay un resultado más joven que 'max_age' segundos, se devuelve sin
+      tocar el dispositivo.
+    - Si ya hay una lectura en curso para la misma clave, los demás llamadores
+      esperan ese mismo resultado en lugar de abrir otra conexión.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, Future] = {}
+
+    def get(self, key: str, max_age: float, fetch: Callable[[], Tuple[Any, Optional[float]]]) -> Any:
+        """
+        Devuelve el valor cacheado para 'key' o lo obtiene con 'fetch'.
+
+        Args:
+            key (str): Clave del dispositivo (normalmente el host).
+            max_age (float): Antigüedad máxima aceptable, en segundos.
+            fetch (callable): Función sin argumentos que devuelve una tupla
+                (valor, timestamp_epoch). Si el timestamp es None se usa el
+                momento actual. Un valor None no se guarda en caché.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] <= max_age:
+                return entry[1]
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            value, fetched_at = fetch()
+            if value is not None:
+                self.put(key, value, fetched_at)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def put(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        """Guarda un valor con su momento de obtención (epoch)."""
+        with self._lock:
+            self._entries[key] = (fetched_at if fetched_at is not None else time.time(), value)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,259 @@
+# app/core/liveness.py
+
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from ..db.settings_db import get_setting
+from ..db.aps_db import get_enabled_ap_hosts
+from ..db.router_db import get_enabled_router_hosts
+from ..db.cpes_db import get_cpe_ips
+from .circuit_breaker import split_host_port
+
+# --- Constantes ---
+DEFAULT_INTERVAL_SECONDS = 5
+REPLY_TIMEOUT_SECONDS = 1.5
+HISTORY_SIZE = 60            # Muestras guardadas por dispositivo (anillo)
+DOWN_AFTER_LOSSES = 3        # Pérdidas seguidas para declarar un dispositivo caído
+TARGETS_REFRESH_SECONDS = 60
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# Callback de transición: (host, tipo 'ap' | 'router' | 'cpe', alcanzable)
+TransitionCallback = Callable[[str, str, bool], None]
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _build_echo_request(ident: int, seq: int) -> bytes:
+    payload = b"umonitor-liveness"
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+def open_icmp_socket() -> Tuple[socket.socket, bool]:
+    """
+    Abre un socket ICMP no bloqueante. Prefiere el socket de datagramas sin
+    privilegios de Linux (net.ipv4.ping_group_range); si no está permitido y
+    el proceso tiene CAP_NET_RAW, usa un socket raw.
+    Devuelve (socket, es_raw). Lanza PermissionError si ninguno es posible.
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        is_raw = False
+    except PermissionError:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        is_raw = True
+    sock.setblocking(False)
+    return sock, is_raw
+
+
+class DeviceLiveness:
+    """Historial de RTT (ms, None = perdido) y estado de alcance de un dispositivo."""
+    __slots__ = ("kind", "samples", "consecutive_losses", "reachable")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.samples: Deque[Optional[float]] = deque(maxlen=HISTORY_SIZE)
+        self.consecutive_losses = 0
+        # None = nunca ha respondido ICMP (no se usa para decidir nada)
+        self.reachable: Optional[bool] = None
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        rtts = [s for s in self.samples if s is not None]
+        total = len(self.samples)
+        return {
+            "samples": total,
+            "loss_pct": round(100.0 * (total - len(rtts)) / total, 1) if total else None,
+            "rtt_avg_ms": round(sum(rtts) / len(rtts), 2) if rtts else None,
+            "rtt_last_ms": self.samples[-1] if total else None,
+        }
+
+
+class LivenessSweeper:
+    """
+    Envía ICMP echo a todos los APs, Routers y (opcionalmente) CPEs conocidos
+    cada pocos segundos, en un hilo propio con asyncio e independiente del
+    ciclo de sondeo completo del monitor.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._devices: Dict[str, DeviceLiveness] = {}
+        self._lock = threading.Lock()
+        self._on_transition: Optional[TransitionCallback] = None
+        self._ident = os.getpid() & 0xFFFF
+        self._seq = 0
+
+    # --- Consultas desde el monitor ---
+    def is_reachable(self, host: str) -> Optional[bool]:
+        """True/False según el último barrido; None si el dispositivo nunca respondió ICMP."""
+        with self._lock:
+            device = self._devices.get(host)
+            return device.reachable if device else None
+
+    def get_summaries(self) -> Dict[str, Tuple[str, Dict[str, Optional[float]]]]:
+        """{host: (tipo, resumen de RTT/pérdida)} de los dispositivos con muestras (para la telemetría)."""
+        with self._lock:
+            return {host: (device.kind, device.summary()) for host, device in self._devices.items() if device.samples}
+
+    # --- Ciclo de vida ---
+    def start(self, on_transition: Optional[TransitionCallback] = None) -> bool:
+        """Arranca el barrido en un hilo demonio. Devuelve False si no hay permisos para ICMP."""
+        try:
+            sock, is_raw = open_icmp_socket()
+        except PermissionError:
+            logging.warning("Liveness ICMP desactivado: el proceso no puede abrir sockets ICMP "
+                            "(revise net.ipv4.ping_group_range).")
+            return False
+        self._on_transition = on_transition
+        self.enabled = True
+        thread = threading.Thread(target=lambda: asyncio.run(self._run(sock, is_raw)),
+                                  name="Liveness", daemon=True)
+        thread.start()
+        logging.info(f"Liveness ICMP iniciado (socket {'raw' if is_raw else 'datagrama'}).")
+        return True
+
+    async def _run(self, sock: socket.socket, is_raw: bool):
+        loop = asyncio.get_running_loop()
+        targets: Dict[str, Tuple[str, str]] = {}
+        interval = DEFAULT_INTERVAL_SECONDS
+        next_refresh = 0.0
+        try:
+            while True:
+                started = time.monotonic()
+                if started >= next_refresh:
+                    try:
+                        targets, interval = await loop.run_in_executor(None, self._load_targets)
+                    except Exception as e:
+                        logging.error(f"Liveness: no se pudo cargar la lista de dispositivos: {e}")
+                    next_refresh = started + TARGETS_REFRESH_SECONDS
+                if interval > 0 and targets:
+                    try:
+                        await self._sweep(loop, sock, is_raw, targets)
+                    except Exception as e:
+                        logging.exception(f"Liveness: error en el barrido: {e}")
+                wait = (interval if interval > 0 else TARGETS_REFRESH_SECONDS) - (time.monotonic() - started)
+                await asyncio.sleep(max(wait, 0.1))
+        finally:
+            sock.close()
+
+    def _load_targets(self) -> Tuple[Dict[str, Tuple[str, str]], int]:
+        """Devuelve ({host: (ip, tipo)}, intervalo) leyendo inventario y ajustes."""
+        interval_str = get_setting('liveness_interval')
+        interval = int(interval_str) if interval_str and interval_str.isdigit() else DEFAULT_INTERVAL_SECONDS
+
+        hosts: List[Tuple[str, str]] = [(h, 'ap') for h in get_enabled_ap_hosts()]
+        hosts += [(h, 'router') for h in get_enabled_router_hosts()]
+        if get_setting('liveness_include_cpes') == '1':
+            hosts += [(ip, 'cpe') for ip in get_cpe_ips()]
+
+        targets = {}
+        for host, kind in hosts:
+            address, _ = split_host_port(host, 0)
+            try:
+                ipaddress.IPv4Address(address)
+            except ValueError:
+                try:
+                    address = socket.gethostbyname(address)
+                except OSError:
+                    continue
+            targets.setdefault(host, (address, kind))
+
+        with self._lock:
+            for host in list(self._devices):
+                if host not in targets:
+                    del self._devices[host]
+        return targets, interval
+
+    async def _sweep(self, loop: asyncio.AbstractEventLoop, sock: socket.socket,
+                     is_raw: bool, targets: Dict[str, Tuple[str, str]]):
+        self._seq = (self._seq + 1) & 0xFFFF
+        seq = self._seq
+        packet = _build_echo_request(self._ident, seq)
+
+        by_ip: Dict[str, List[str]] = {}
+        for host, (ip, _) in targets.items():
+            by_ip.setdefault(ip, []).append(host)
+
+        sent_at: Dict[str, float] = {}
+        for ip in by_ip:
+            try:
+                await loop.sock_sendto(sock, packet, (ip, 0))
+                sent_at[ip] = time.monotonic()
+            except OSError as e:
+                logging.debug(f"Liveness: no se pudo enviar ICMP a {ip}: {e}")
+
+        rtts: Dict[str, float] = {}
+        deadline = time.monotonic() + REPLY_TIMEOUT_SECONDS
+        while len(rtts) < len(sent_at):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                data, (ip, _) = await asyncio.wait_for(loop.sock_recvfrom(sock, 2048), remaining)
+            except asyncio.TimeoutError:
+                break
+            received = time.monotonic()
+            if is_raw:
+                # El socket raw entrega la cabecera IP y todo el ICMP del equipo
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, reply_seq = struct.unpack("!BBHHH", data[:8])
+            if icmp_type != ICMP_ECHO_REPLY or reply_seq != seq:
+                continue
+            if is_raw and ident != self._ident:
+                continue
+            if ip in sent_at and ip not in rtts:
+                rtts[ip] = round((received - sent_at[ip]) * 1000, 2)
+
+        transitions = []
+        with self._lock:
+            for host, (ip, kind) in targets.items():
+                device = self._devices.get(host)
+                if device is None:
+                    device = self._devices[host] = DeviceLiveness(kind)
+                rtt = rtts.get(ip)
+                device.samples.append(rtt)
+                if rtt is not None:
+                    device.consecutive_losses = 0
+                    if device.reachable is False:
+                        transitions.append((host, kind, True))
+                    device.reachable = True
+                else:
+                    device.consecutive_losses += 1
+                    if device.reachable and device.consecutive_losses >= DOWN_AFTER_LOSSES:
+                        device.reachable = False
+                        transitions.append((host, kind, False))
+
+        for host, kind, reachable in transitions:
+            logging.info(f"Liveness: {kind} {host} {'responde de nuevo' if reachable else 'sin respuesta ICMP'}.")
+            if self._on_transition:
+                # El callback toca la BD y envía alertas: fuera del bucle de eventos
+                loop.run_in_executor(None, self._safe_transition, host, kind, reachable)
+
+    def _safe_transition(self, host: str, kind: str, reachable: bool):
+        try:
+            self._on_transition(host, kind, reachable)
+        except Exception as e:
+            logging.exception(f"Liveness: error procesando la transición de {host}: {e}")
+
+
+# Instancia del proceso del monitor
+liveness_sweeper = LivenessSweeper()
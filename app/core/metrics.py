@@ -0,0 +1,245 @@
+# app/core/metrics.py
+
+import bisect
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# --- Constantes ---
+MONITOR_METRICS_FILE = "monitor_metrics.json"
+METRICS_WRITE_INTERVAL = 15
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = [[list(k), v] for k, v in self._values.items()]
+        return {"type": self.kind, "help": self.documentation,
+                "labelnames": list(self.labelnames), "samples": samples}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [conteos por bucket (no acumulados), suma, total]
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso, renderizable en formato de texto de Prometheus."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.snapshot() for m in metrics}
+
+    def write_snapshot(self, path: str):
+        """Vuelca el estado a un archivo JSON de forma atómica (lo lee la API)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+def render_prometheus(snapshots: Iterable[Tuple[str, Dict[str, Dict[str, Any]]]]) -> str:
+    """
+    Renderiza uno o varios snapshots (uno por proceso) en formato de texto de
+    Prometheus. Cada muestra lleva la etiqueta `process` y cada familia se
+    declara una sola vez aunque venga de varios procesos.
+    """
+    families: Dict[str, Dict[str, Any]] = {}
+    for process, snapshot in snapshots:
+        for name, data in snapshot.items():
+            family = families.setdefault(name, {**data, "samples": []})
+            family["samples"].extend((process, labels, value) for labels, value in data["samples"])
+
+    lines: List[str] = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        labelnames = ["process"] + list(family["labelnames"])
+        for process, labelvalues, value in family["samples"]:
+            values = [process] + list(labelvalues)
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+                continue
+            counts, total_sum, total_count = value
+            cumulative = 0
+            for bound, count in zip(family["buckets"], counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labelnames + ['le'], values + [_format_value(float(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labelnames + ['le'], values + ['+Inf'])} {total_count}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(float(total_sum))}")
+            lines.append(f"{name}_count{_format_labels(labelnames, values)} {total_count}")
+    return "\n".join(lines) + "\n"
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def start_snapshot_writer(path: str = MONITOR_METRICS_FILE, interval: float = METRICS_WRITE_INTERVAL):
+    """Hilo demonio que vuelca periódicamente las métricas del proceso a `path`."""
+    def _loop():
+        while True:
+            try:
+                registry.write_snapshot(path)
+            except OSError as e:
+                logging.warning(f"No se pudieron escribir las métricas en {path}: {e}")
+            time.sleep(interval)
+    threading.Thread(target=_loop, name="MetricsWriter", daemon=True).start()
+
+
+# Registro del proceso actual
+registry = MetricsRegistry()
+
+# --- Métricas del ciclo de monitoreo ---
+POLL_DURATION = registry.histogram(
+    "umonitor_poll_duration_seconds", "Duración del sondeo completo de un dispositivo.", ["kind"])
+POLL_RESULTS = registry.counter(
+    "umonitor_poll_total", "Sondeos de dispositivos por resultado.", ["kind", "result"])
+DEVICE_LAST_POLL_SECONDS = registry.gauge(
+    "umonitor_device_last_poll_seconds", "Duración del último sondeo de cada dispositivo.", ["kind", "host"])
+POLLS_IN_FLIGHT = registry.gauge(
+    "umonitor_polls_in_flight", "Sondeos en ejecución.")
+POLL_QUEUE_DEPTH = registry.gauge(
+    "umonitor_poll_queue_depth", "Sondeos del ciclo actual pendientes de empezar.")
+CYCLE_DURATION = registry.gauge(
+    "umonitor_cycle_duration_seconds", "Duración del último ciclo de monitoreo.")
+CYCLE_LAST_TIMESTAMP = registry.gauge(
+    "umonitor_cycle_last_timestamp_seconds", "Momento (epoch) en que terminó el último ciclo.")
+
+# --- Métricas del cliente AirOS ---
+AP_REQUEST_DURATION = registry.histogram(
+    "umonitor_ap_request_duration_seconds", "Latencia de las peticiones HTTPS a los APs.", ["op"])
+AP_REQUEST_ERRORS = registry.counter(
+    "umonitor_ap_request_errors_total", "Errores de las peticiones HTTPS a los APs.", ["op", "reason"])
+
+# --- Persistencia y alertas ---
+SNAPSHOT_SAVE_DURATION = registry.histogram(
+    "umonitor_snapshot_save_duration_seconds", "Duración de save_full_snapshot.")
+ALERT_DURATION = registry.histogram(
+    "umonitor_alert_duration_seconds", "Latencia del envío de alertas de Telegram.")
+ALERTS_SENT = registry.counter(
+    "umonitor_alerts_total", "Alertas por resultado (sent, failed, simulated).", ["result"])
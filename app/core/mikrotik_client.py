@@ -3,8 +3,14 @@
 import routeros_api
 import ssl
 import time
-from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional, Sequence
+from routeros_api import RouterOsApiPool
 from routeros_api.api import RouterOsApi 
+from routeros_api.exceptions import RouterOsApiCommunicationError
+from routeros_api.query import IsEqualQuery, OrQuery
+
+from .router_reconciler import MenuState, reconcile
 
 # --- FUNCIÓN DE AYUDA ROBUSTA PARA OBTENER EL ID ---
 def _get_id(resource_dict: Dict[str, Any]) -> str:
@@ -27,58 +33,131 @@ def _get_id(resource_dict: Dict[str, Any]) -> str:
 # para asegurar que el 'pool' que se abre, se cierra.
 #
 
+def open_router_pool(host: str, username: str, password: str, port: int, use_ssl: bool = True) -> RouterOsApiPool:
+    """Pool API (por defecto API-SSL, sin verificar el certificado autofirmado); conecta en get_api()."""
+    ssl_context = None
+    if use_ssl:
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+    return RouterOsApiPool(
+        host,
+        username=username,
+        password=password,
+        port=port,
+        use_ssl=use_ssl,
+        ssl_context=ssl_context,
+        plaintext_login=True
+    )
+
+@contextmanager
+def router_api_session(host: str, username: str, password: str, port: int, use_ssl: bool = True) -> Iterator[RouterOsApi]:
+    """Abre una sesión API y la cierra siempre al salir del bloque."""
+    pool = open_router_pool(host, username, password, port, use_ssl)
+    try:
+        yield pool.get_api()
+    finally:
+        pool.disconnect()
+
+def _print(api: RouterOsApi, path: str, proplist: Sequence[str], where: Sequence[Any] = (),
+           **queries: str) -> List[Dict[str, Any]]:
+    """
+    'print' que solo pide al router las propiedades indicadas (.proplist) y
+    filtra en el router con consultas '?clave=valor' (combinadas con AND;
+    `where` admite consultas compuestas como OrQuery). Evita transferir y
+    decodificar columnas que no se usan (p. ej. en tablas con miles de filas).
+    """
+    return api.get_resource(path).call('print', {'.proplist': ','.join(proplist)}, queries,
+                                       additional_queries=tuple(where))
+
+def _any_of(key: str, values: Sequence[str]) -> Any:
+    """Consulta '?clave=a ?clave=b ... ?#||' (clave con guiones, como en RouterOS)."""
+    if len(values) == 1:
+        # Con un solo valor no hay nada que combinar ('?#' sin operadores)
+        return IsEqualQuery(key, values[0])
+    return OrQuery(*[IsEqualQuery(key, value) for value in values])
+
 #
-# 2. LÓGICA DE APROVISIONAMIENTO (Sin cambios)
+# 2. LÓGICA DE APROVISIONAMIENTO
 #
-def provision_router_api_ssl(admin_api: RouterOsApi, host: str, new_api_user: str, new_api_password: str) -> Dict[str, str]:
+# Espera máxima a que el router genere/firme el certificado (la clave RSA tarda en equipos lentos)
+CERT_READY_TIMEOUT = 120
+CERT_POLL_INTERVAL = 0.5
+
+def _wait_until(check, timeout: float, interval: float = CERT_POLL_INTERVAL):
+    """Consulta check() hasta que devuelva un valor verdadero; TimeoutError si se agota el plazo."""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = check()
+        if value:
+            return value
+        if time.monotonic() >= deadline:
+            raise TimeoutError("el router no completó la operación a tiempo")
+        time.sleep(interval)
+
+def _certificate_signed(cert_resource, cert_name: str) -> bool:
+    certs = cert_resource.call('print', {'.proplist': 'private-key,trusted'}, {'name': cert_name})
+    return bool(certs) and str(certs[0].get('private-key')).lower() in ('true', 'yes')
+
+def provision_router_api_ssl(admin_api: RouterOsApi, host: str, new_api_user: str, new_api_password: str,
+                             progress: Optional[Callable[[int, str], None]] = None) -> Dict[str, str]:
+    """
+    Crea el grupo y usuario de la API, genera y firma un certificado propio y
+    activa api-ssl con él. En vez de esperas fijas, consulta el estado del
+    certificado hasta que está listo. `progress(porcentaje, mensaje)` es
+    opcional (lo usan los trabajos en segundo plano).
+    """
+    report = progress or (lambda percent, message: None)
     try:
         # --- Paso 1: Grupo y Usuario ---
+        report(10, "Creando grupo y usuario de la API")
         user_group_name = "api_full_access"
         group_resource = admin_api.get_resource('/user/group')
-        group_list = group_resource.get(name=user_group_name)
+        group_id = _find_resource_id(group_resource, name=user_group_name)
         
         current_policy = "local,ssh,read,write,policy,test,password,sniff,sensitive,api,romon,!telnet,!ftp,!reboot,!winbox,!web,!rest-api"
 
-        if not group_list:
+        if not group_id:
             group_resource.add(name=user_group_name, policy=current_policy)
         else:
-            group_id = _get_id(group_list[0])
             group_resource.set(id=group_id, policy=current_policy)
             
         user_resource = admin_api.get_resource('/user')
-        user_list = user_resource.get(name=new_api_user)
-        if not user_list:
+        user_id = _find_resource_id(user_resource, name=new_api_user)
+        if not user_id:
             user_resource.add(name=new_api_user, password=new_api_password, group=user_group_name)
         else:
-            user_id = _get_id(user_list[0])
             user_resource.set(id=user_id, password=new_api_password, group=user_group_name)
 
         # --- Paso 2: Certificado SSL ---
+        report(30, "Generando el certificado")
         cert_name = "api_ssl_cert"
         cert_resource = admin_api.get_resource('/certificate')
-        existing_cert_list = cert_resource.get(name=cert_name)
-        if existing_cert_list:
-            cert_id_to_remove = _get_id(existing_cert_list[0])
+        cert_id_to_remove = _find_resource_id(cert_resource, name=cert_name)
+        if cert_id_to_remove:
             cert_resource.remove(id=cert_id_to_remove)
-            time.sleep(1)
+            _wait_until(lambda: not _find_resource_id(cert_resource, name=cert_name), CERT_READY_TIMEOUT)
             
         cert_resource.add(name=cert_name, common_name=host, days_valid='3650')
-        time.sleep(2)
-        new_cert_list = cert_resource.get(name=cert_name)
-        if not new_cert_list: 
+        try:
+            new_cert_id = _wait_until(lambda: _find_resource_id(cert_resource, name=cert_name), CERT_READY_TIMEOUT)
+        except TimeoutError:
             raise Exception("No se encontró el certificado para firmarlo después de crearlo.")
         
-        new_cert_id = _get_id(new_cert_list[0])
+        report(50, "Firmando el certificado")
         cert_resource.call('sign', {'id': new_cert_id})
-        time.sleep(3)
+        try:
+            _wait_until(lambda: _certificate_signed(cert_resource, cert_name), CERT_READY_TIMEOUT)
+        except TimeoutError:
+            raise Exception("El certificado no quedó firmado dentro del tiempo de espera.")
 
+        report(80, "Activando el servicio api-ssl")
         # --- Paso 3: Asignar Servicio ---
         service_resource = admin_api.get_resource('/ip/service')
-        api_ssl_service_list = service_resource.get(name='api-ssl')
-        if not api_ssl_service_list:
+        api_ssl_service_id = _find_resource_id(service_resource, name='api-ssl')
+        if not api_ssl_service_id:
             raise Exception("El servicio 'api-ssl' no fue encontrado en el router.")
         
-        api_ssl_service_id = _get_id(api_ssl_service_list[0])
         service_resource.set(id=api_ssl_service_id, certificate=cert_name, disabled='no')
         
         return {"status": "success", "message": "Router aprovisionado con API-SSL y usuario."}
@@ -90,89 +169,218 @@ def provision_router_api_ssl(admin_api: RouterOsApi, host: str, new_api_user: st
         print("-----------------------------------------")
         return {"status": "error", "message": f"Error interno: {e}"}
 
+# --- Copia de configuración (/export) ---
+EXPORT_FILE_NAME = "umonitor-backup"
+EXPORT_TIMEOUT = 60
+# Bytes por lectura de /file/read (RouterOS 7.13+)
+FILE_READ_CHUNK = 32768
+
+def _read_router_file(api: RouterOsApi, file_name: str) -> bytes:
+    """
+    Lee un archivo del router. Usa /file/read por bloques (RouterOS 7.13+) y,
+    si no existe, la propiedad 'contents' de /file (limitada a ~4 KB en
+    versiones antiguas: si el contenido llega recortado se considera error).
+    """
+    file_resource = api.get_binary_resource('/file')
+    try:
+        data = bytearray()
+        while True:
+            reply = file_resource.call('read', {'file': file_name.encode(), 'offset': str(len(data)).encode(),
+                                                'chunk-size': str(FILE_READ_CHUNK).encode()})
+            chunk = reply[0].get('data', b'') if reply else b''
+            data += chunk
+            if len(chunk) < FILE_READ_CHUNK:
+                return bytes(data)
+    except RouterOsApiCommunicationError:
+        pass
+    files = file_resource.call('print', {'.proplist': b'size,contents'}, {'name': file_name.encode()})
+    if not files:
+        raise FileNotFoundError(f"El router no tiene el archivo {file_name}.")
+    contents = files[0].get('contents') or b''
+    if int(files[0].get('size') or 0) > len(contents):
+        raise ValueError(f"El router solo devolvió {len(contents)} bytes de {file_name} (RouterOS sin /file/read).")
+    return contents
+
+def export_router_config(api: RouterOsApi) -> str:
+    """
+    Ejecuta '/export file=...' y devuelve el texto del script. El archivo
+    temporal se borra del router al terminar.
+    """
+    file_name = f"{EXPORT_FILE_NAME}.rsc"
+    file_resource = api.get_resource('/file')
+    api.get_resource('/').call('export', {'file': EXPORT_FILE_NAME})
+    try:
+        # El archivo puede tardar en aparecer en routers con mucha configuración
+        _wait_until(lambda: _find_resource_id(file_resource, name=file_name), EXPORT_TIMEOUT)
+        return _read_router_file(api, file_name).decode('utf-8', errors='replace')
+    finally:
+        file_id = _find_resource_id(file_resource, name=file_name)
+        if file_id:
+            file_resource.remove(id=file_id)
+
 #
 # 3. LÓGICA DE OPERACIONES (ADD/READ - Sin cambios)
 #
+SYSTEM_RESOURCE_PROPS = ("version", "platform", "board-name", "cpu", "cpu-count", "architecture-name",
+                         "uptime", "cpu-load", "free-memory", "total-memory", "free-hdd-space")
+
 def get_system_resources(api: RouterOsApi) -> Dict[str, Any]:
-    resource_info = api.get_resource("/system/resource").get()
-    identity_info = api.get_resource("/system/identity").get()
+    resource_info = _print(api, "/system/resource", SYSTEM_RESOURCE_PROPS)
+    identity_info = _print(api, "/system/identity", ("name",))
     data = {}
     if resource_info: data.update(resource_info[0])
     if identity_info: data.update(identity_info[0])
     return data
 
-def install_core_config(api: RouterOsApi, selected_interface: str) -> Dict[str, str]:
+ROUTER_RESOURCE_PROPS = ("uptime", "cpu-load", "free-memory", "total-memory", "free-hdd-space",
+                         "version", "board-name")
+ROUTER_INTERFACE_PROPS = ("name", "type", "rx-byte", "tx-byte", "running", "disabled")
+# Contadores por cola para la contabilidad de tráfico (incluye las dinámicas de PPP)
+ROUTER_QUEUE_PROPS = (".id", "name", "parent", "bytes", "packets", "dynamic")
+
+def _to_int(value: Any) -> Optional[int]:
     try:
-        pool_resource = api.get_resource("/ip/pool")
-        ppp_profile_resource = api.get_resource("/ppp/profile")
-        queue_type_resource = api.get_resource("/queue/type")
-        mangle_resource = api.get_resource("/ip/firewall/mangle")
-        tree_resource = api.get_resource("/queue/tree")
-        simple_queue_resource = api.get_resource("/queue/simple")
-        ppp_server_resource = api.get_resource("/interface/pppoe-server/server")
-
-        for pool_name in ["pool-plata", "pool-oro", "pool-cake"]:
-            existing = pool_resource.get(name=pool_name)
-            if existing: pool_resource.remove(id=_get_id(existing[0]))
-        
-        for profile_name in ["profile-plata", "profile-oro", "profile-cake", "profile-isp-default"]:
-            existing = ppp_profile_resource.get(name=profile_name)
-            if existing: ppp_profile_resource.remove(id=_get_id(existing[0]))
-
-        for qtype_name in ["pcq-plata-down", "pcq-plata-up", "pcq-oro-down", "pcq-oro-up", "cake-upload", "cake-download"]:
-            existing = queue_type_resource.get(name=qtype_name)
-            if existing: queue_type_resource.remove(id=_get_id(existing[0]))
-
-        for tree_name in ["GLOBAL_PCQ_DOWN", "GLOBAL_PCQ_UP", "plan-plata-down", "plan-plata-up", "plan-oro-down", "plan-oro-up"]:
-            existing = tree_resource.get(name=tree_name)
-            if existing: tree_resource.remove(id=_get_id(existing[0]))
-
-        for q_name in ["Pool_Total_CAKE"]:
-            existing = simple_queue_resource.get(name=q_name)
-            if existing: simple_queue_resource.remove(id=_get_id(existing[0]))
-
-        for conn_mark in ["conn-plata", "conn-oro"]:
-            existing_mangle_conn = mangle_resource.get(new_connection_mark=conn_mark)
-            for m in existing_mangle_conn: mangle_resource.remove(id=_get_id(m))
-                
-        for pkt_mark in ["pkt-plata-down", "pkt-plata-up", "pkt-oro-down", "pkt-oro-up"]:
-            existing_mangle_pkt = mangle_resource.get(new_packet_mark=pkt_mark)
-            for m in existing_mangle_pkt: mangle_resource.remove(id=_get_id(m))
-
-        existing_server = ppp_server_resource.get(service_name="Servicio_ISP")
-        if existing_server: ppp_server_resource.remove(id=_get_id(existing_server[0]))
-
-        pool_resource.add(name="pool-plata", ranges="10.50.51.100-10.50.51.254")
-        pool_resource.add(name="pool-oro", ranges="10.50.52.100-10.50.52.254")
-        pool_resource.add(name="pool-cake", ranges="10.50.53.100-10.50.53.254")
-        ppp_server_resource.add(authentication="mschap2", disabled="no", interface=selected_interface, service_name="Servicio_ISP")
-        
-        return {"status": "success", "message": "Configuración Core de Servicio instalada."}
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _split_pair(value: Any) -> List[Optional[int]]:
+    """Contadores 'subida/bajada' de las colas simples ('1234/5678')."""
+    if not value or "/" not in str(value):
+        return [None, None]
+    upload, _, download = str(value).partition("/")
+    return [_to_int(upload), _to_int(download)]
+
+def get_router_telemetry(api: RouterOsApi) -> Dict[str, Any]:
+    """
+    Lectura del monitor en una sola sesión: recursos e identidad (mismas
+    claves que get_system_resources), contadores de bytes por interfaz,
+    número de sesiones PPP activas y totales de las colas simples (además de
+    los contadores de cada cola en data["queues"]). Todas las lecturas van
+    restringidas con .proplist.
+    """
+    data: Dict[str, Any] = {}
+    resource_info = _print(api, "/system/resource", ROUTER_RESOURCE_PROPS)
+    identity_info = _print(api, "/system/identity", ("name",))
+    if resource_info: data.update(resource_info[0])
+    if identity_info: data.update(identity_info[0])
+
+    data["interfaces"] = [
+        {
+            "name": iface.get("name"),
+            "type": iface.get("type"),
+            "rx_bytes": _to_int(iface.get("rx-byte")),
+            "tx_bytes": _to_int(iface.get("tx-byte")),
+            "running": iface.get("running") == "true",
+        }
+        for iface in _print(api, "/interface", ROUTER_INTERFACE_PROPS)
+        if iface.get("disabled") != "true"
+    ]
+    data["ppp_active_count"] = len(_print(api, "/ppp/active", (".id",)))
+
+    queues = _print(api, "/queue/simple", ROUTER_QUEUE_PROPS)
+    upload = download = 0
+    data["queues"] = []
+    for queue in queues:
+        up, down = _split_pair(queue.get("bytes"))
+        packets_up, packets_down = _split_pair(queue.get("packets"))
+        upload += up or 0
+        download += down or 0
+        data["queues"].append({
+            "id": queue.get("id") or queue.get(".id"),
+            "name": queue.get("name"),
+            "parent": queue.get("parent"),
+            "dynamic": queue.get("dynamic") == "true",
+            "bytes_up": up, "bytes_down": down,
+            "packets_up": packets_up, "packets_down": packets_down,
+        })
+    data["queue_count"] = len(queues)
+    data["queue_upload_bytes"] = upload
+    data["queue_download_bytes"] = download
+    return data
+
+def core_config_state(selected_interface: str) -> List[MenuState]:
+    """Estado deseado de la configuración core de servicio (pools base y servidor PPPoE)."""
+    return [
+        MenuState("/ip/pool", present={
+            "pool-plata": {"ranges": "10.50.51.100-10.50.51.254"},
+            "pool-oro": {"ranges": "10.50.52.100-10.50.52.254"},
+            "pool-cake": {"ranges": "10.50.53.100-10.50.53.254"},
+        }),
+        # Restos de esquemas anteriores (PCQ/colas por árbol) que ya no se usan
+        MenuState("/ppp/profile", absent=["profile-plata", "profile-oro", "profile-cake", "profile-isp-default"]),
+        MenuState("/queue/type", absent=["pcq-plata-down", "pcq-plata-up", "pcq-oro-down", "pcq-oro-up",
+                                         "cake-upload", "cake-download"]),
+        MenuState("/queue/tree", absent=["GLOBAL_PCQ_DOWN", "GLOBAL_PCQ_UP", "plan-plata-down", "plan-plata-up",
+                                         "plan-oro-down", "plan-oro-up"]),
+        MenuState("/queue/simple", absent=["Pool_Total_CAKE"]),
+        MenuState("/ip/firewall/mangle", key="new-connection-mark", absent=["conn-plata", "conn-oro"]),
+        MenuState("/ip/firewall/mangle", key="new-packet-mark",
+                  absent=["pkt-plata-down", "pkt-plata-up", "pkt-oro-down", "pkt-oro-up"]),
+        MenuState("/interface/pppoe-server/server", key="service-name", present={
+            "Servicio_ISP": {"interface": selected_interface, "authentication": "mschap2", "disabled": "no"},
+        }),
+    ]
+
+def _reconcile_result(result: Dict[str, Any], dry_run: bool, done_message: str) -> Dict[str, Any]:
+    changes = result["changes"]
+    if result["errors"]:
+        status, message = "error", f"{len(result['errors'])} de {len(changes)} cambios fallaron."
+    elif dry_run:
+        status, message = "success", f"Simulación: {len(changes)} cambios pendientes."
+    elif not changes:
+        status, message = "success", "Sin cambios: el router ya tiene la configuración deseada."
+    else:
+        status, message = "success", f"{done_message} ({len(changes)} cambios)."
+    return {"status": status, "message": message, "dry_run": dry_run, **result}
+
+def install_core_config(api: RouterOsApi, selected_interface: str, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Aplica la configuración core por diferencias: lee cada menú una vez y
+    solo envía las altas, cambios y bajas necesarias (lo que ya está bien no
+    se toca, así el servidor PPPoE no se recrea ni corta sesiones).
+    """
+    try:
+        result = reconcile(api, core_config_state(selected_interface), dry_run=dry_run)
+        return _reconcile_result(result, dry_run, "Configuración Core de Servicio instalada")
     except Exception as e:
         return {"status": "error", "message": f"Error al instalar la configuración core: {e}"}
 
+INTERFACE_PROPS = (".id", "name", "type", "mac-address", "mtu", "running", "disabled", "comment")
+IP_ADDRESS_PROPS = (".id", "address", "network", "interface", "disabled", "dynamic", "comment")
+NAT_RULE_PROPS = (".id", "chain", "action", "src-address", "dst-address", "out-interface", "out-interface-list",
+                  "to-addresses", "to-ports", "disabled", "comment")
+INTERFACE_LIST_PROPS = (".id", "name", "comment")
+INTERFACE_LIST_MEMBER_PROPS = ("list", "interface")
+PPPOE_SERVER_PROPS = (".id", "service-name", "interface", "default-profile", "authentication", "disabled")
+PPP_PROFILE_PROPS = (".id", "name", "local-address", "remote-address", "parent-queue", "queue-type",
+                     "rate-limit", "dns-server", "comment")
+SIMPLE_QUEUE_PROPS = (".id", "name", "target", "parent", "max-limit", "limit-at", "queue", "disabled", "comment")
+IP_POOL_PROPS = (".id", "name", "ranges", "next-pool", "comment")
+PPP_SECRET_PROPS = (".id", "name", "service", "profile", "remote-address", "disabled", "comment")
+PPP_ACTIVE_PROPS = (".id", "name", "service", "caller-id", "address", "uptime")
+# Nombres por consulta al resolver los IDs de un lote de secrets
+SECRET_LOOKUP_CHUNK = 100
+
 def get_interfaces(api: RouterOsApi) -> List[Dict[str, Any]]:
     try:
-        all_interfaces = api.get_resource("/interface").get()
-        filtered = [
-            iface for iface in all_interfaces 
-            if iface['type'] in ['ether', 'bridge', 'vlan'] and iface.get('name') != 'none'
-        ]
-        return filtered
+        # El filtro por tipo lo resuelve el router (?type=ether ?type=bridge ?type=vlan ?#||)
+        interfaces = _print(api, "/interface", INTERFACE_PROPS, where=[_any_of("type", ["ether", "bridge", "vlan"])])
+        return [iface for iface in interfaces if iface.get('name') != 'none']
     except Exception as e:
         import logging
         logging.error(f"Error en get_interfaces: {e}")
         return []
 
 def get_ip_addresses(api: RouterOsApi) -> List[Dict[str, Any]]:
-    return api.get_resource("/ip/address").get()
+    return _print(api, "/ip/address", IP_ADDRESS_PROPS)
 
 def get_nat_rules(api: RouterOsApi) -> List[Dict[str, Any]]:
-    return api.get_resource("/ip/firewall/nat").get()
+    return _print(api, "/ip/firewall/nat", NAT_RULE_PROPS)
 
 def get_interface_lists(api: RouterOsApi) -> List[Dict[str, Any]]:
-    lists = api.get_resource("/interface/list").get()
-    members = api.get_resource("/interface/list/member").get()
+    lists = _print(api, "/interface/list", INTERFACE_LIST_PROPS)
+    members = _print(api, "/interface/list/member", INTERFACE_LIST_MEMBER_PROPS)
     list_map = {}
     for member in members:
         list_name = member['list']
@@ -184,56 +392,53 @@ def get_interface_lists(api: RouterOsApi) -> List[Dict[str, Any]]:
     return lists
 
 def get_pppoe_servers(api: RouterOsApi) -> List[Dict[str, Any]]:
-    return api.get_resource("/interface/pppoe-server/server").get()
+    return _print(api, "/interface/pppoe-server/server", PPPOE_SERVER_PROPS)
 
 def get_ppp_profiles(api: RouterOsApi) -> List[Dict[str, Any]]:
-    return api.get_resource("/ppp/profile").get()
+    return _print(api, "/ppp/profile", PPP_PROFILE_PROPS)
 
-def get_simple_queues(api: RouterOsApi) -> List[Dict[str, Any]]:
-    return api.get_resource("/queue/simple").get()
+def get_simple_queues(api: RouterOsApi, include_dynamic: bool = False) -> List[Dict[str, Any]]:
+    """
+    Colas simples estáticas. Las dinámicas (una por sesión PPPoE, miles en un
+    concentrador grande) solo se piden con include_dynamic=True.
+    """
+    if include_dynamic:
+        return _print(api, "/queue/simple", SIMPLE_QUEUE_PROPS)
+    return _print(api, "/queue/simple", SIMPLE_QUEUE_PROPS, dynamic="false")
 
 def get_ip_pools(api: RouterOsApi) -> List[Dict[str, Any]]:
-    return api.get_resource("/ip/pool").get()
+    return _print(api, "/ip/pool", IP_POOL_PROPS)
+
+def service_plan_state(plan_name: str, bandwidth: str, pool_range: str,
+                       local_address: str, comment: str) -> List[MenuState]:
+    """Estado deseado de un plan: pool, tipos de cola CAKE, cola padre y perfil PPP."""
+    pool_name = f"pool-{plan_name.lower()}"
+    parent_q_name = f"PARENT-{plan_name.upper()}"
+    return [
+        MenuState("/ip/pool", present={pool_name: {"ranges": pool_range}}),
+        MenuState("/queue/type", present={"cake-dl": {"kind": "cake"}, "cake-ul": {"kind": "cake"}}),
+        MenuState("/queue/simple", present={parent_q_name: {"max-limit": bandwidth, "comment": comment}}),
+        MenuState("/ppp/profile", present={f"profile-{plan_name.lower()}": {
+            "local-address": local_address,
+            "remote-address": pool_name,
+            "parent-queue": parent_q_name,
+            "queue-type": "cake-ul/cake-dl",
+            "dns-server": "8.8.8.8,1.1.1.1",
+            "comment": comment,
+        }}),
+    ]
 
 def create_service_plan(api: RouterOsApi, 
                         plan_name: str, 
                         bandwidth: str, 
                         pool_range: str, 
                         local_address: str, 
-                        comment: str):
+                        comment: str,
+                        dry_run: bool = False) -> Dict[str, Any]:
     try:
-        pool_name = f"pool-{plan_name.lower()}"
-        profile_name = f"profile-{plan_name.lower()}"
-        parent_q_name = f"PARENT-{plan_name.upper()}"
-        
-        pool_res = api.get_resource("/ip/pool")
-        qtype_res = api.get_resource("/queue/type")
-        simple_q_res = api.get_resource("/queue/simple")
-        profile_res = api.get_resource("/ppp/profile")
-
-        if not pool_res.get(name=pool_name):
-            pool_res.add(name=pool_name, ranges=pool_range)
-        if not qtype_res.get(name="cake-dl"):
-            qtype_res.add(name="cake-dl", kind="cake")
-        if not qtype_res.get(name="cake-ul"):
-            qtype_res.add(name="cake-ul", kind="cake")
-        if not simple_q_res.get(name=parent_q_name):
-            simple_q_res.add(
-                name=parent_q_name,
-                max_limit=bandwidth,
-                comment=comment
-            )
-        if not profile_res.get(name=profile_name):
-            profile_res.add(
-                name=profile_name,
-                local_address=local_address,
-                remote_address=pool_name,
-                parent_queue=parent_q_name,
-                queue_type="cake-ul/cake-dl",
-                dns_server="8.8.8.8,1.1.1.1",
-                comment=comment
-            )
-        return {"status": "success", "message": f"Plan '{plan_name}' creado."}
+        states = service_plan_state(plan_name, bandwidth, pool_range, local_address, comment)
+        result = reconcile(api, states, dry_run=dry_run)
+        return _reconcile_result(result, dry_run, f"Plan '{plan_name}' creado")
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -246,8 +451,7 @@ def add_ip_address(api: RouterOsApi, interface: str, address: str, comment: str)
 
 def add_nat_masquerade(api: RouterOsApi, out_interface_or_list: str, comment: str):
     nat_res = api.get_resource("/ip/firewall/nat")
-    rules = nat_res.get(comment=comment)
-    if not rules:
+    if not _find_resource_id(nat_res, comment=comment):
         return nat_res.add(
             chain="srcnat",
             action="masquerade",
@@ -259,7 +463,7 @@ def add_nat_masquerade(api: RouterOsApi, out_interface_or_list: str, comment: st
 
 def add_pppoe_server(api: RouterOsApi, service_name: str, interface: str, default_profile: str):
     server_res = api.get_resource("/interface/pppoe-server/server")
-    if not server_res.get(interface=interface):
+    if not _find_resource_id(server_res, interface=interface):
         return server_res.add(
             service_name=service_name,
             interface=interface,
@@ -271,14 +475,19 @@ def add_pppoe_server(api: RouterOsApi, service_name: str, interface: str, defaul
 # ---
 # 4. LÓGICA DE OPERACIONES (DELETE - Sin cambios)
 # ---
+def _find_resource_ids(api_resource, where: Sequence[Any] = (), **kwargs) -> List[str]:
+    """IDs de los recursos que cumplen el filtro; el router solo devuelve el .id de cada uno."""
+    if not kwargs and not where:
+        raise ValueError("Se requieren atributos para encontrar el recurso.")
+    resources = api_resource.call('print', {'.proplist': '.id'}, kwargs, additional_queries=tuple(where))
+    return [_get_id(resource) for resource in resources]
+
 def _find_resource_id(api_resource, **kwargs) -> Optional[str]:
     if not kwargs:
         raise ValueError("Se requieren atributos para encontrar el recurso.")
     try:
-        resources = api_resource.get(**kwargs)
-        if not resources:
-            return None
-        return _get_id(resources[0])
+        resource_ids = _find_resource_ids(api_resource, **kwargs)
+        return resource_ids[0] if resource_ids else None
     except Exception as e:
         print(f"Error buscando recurso con {kwargs}: {e}")
         return None
@@ -344,7 +553,7 @@ def get_pppoe_secrets(api: RouterOsApi) -> List[Dict[str, Any]]:
     Obtiene la lista completa de todos los 'secrets' (usuarios) PPPoE del router.
     """
     try:
-        return api.get_resource('/ppp/secret').get()
+        return _print(api, '/ppp/secret', PPP_SECRET_PROPS)
     except Exception as e:
         print(f"Error al obtener pppoe secrets: {e}")
         return []
@@ -354,7 +563,7 @@ def get_pppoe_active_connections(api: RouterOsApi) -> List[Dict[str, Any]]:
     Obtiene la lista de todas las conexiones PPPoE activas en este momento.
     """
     try:
-        return api.get_resource('/ppp/active').get()
+        return _print(api, '/ppp/active', PPP_ACTIVE_PROPS)
     except Exception as e:
         print(f"Error al obtener pppoe active connections: {e}")
         return []
@@ -366,8 +575,7 @@ def create_pppoe_secret(api: RouterOsApi, username: str, password: str, profile:
     resource = api.get_resource('/ppp/secret')
     
     # Verificar si el usuario ya existe
-    existing = resource.get(name=username)
-    if existing:
+    if _find_resource_id(resource, name=username):
         raise ValueError(f"El usuario PPPoE '{username}' ya existe en este router.")
         
     return resource.add(
@@ -405,4 +613,50 @@ def remove_pppoe_secret(api: RouterOsApi, secret_id: str) -> None:
     
     # 'id' es la clave correcta para el comando 'remove'
     resource.remove(id=secret_id)
-    return
\ No newline at end of file
+    return
+
+def apply_pppoe_secret_changes(api: RouterOsApi, changes: Sequence[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Aplica un lote de cambios sobre secrets PPPoE de un mismo router usando
+    una sola sesión. Cada cambio es {'username', 'action', ...} con action
+    'disable', 'enable', 'remove' o 'update' (este último con 'password',
+    'profile' y/o 'comment'). Los IDs se resuelven con pocas consultas
+    filtradas por nombre en lugar de una por usuario.
+
+    Genera un resultado por cambio, en el mismo orden y a medida que se
+    aplican: {'username', 'action', 'status': 'ok'|'not_found'|'error', 'detail'}.
+    """
+    resource = api.get_resource('/ppp/secret')
+    names = list(dict.fromkeys(change['username'] for change in changes))
+    secret_ids: Dict[str, str] = {}
+    for start in range(0, len(names), SECRET_LOOKUP_CHUNK):
+        chunk = names[start:start + SECRET_LOOKUP_CHUNK]
+        for secret in resource.call('print', {'.proplist': '.id,name'},
+                                    additional_queries=(_any_of('name', chunk),)):
+            secret_ids[secret.get('name')] = _get_id(secret)
+
+    for change in changes:
+        username, action = change['username'], change['action']
+        result = {"username": username, "action": action, "status": "ok", "detail": None}
+        secret_id = secret_ids.get(username)
+        if not secret_id:
+            result.update(status="not_found", detail=f"El usuario PPPoE '{username}' no existe en este router.")
+            yield result
+            continue
+        try:
+            if action == 'remove':
+                resource.remove(id=secret_id)
+                del secret_ids[username]
+            elif action in ('disable', 'enable'):
+                resource.set(id=secret_id, disabled='yes' if action == 'disable' else 'no')
+            elif action == 'update':
+                updates = {key: change[key] for key in ('password', 'profile', 'comment')
+                           if change.get(key) is not None}
+                if not updates:
+                    raise ValueError("No hay campos para actualizar.")
+                resource.set(id=secret_id, **updates)
+            else:
+                raise ValueError(f"Acción desconocida: {action}")
+        except Exception as e:
+            result.update(status="error", detail=str(e))
+        yield result
\ No newline at end of file
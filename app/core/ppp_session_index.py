@@ -0,0 +1,151 @@
+# app/core/ppp_session_index.py
+
+import logging
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from routeros_api import RouterOsApiPool
+
+from .limiter import device_limiter
+from .mikrotik_client import open_router_pool, PPP_ACTIVE_PROPS
+from ..db import ppp_sessions_db
+
+# --- Constantes ---
+RECONNECT_MIN_SECONDS = 5
+RECONNECT_MAX_SECONDS = 300
+# La respuesta de 'listen' guarda en memoria todos los cambios recibidos: se
+# renueva la sesión (con resincronización completa) al menos cada hora
+LISTEN_RENEW_SECONDS = 3600
+
+
+class _RouterListener:
+    """
+    Hilo con una sesión API permanente contra un router: lanza 'listen' sobre
+    /ppp/active, hace una lectura completa (resincronización) y después solo
+    aplica los cambios que envía el router. Si la conexión cae, reconecta con
+    retroceso exponencial y vuelve a resincronizar; tras LISTEN_RENEW_SECONDS
+    renueva la sesión de inmediato, para liberar los cambios ya aplicados.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.host = config["host"]
+        self._stop = threading.Event()
+        self._pool: Optional[RouterOsApiPool] = None
+        self._pool_lock = threading.Lock()
+        self._resynced = False
+        self._thread = threading.Thread(target=self._run, name=f"PPP-Listen-{self.host}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._pool_lock:
+            pool = self._pool
+        if pool:
+            # shutdown() despierta la lectura bloqueada del 'listen'
+            try:
+                pool.socket.socket.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, OSError):
+                pass
+
+    def _run(self):
+        backoff = RECONNECT_MIN_SECONDS
+        while not self._stop.is_set():
+            self._resynced = False
+            try:
+                self._listen()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                if self._resynced:
+                    # La sesión llegó a funcionar: se reintenta pronto
+                    backoff = RECONNECT_MIN_SECONDS
+                logging.warning(f"Índice PPP: se perdió la sesión con {self.host} ({e or type(e).__name__}); "
+                                f"reintento en {backoff} s.")
+            else:
+                # Renovación periódica (o parada): se reconecta sin esperar
+                backoff = RECONNECT_MIN_SECONDS
+                continue
+            finally:
+                with self._pool_lock:
+                    pool, self._pool = self._pool, None
+                if pool:
+                    pool.disconnect()
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+    def _listen(self):
+        config = self.config
+        pool = open_router_pool(self.host, config["username"], config["password"], config["api_ssl_port"])
+        with self._pool_lock:
+            self._pool = pool
+        with device_limiter.acquire(self.host, config.get("zona_id")):
+            api = pool.get_api()
+            if self._stop.is_set():
+                return
+            resource = api.get_resource('/ppp/active')
+            # 'listen' se envía antes de la lectura completa: los cambios que
+            # ocurran entre ambas quedan en cola y se aplican después (son idempotentes)
+            proplist = {'.proplist': ','.join(PPP_ACTIVE_PROPS)}
+            changes = resource.call_async('listen', proplist)
+            sessions = resource.call('print', proplist)
+        count = ppp_sessions_db.replace_router_sessions(self.host, sessions)
+        self._resynced = True
+        logging.info(f"Índice PPP: {self.host} resincronizado ({count} sesiones); escuchando cambios.")
+
+        # Sin timeout de lectura: el router solo escribe cuando hay cambios.
+        # Una conexión muerta la detecta el keepalive TCP del socket.
+        pool.set_timeout(None)
+        renew_at = time.monotonic() + LISTEN_RENEW_SECONDS
+        for change in changes:
+            if self._stop.is_set():
+                return
+            ppp_sessions_db.apply_session_events(self.host, [change])
+            if time.monotonic() >= renew_at:
+                logging.info(f"Índice PPP: renovando la sesión 'listen' con {self.host}.")
+                return
+        if not self._stop.is_set():
+            raise ConnectionError("el router cerró la suscripción 'listen'")
+
+
+def _config_key(config: Dict[str, Any]) -> Tuple:
+    return (config["username"], config["password"], config["api_ssl_port"], config.get("zona_id"))
+
+
+class PppSessionIndex:
+    """
+    Mantiene una suscripción por router aprovisionado. El monitor llama a
+    sync() en cada ciclo con la lista de routers activos: arranca los nuevos,
+    para los eliminados y reinicia los que cambiaron de credenciales.
+    """
+    def __init__(self):
+        self._listeners: Dict[str, _RouterListener] = {}
+        self._lock = threading.Lock()
+
+    def sync(self, routers: List[Dict[str, Any]], enabled: bool = True):
+        wanted = {router["host"]: router for router in routers} if enabled else {}
+        with self._lock:
+            for host in list(self._listeners):
+                listener = self._listeners[host]
+                config = wanted.get(host)
+                if config is None or _config_key(config) != _config_key(listener.config):
+                    listener.stop()
+                    del self._listeners[host]
+            for host, config in wanted.items():
+                if host not in self._listeners:
+                    listener = _RouterListener(config)
+                    self._listeners[host] = listener
+                    listener.start()
+        ppp_sessions_db.delete_sessions_except(wanted)
+
+    def stop(self):
+        with self._lock:
+            for listener in self._listeners.values():
+                listener.stop()
+            self._listeners.clear()
+
+
+ppp_session_index = PppSessionIndex()
@@ -0,0 +1,134 @@
+# app/core/profiler.py
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+# --- Constantes ---
+SAMPLE_INTERVAL_SECONDS = 0.005
+MAX_STACK_DEPTH = 128
+MONITOR_PROFILE_FILE = "monitor_profile.folded"
+# Hojas de pila que indican un hilo ocioso (esperando trabajo o E/S del bucle)
+IDLE_LEAVES = {"wait", "select", "poll", "_wait_for_tstate_lock", "accept", "sleep"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Perfilador estadístico: un hilo toma muestras de las pilas de todos los
+    hilos del proceso con sys._current_frames() y las acumula en formato
+    'collapsed' (una línea 'raiz;...;hoja N' por pila), listo para
+    flamegraph.pl o speedscope.
+    """
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self.started_at is not None:
+            self.duration = time.monotonic() - self.started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if not self.include_idle and frame.f_code.co_name in IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Interruptor de perfilado para la API: se arma para N peticiones; la
+    muestra empieza con la primera y termina al completarse la N-ésima.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._target = 0
+        self._started = 0
+        self._finished = 0
+        self._sampler: Optional[StackSampler] = None
+        self._result: Optional[str] = None
+        self._summary: Dict[str, Any] = {"state": "idle"}
+
+    def arm(self, requests: int):
+        with self._lock:
+            if self._sampler:
+                self._sampler.stop()
+            self._target = requests
+            self._started = self._finished = 0
+            self._sampler = None
+            self._result = None
+            self._summary = {"state": "armed", "requests": requests}
+
+    def request_started(self) -> bool:
+        """Devuelve True si la petición forma parte de la sesión de perfilado."""
+        if not self._target:
+            return False
+        with self._lock:
+            if not self._target or self._started >= self._target:
+                return False
+            self._started += 1
+            if self._sampler is None:
+                self._sampler = StackSampler()
+                self._sampler.start()
+                self._summary["state"] = "running"
+            return True
+
+    def request_finished(self):
+        with self._lock:
+            self._finished += 1
+            if self._finished < self._target or self._sampler is None:
+                return
+            sampler, self._sampler = self._sampler, None
+            target, self._target = self._target, 0
+        sampler.stop()
+        with self._lock:
+            self._result = sampler.folded()
+            self._summary = {
+                "state": "finished", "requests": target, "samples": sampler.samples,
+                "duration_seconds": round(sampler.duration, 3),
+            }
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._summary, requests_profiled=self._finished)
+
+    def result(self) -> Optional[str]:
+        with self._lock:
+            return self._result
+
+
+# Perfilador de peticiones del proceso de la API
+request_profiler = RequestProfiler()
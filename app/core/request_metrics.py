@@ -0,0 +1,144 @@
+# app/core/request_metrics.py
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from .metrics import registry
+from .profiler import request_profiler
+
+# --- Constantes ---
+RESERVOIR_SIZE = 2048   # Últimas latencias por ruta usadas para los percentiles
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Las peticiones del propio perfilador no cuentan para la sesión de perfilado
+PROFILER_PATH_PREFIX = "/api/admin/profile"
+
+REQUEST_DURATION = registry.histogram(
+    "umonitor_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta.",
+    ["method", "route", "status"])
+RESPONSE_SIZE = registry.histogram(
+    "umonitor_http_response_size_bytes", "Tamaño del cuerpo de las respuestas HTTP por ruta.",
+    ["method", "route"], buckets=SIZE_BUCKETS)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "umonitor_http_requests_in_flight", "Peticiones HTTP en curso.")
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _route_template(scope) -> str:
+    """
+    Plantilla de la ruta resuelta ('/api/aps/{host}'). Según la versión de
+    FastAPI, route.path puede no incluir el prefijo de include_router; en ese
+    caso se recupera de la URL real.
+    """
+    path = scope.get("path", "")
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        return "static" if path.startswith(("/static", "/uploads")) else "unmatched"
+    rendered = template
+    for name, value in (scope.get("path_params") or {}).items():
+        rendered = rendered.replace("{" + name + "}", str(value)).replace("{" + name + ":path}", str(value))
+    if path != rendered and path.endswith(rendered):
+        return path[:-len(rendered)] + template
+    return template
+
+
+class RouteStats:
+    """Reservorio de latencias y tamaños por ruta, más las peticiones en curso."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self.in_flight = 0
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, key: str, seconds: float, size: int, status_code: int):
+        with self._lock:
+            self.in_flight -= 1
+            entry = self._routes.get(key)
+            if entry is None:
+                entry = self._routes[key] = {
+                    "latencies": deque(maxlen=RESERVOIR_SIZE), "count": 0, "errors": 0, "bytes": 0,
+                }
+            entry["count"] += 1
+            entry["bytes"] += size
+            entry["latencies"].append(seconds)
+            if status_code >= 500:
+                entry["errors"] += 1
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [(key, dict(e, latencies=list(e["latencies"]))) for key, e in self._routes.items()]
+        result = []
+        for key, entry in items:
+            latencies = sorted(entry["latencies"])
+            row = {
+                "route": key, "count": entry["count"], "errors": entry["errors"],
+                "avg_response_bytes": round(entry["bytes"] / entry["count"]) if entry["count"] else 0,
+            }
+            if latencies:
+                row.update({
+                    "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+                    "p90_ms": round(_percentile(latencies, 0.90) * 1000, 2),
+                    "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+                    "max_ms": round(latencies[-1] * 1000, 2),
+                })
+            result.append(row)
+        result.sort(key=lambda r: r.get("p99_ms", 0), reverse=True)
+        return result
+
+
+route_stats = RouteStats()
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware ASGI de latencia por ruta. Mide de la llegada de la petición
+    al último fragmento del cuerpo, así que incluye el tiempo de los
+    endpoints síncronos en el threadpool de Starlette y las respuestas en
+    streaming. La ruta es la plantilla ('/api/aps/{host}'), no la URL.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        profiled = not path.startswith(PROFILER_PATH_PREFIX) and request_profiler.request_started()
+        started = time.perf_counter()
+        status_code = 500
+        size = 0
+        route_stats.started()
+        REQUESTS_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            # El router de FastAPI deja la ruta resuelta en el scope
+            route_path = _route_template(scope)
+            method = scope.get("method", "")
+            route_stats.finished(f"{method} {route_path}", elapsed, size, status_code)
+            REQUEST_DURATION.observe(elapsed, method=method, route=route_path, status=status_code)
+            RESPONSE_SIZE.observe(size, method=method, route=route_path)
+            if profiled:
+                request_profiler.request_finished()
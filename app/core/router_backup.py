@@ -0,0 +1,154 @@
+# app/core/router_backup.py
+
+import os
+import re
+import difflib
+import hashlib
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from .limiter import device_limiter
+from .mikrotik_client import export_router_config, router_api_session
+from ..db import backups_db
+from ..db.settings_db import get_setting
+
+# --- Constantes ---
+BACKUP_DIR = "backups"
+OBJECTS_DIR = os.path.join(BACKUP_DIR, "objects")
+OBJECT_EXTENSION = ".rsc.z"
+# Routers exportando a la vez (el limitador además respeta el máximo por zona)
+BACKUP_MAX_CONCURRENCY = 8
+# Un /export de un router grande puede tardar: se espera el turno con holgura
+BACKUP_DEVICE_WAIT_TIMEOUT = 300
+DEFAULT_INTERVAL_HOURS = 24
+# Un router que falló no se reintenta en cada ciclo del monitor, sino pasado este tiempo
+RETRY_FAILED_SECONDS = 3600
+
+# Primera línea de /export: '# 2024-05-01 10:00:00 by RouterOS 7.15' (v7) o
+# '# may/01/2024 10:00:00 by RouterOS 6.49' (v6). La fecha cambia en cada
+# exportación, así que se quita para que configuraciones iguales den el mismo hash.
+_EXPORT_HEADER_RE = re.compile(r"^# .*? by RouterOS", re.MULTILINE)
+
+
+def normalize_export(text: str) -> str:
+    """Quita la fecha de la cabecera, unifica los finales de línea y los espacios finales."""
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").split("\n")]
+    normalized = "\n".join(lines).strip("\n") + "\n"
+    return _EXPORT_HEADER_RE.sub("# by RouterOS", normalized, count=1)
+
+
+def _object_path(sha256: str) -> str:
+    return os.path.join(OBJECTS_DIR, sha256[:2], sha256 + OBJECT_EXTENSION)
+
+
+def store_object(text: str) -> Tuple[str, int]:
+    """
+    Guarda el texto comprimido (zlib) bajo su sha256. Un contenido que ya
+    existe no se vuelve a escribir: configuraciones idénticas ocupan una vez.
+    """
+    data = text.encode("utf-8")
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = _object_path(sha256)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(data, 9))
+        os.replace(tmp_path, path)
+    return sha256, len(data)
+
+
+def load_object(sha256: str) -> str:
+    with open(_object_path(sha256), "rb") as f:
+        return zlib.decompress(f.read()).decode("utf-8")
+
+
+@lru_cache(maxsize=64)
+def diff_objects(from_sha256: str, to_sha256: str, from_label: str = "a", to_label: str = "b") -> str:
+    """Diff unificado entre dos versiones; se calcula al pedirlo y se cachea (los objetos no cambian)."""
+    if from_sha256 == to_sha256:
+        return ""
+    before = load_object(from_sha256).splitlines(keepends=True)
+    after = load_object(to_sha256).splitlines(keepends=True)
+    return "".join(difflib.unified_diff(before, after, fromfile=from_label, tofile=to_label))
+
+
+def backup_router(router: Dict[str, Any], wait_timeout: Optional[float] = BACKUP_DEVICE_WAIT_TIMEOUT) -> Dict[str, Any]:
+    """Exporta la configuración de un router (una sesión, con su turno) y la guarda."""
+    host = router["host"]
+    with device_limiter.acquire(host, router.get("zona_id"), timeout=wait_timeout):
+        with router_api_session(host, router["username"], router["password"], router["api_ssl_port"]) as api:
+            text = export_router_config(api)
+    sha256, size = store_object(normalize_export(text))
+    return backups_db.record_backup(host, sha256, size)
+
+
+def run_backups(routers: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Copia varios routers en paralelo; devuelve cuántos cambiaron, no cambiaron o fallaron."""
+    def backup_one(router) -> str:
+        try:
+            return "changed" if backup_router(router)["changed"] else "unchanged"
+        except Exception as e:
+            logging.warning(f"Copia de configuración: falló {router['host']}: {e or type(e).__name__}")
+            return "failed"
+
+    counts = {"changed": 0, "unchanged": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=BACKUP_MAX_CONCURRENCY, thread_name_prefix="Backup") as executor:
+        for outcome in executor.map(backup_one, routers):
+            counts[outcome] += 1
+    return counts
+
+
+def _interval_hours() -> float:
+    try:
+        return float(get_setting('router_backup_interval_hours') or DEFAULT_INTERVAL_HOURS)
+    except ValueError:
+        return DEFAULT_INTERVAL_HOURS
+
+
+class BackupScheduler:
+    """
+    El monitor llama a maybe_start() en cada ciclo: si la copia está activada,
+    lanza en un hilo aparte la de los routers cuya última copia es más antigua
+    que 'router_backup_interval_hours'. Nunca hay dos rondas a la vez.
+    """
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._last_attempt: Dict[str, float] = {}
+
+    def routers_due(self, routers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        cutoff = datetime.utcnow() - timedelta(hours=_interval_hours())
+        retry_after = time.monotonic() - RETRY_FAILED_SECONDS
+        last_seen = backups_db.get_last_seen_by_router()
+        return [router for router in routers
+                if (not last_seen.get(router["host"]) or datetime.fromisoformat(last_seen[router["host"]]) < cutoff)
+                and self._last_attempt.get(router["host"], float("-inf")) < retry_after]
+
+    def maybe_start(self, routers: List[Dict[str, Any]]):
+        if get_setting('router_backup_enabled') != '1':
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        due = self.routers_due(routers)
+        if not due:
+            return
+        now = time.monotonic()
+        self._last_attempt.update((router["host"], now) for router in due)
+        self._thread = threading.Thread(target=self._run, args=(due,), name="Backup-Round", daemon=True)
+        self._thread.start()
+
+    def _run(self, routers: List[Dict[str, Any]]):
+        started = time.monotonic()
+        logging.info(f"Copia de configuración: exportando {len(routers)} routers...")
+        counts = run_backups(routers)
+        logging.info(f"Copia de configuración terminada en {time.monotonic() - started:.1f} s: "
+                     f"{counts['changed']} con cambios, {counts['unchanged']} sin cambios, {counts['failed']} fallidos.")
+
+
+backup_scheduler = BackupScheduler()
@@ -0,0 +1,201 @@
+# app/core/router_reconciler.py
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from routeros_api.api import RouterOsApi
+from routeros_api.query import IsEqualQuery, OrQuery
+
+# Valores booleanos que RouterOS acepta con varias grafías
+_TRUE_VALUES = {"yes", "true"}
+_FALSE_VALUES = {"no", "false"}
+# Velocidades con sufijo ('10M'); la API las devuelve en bits ('10000000')
+_RATE_RE = re.compile(r"^(\d+(?:\.\d+)?)([kMG])$")
+_RATE_MULTIPLIERS = {"k": 1_000, "M": 1_000_000, "G": 1_000_000_000}
+
+
+@dataclass
+class MenuState:
+    """
+    Estado deseado de un menú de RouterOS (p. ej. '/ip/pool').
+
+    - key: propiedad que identifica cada elemento ('name', 'service-name'...).
+    - present: {valor de key: propiedades} que deben existir con esos valores.
+    - absent: valores de key que no deben existir.
+
+    Las propiedades se escriben con guiones, como en RouterOS. Solo se
+    comparan y escriben las propiedades declaradas; el resto no se toca.
+    """
+    path: str
+    key: str = "name"
+    present: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    absent: Sequence[str] = ()
+
+
+@dataclass
+class Change:
+    op: str  # 'add' | 'set' | 'remove'
+    path: str
+    key: str
+    value: str
+    id: Any = None
+    properties: Dict[str, str] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"op": self.op, "path": self.path, self.key: self.value, "id": self.id,
+                "properties": self.properties}
+
+
+def _normalize(value: Any) -> str:
+    text = "" if value is None else str(value)
+    lowered = text.lower()
+    if lowered in _TRUE_VALUES:
+        return "true"
+    if lowered in _FALSE_VALUES:
+        return "false"
+    parts = []
+    for part in text.split("/"):
+        match = _RATE_RE.match(part)
+        parts.append(str(int(float(match.group(1)) * _RATE_MULTIPLIERS[match.group(2)])) if match else part)
+    return "/".join(parts)
+
+
+def merge_states(states: Sequence[MenuState]) -> List[MenuState]:
+    """
+    Une los estados del mismo menú y clave (p. ej. dos planes que declaran los
+    mismos tipos de cola) para no planificar altas duplicadas. Conserva el
+    orden de la primera aparición; si un elemento se repite, gana el último.
+    """
+    merged: Dict[Tuple[str, str], MenuState] = {}
+    for state in states:
+        current = merged.get((state.path, state.key))
+        if current is None:
+            merged[(state.path, state.key)] = MenuState(state.path, state.key, dict(state.present), list(state.absent))
+        else:
+            current.present.update(state.present)
+            current.absent = [*current.absent, *(value for value in state.absent if value not in current.absent)]
+    return list(merged.values())
+
+
+def _read_menus(api: RouterOsApi, states: Sequence[MenuState]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Lee cada menú afectado una sola vez: solo las columnas declaradas y solo
+    las filas cuya clave aparece en el estado deseado (una consulta OR).
+    """
+    by_path: Dict[str, List[MenuState]] = {}
+    for state in states:
+        by_path.setdefault(state.path, []).append(state)
+
+    rows: Dict[str, List[Dict[str, Any]]] = {}
+    for path, path_states in by_path.items():
+        columns = {".id"}
+        terms = []
+        for state in path_states:
+            columns.add(state.key)
+            for properties in state.present.values():
+                columns.update(properties)
+            terms += [IsEqualQuery(state.key, value) for value in (*state.present, *state.absent)]
+        if not terms:
+            rows[path] = []
+            continue
+        where = terms[0] if len(terms) == 1 else OrQuery(*terms)
+        rows[path] = api.get_resource(path).call('print', {'.proplist': ','.join(sorted(columns))},
+                                                 additional_queries=(where,))
+    return rows
+
+
+def _row_id(row: Dict[str, Any]) -> Any:
+    return row.get("id") or row.get(".id")
+
+
+def plan_changes(api: RouterOsApi, states: Sequence[MenuState]) -> List[Change]:
+    """
+    Compara el estado deseado con el del router y devuelve los cambios
+    mínimos: 'add' para lo que falta, 'set' solo con las propiedades que
+    difieren y 'remove' para lo que sobra (incluidos duplicados).
+
+    Las eliminaciones van primero y en orden inverso al declarado (así se
+    borra antes lo que depende de otros elementos); después las altas y
+    modificaciones en el orden declarado.
+    """
+    rows = _read_menus(api, states)
+    removals: List[List[Change]] = []
+    updates: List[Change] = []
+    for state in states:
+        matches: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows[state.path]:
+            matches.setdefault(row.get(state.key), []).append(row)
+
+        state_removals = []
+        for value in state.absent:
+            for row in matches.get(value, []):
+                state_removals.append(Change("remove", state.path, state.key, value, id=_row_id(row)))
+        for value, properties in state.present.items():
+            current = matches.get(value, [])
+            if not current:
+                updates.append(Change("add", state.path, state.key, value, properties=dict(properties)))
+                continue
+            row = current[0]
+            changed = {prop: desired for prop, desired in properties.items()
+                       if _normalize(row.get(prop)) != _normalize(desired)}
+            if changed:
+                updates.append(Change("set", state.path, state.key, value, id=_row_id(row), properties=changed))
+            for duplicate in current[1:]:
+                state_removals.append(Change("remove", state.path, state.key, value, id=_row_id(duplicate)))
+        removals.append(state_removals)
+
+    return [change for state_removals in reversed(removals) for change in state_removals] + updates
+
+
+def _phases(changes: Sequence[Change]) -> List[List[Change]]:
+    """Agrupa cambios consecutivos del mismo menú y operación: cada grupo se envía de una vez."""
+    phases: List[List[Change]] = []
+    for change in changes:
+        if phases and (phases[-1][0].path, phases[-1][0].op == "remove") == (change.path, change.op == "remove"):
+            phases[-1].append(change)
+        else:
+            phases.append([change])
+    return phases
+
+
+def apply_changes(api: RouterOsApi, changes: Sequence[Change]) -> List[Tuple[Change, str]]:
+    """
+    Envía los cambios encadenados (call_async): todos los comandos de una fase
+    salen sin esperar respuesta y luego se recogen las respuestas. Entre fases
+    se espera, para respetar las dependencias entre menús. Devuelve los
+    cambios que fallaron con su error.
+    """
+    errors: List[Tuple[Change, str]] = []
+    for phase in _phases(changes):
+        promises = []
+        for change in phase:
+            resource = api.get_resource(change.path)
+            if change.op == "add":
+                arguments = {change.key: change.value, **change.properties}
+            elif change.op == "set":
+                arguments = {"id": change.id, **change.properties}
+            else:
+                arguments = {"id": change.id}
+            promises.append((change, resource.call_async(change.op, arguments)))
+        for change, promise in promises:
+            try:
+                promise.get()
+            except Exception as e:
+                errors.append((change, str(e)))
+    return errors
+
+
+def reconcile(api: RouterOsApi, states: Sequence[MenuState], dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Lleva el router al estado deseado. Con dry_run=True solo devuelve el plan.
+    Resultado: {'changes': [...], 'applied': bool, 'errors': [...]}.
+    """
+    changes = plan_changes(api, states)
+    result = {"changes": [change.as_dict() for change in changes], "applied": False, "errors": []}
+    if dry_run or not changes:
+        return result
+    errors = apply_changes(api, changes)
+    result["applied"] = True
+    result["errors"] = [{**change.as_dict(), "error": error} for change, error in errors]
+    return result
@@ -0,0 +1,198 @@
+# app/core/snapshot_capture.py
+
+import glob
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .airos_parser import loads
+
+try:
+    import zstandard as zstd
+except ImportError:  # Dependencia opcional: sin ella los segmentos se escriben con gzip
+    zstd = None
+
+# --- Constantes ---
+CAPTURE_DIR = "captures"
+SEGMENT_MAX_RECORDS = 20000     # Registros por segmento antes de rotar
+FLUSH_EVERY_RECORDS = 200       # Cada bloque cerrado es legible aunque el proceso muera
+ZSTD_LEVEL = 3
+ZSTD_EXTENSION = ".ndjson.zst"
+GZIP_EXTENSION = ".ndjson.gz"
+# Errores de lectura de un segmento cortado a mitad de bloque
+_TRUNCATION_ERRORS = (EOFError, OSError) + ((zstd.ZstdError,) if zstd is not None else ())
+
+
+class _Segment:
+    """Un fichero NDJSON comprimido abierto para escritura."""
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self._raw = open(path, "wb")
+        if zstd is not None:
+            self._stream = zstd.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+
+    def write(self, line: bytes):
+        self._stream.write(line)
+        self.records += 1
+        if self.records % FLUSH_EVERY_RECORDS == 0:
+            self.flush()
+
+    def flush(self):
+        if zstd is not None:
+            # Cierra el frame: los frames completos se leen aunque el siguiente quede truncado
+            self._stream.flush(zstd.FLUSH_FRAME)
+        else:
+            self._stream.flush()
+        self._raw.flush()
+
+    def close(self):
+        if zstd is not None:
+            self._stream.flush(zstd.FLUSH_FRAME)
+            self._stream.close()
+        else:
+            self._stream.close()
+        self._raw.close()
+
+
+class SnapshotCapture:
+    """
+    Guarda la respuesta cruda de status.cgi de cada AP en segmentos NDJSON
+    comprimidos (zstd, o gzip si no está instalado), particionados por día:
+    captures/YYYY-MM-DD/snapshots-<hora>-<pid>.ndjson.zst. Cada línea es
+    {"ts": ..., "host": ..., "data": {...}}. Cada proceso escribe sus propios
+    segmentos, nunca añade a uno existente.
+    """
+    def __init__(self, root: str = CAPTURE_DIR):
+        self.root = root
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._segment: Optional[_Segment] = None
+        self._segment_day: Optional[date] = None
+
+    def configure(self, enabled: bool):
+        with self._lock:
+            if self.enabled and not enabled:
+                self._close_segment()
+            self.enabled = enabled
+
+    def _open_segment(self, now: datetime):
+        day_dir = os.path.join(self.root, now.strftime("%Y-%m-%d"))
+        os.makedirs(day_dir, exist_ok=True)
+        extension = ZSTD_EXTENSION if zstd is not None else GZIP_EXTENSION
+        path = os.path.join(day_dir, f"snapshots-{now.strftime('%H%M%S')}-{os.getpid()}{extension}")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(day_dir, f"snapshots-{now.strftime('%H%M%S')}-{os.getpid()}-{suffix}{extension}")
+            suffix += 1
+        self._segment = _Segment(path)
+        self._segment_day = now.date()
+
+    def _close_segment(self):
+        if self._segment:
+            self._segment.close()
+            self._segment = None
+
+    def append(self, host: str, data: Any, timestamp: Optional[datetime] = None):
+        """Añade un snapshot. `data` puede ser el dict o los bytes JSON crudos de la respuesta."""
+        if not self.enabled:
+            return
+        timestamp = timestamp or datetime.utcnow()
+        raw = bytes(data).strip() if isinstance(data, (bytes, bytearray)) else \
+            json.dumps(data, separators=(",", ":")).encode()
+        if b"\n" in raw or b"\r" in raw:
+            # JSON con saltos de línea (con formato): se compacta para que sea una sola línea NDJSON
+            try:
+                raw = json.dumps(loads(raw), separators=(",", ":")).encode()
+            except ValueError as e:
+                logging.warning(f"No se pudo capturar el snapshot de {host}: JSON inválido ({e}).")
+                return
+        line = b'{"ts":"%s","host":%s,"data":%s}\n' % (
+            timestamp.isoformat(" ").encode(), json.dumps(host).encode(), raw)
+        try:
+            with self._lock:
+                if self._segment is None or self._segment_day != timestamp.date() \
+                        or self._segment.records >= SEGMENT_MAX_RECORDS:
+                    self._close_segment()
+                    self._open_segment(timestamp)
+                self._segment.write(line)
+        except OSError as e:
+            logging.warning(f"No se pudo capturar el snapshot de {host}: {e}")
+
+    def flush(self):
+        """Vuelca el bloque en curso (el monitor lo llama al final de cada ciclo)."""
+        with self._lock:
+            if self._segment:
+                try:
+                    self._segment.flush()
+                except OSError as e:
+                    logging.warning(f"No se pudo volcar el segmento {self._segment.path}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+
+snapshot_capture = SnapshotCapture()
+
+
+# --- Lectura (replay) ---
+
+def list_segments(root: str = CAPTURE_DIR, start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+    """Segmentos ordenados por día y nombre, opcionalmente limitados a [start, end]."""
+    segments = []
+    for day_dir in sorted(glob.glob(os.path.join(root, "????-??-??"))):
+        try:
+            day = date.fromisoformat(os.path.basename(day_dir))
+        except ValueError:
+            continue
+        if (start and day < start) or (end and day > end):
+            continue
+        for extension in (ZSTD_EXTENSION, GZIP_EXTENSION):
+            segments.extend(sorted(glob.glob(os.path.join(day_dir, f"*{extension}"))))
+    return segments
+
+
+def _open_segment_reader(path: str) -> io.BufferedIOBase:
+    if path.endswith(ZSTD_EXTENSION):
+        if zstd is None:
+            raise RuntimeError(f"Se necesita el paquete 'zstandard' para leer {path}.")
+        return io.BufferedReader(zstd.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True,
+                                                                        closefd=True))
+    return gzip.open(path, "rb")
+
+
+def iter_segment_lines(path: str) -> Iterator[bytes]:
+    """
+    Líneas crudas de un segmento. Un final truncado (proceso interrumpido) se
+    descarta con un aviso en lugar de abortar el replay.
+    """
+    reader = _open_segment_reader(path)
+    try:
+        while True:
+            try:
+                line = reader.readline()
+            except _TRUNCATION_ERRORS as e:
+                logging.warning(f"Segmento {path} truncado: se ignora el resto ({e}).")
+                return
+            if not line:
+                return
+            if line.endswith(b"\n"):
+                yield line
+            else:
+                logging.warning(f"Segmento {path} con una línea incompleta al final: se ignora.")
+                return
+    finally:
+        reader.close()
+
+
+def parse_record(line: bytes) -> Tuple[datetime, str, Dict[str, Any]]:
+    record = loads(line)
+    return datetime.fromisoformat(record["ts"]), record["host"], record["data"]
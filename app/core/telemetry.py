@@ -0,0 +1,289 @@
+# app/core/telemetry.py
+
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .airos_parser import StatusSnapshot
+
+# --- Constantes ---
+TELEMETRY_FILE = "telemetry.prom"
+
+# (nombre, ayuda) de cada familia de gauges, en el orden en que se renderizan
+AP_METRICS = [
+    ("umonitor_ap_client_count", "Clientes (CPEs) asociados al AP."),
+    ("umonitor_ap_airtime_usage_percent", "Uso total de airtime del AP (%)."),
+    ("umonitor_ap_airtime_tx_percent", "Uso de airtime en transmisión (%)."),
+    ("umonitor_ap_airtime_rx_percent", "Uso de airtime en recepción (%)."),
+    ("umonitor_ap_noise_floor_dbm", "Piso de ruido del AP (dBm)."),
+    ("umonitor_ap_throughput_tx_kbps", "Throughput total de transmisión (kbps)."),
+    ("umonitor_ap_throughput_rx_kbps", "Throughput total de recepción (kbps)."),
+    ("umonitor_ap_frequency_mhz", "Frecuencia del canal (MHz)."),
+    ("umonitor_ap_channel_width_mhz", "Ancho de canal (MHz)."),
+    ("umonitor_ap_cpu_load_percent", "Carga de CPU del AP (%)."),
+    ("umonitor_ap_uptime_seconds", "Uptime del AP (s)."),
+]
+CPE_METRICS = [
+    ("umonitor_cpe_signal_dbm", "Señal del CPE vista por el AP (dBm)."),
+    ("umonitor_cpe_chain0_dbm", "Señal de la cadena 0 (dBm)."),
+    ("umonitor_cpe_chain1_dbm", "Señal de la cadena 1 (dBm)."),
+    ("umonitor_cpe_noise_floor_dbm", "Piso de ruido del CPE (dBm)."),
+    ("umonitor_cpe_cinr_rx_db", "CINR airMAX de recepción (dB)."),
+    ("umonitor_cpe_cinr_tx_db", "CINR airMAX de transmisión (dB)."),
+    ("umonitor_cpe_dl_capacity_kbps", "Capacidad de bajada estimada (kbps)."),
+    ("umonitor_cpe_ul_capacity_kbps", "Capacidad de subida estimada (kbps)."),
+    ("umonitor_cpe_distance_meters", "Distancia al AP (m)."),
+    ("umonitor_cpe_tx_power_dbm", "Potencia de transmisión del CPE (dBm)."),
+]
+ROUTER_METRICS = [
+    ("umonitor_router_cpu_load_percent", "Carga de CPU del Router (%)."),
+    ("umonitor_router_free_memory_bytes", "Memoria libre del Router."),
+    ("umonitor_router_total_memory_bytes", "Memoria total del Router."),
+    ("umonitor_router_free_hdd_bytes", "Almacenamiento libre del Router."),
+    ("umonitor_router_uptime_seconds", "Uptime del Router (s)."),
+    ("umonitor_router_ppp_active_sessions", "Sesiones PPP activas en el Router."),
+]
+LIVENESS_METRICS = [
+    ("umonitor_device_icmp_loss_percent", "Pérdida de ICMP en las últimas muestras del liveness (%)."),
+    ("umonitor_device_icmp_rtt_avg_ms", "RTT medio de ICMP en las últimas muestras del liveness (ms)."),
+    ("umonitor_device_icmp_rtt_last_ms", "RTT de la última respuesta ICMP del liveness (ms)."),
+]
+UP_METRIC = ("umonitor_device_up", "1 si el último sondeo del dispositivo tuvo éxito.")
+
+_ROUTEROS_UPTIME_RE = re.compile(r"(\d+)([wdhms])")
+_ROUTEROS_CLOCK_RE = re.compile(r"(\d+):(\d+):(\d+)$")
+_UPTIME_UNITS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def encode_labels(**labels: Any) -> str:
+    """Codifica un conjunto de etiquetas una sola vez: '{a="x",b="y"}'."""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items() if v is not None) + "}"
+
+
+def _number(value: Any) -> Optional[float]:
+    """Enteros (contadores, bytes, uptime) se conservan como int para no perder precisión."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_sample(value: Any) -> str:
+    """
+    Valor exacto en la exposición: str() para enteros y repr() (ida y vuelta)
+    para floats; los no finitos con la grafía de Prometheus (NaN, +Inf, -Inf).
+    """
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def parse_routeros_uptime(value: Any) -> Optional[int]:
+    """Convierte el uptime de RouterOS ('1w2d3h4m5s' o '2d03:04:05') a segundos."""
+    if not value:
+        return None
+    text = str(value)
+    clock = _ROUTEROS_CLOCK_RE.search(text)
+    total = 0
+    if clock:
+        hours, minutes, seconds = (int(g) for g in clock.groups())
+        total = hours * 3600 + minutes * 60 + seconds
+        text = text[:clock.start()]
+    matches = _ROUTEROS_UPTIME_RE.findall(text)
+    if not matches and not clock:
+        return None
+    return total + sum(int(n) * _UPTIME_UNITS[u] for n, u in matches)
+
+
+class _Series:
+    """Muestras de un dispositivo: etiquetas ya codificadas y valores por familia."""
+    __slots__ = ("labels", "values")
+
+    def __init__(self, labels: str, values: Dict[str, Optional[float]]):
+        self.labels = labels
+        self.values = values
+
+
+class TelemetryCache:
+    """
+    Último estado conocido de APs, CPEs y Routers para exportarlo a Prometheus.
+    Las etiquetas se codifican al actualizar (no en cada scrape), de modo que
+    renderizar es solo concatenar cadenas.
+    """
+    def __init__(self):
+        self._aps: Dict[str, _Series] = {}
+        self._cpes: Dict[str, Dict[str, _Series]] = {}   # por AP: {mac: serie}
+        self._routers: Dict[str, _Series] = {}
+        self._up: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        self._liveness: List[_Series] = []
+        self._lock = threading.Lock()
+
+    def update_ap(self, host: str, snapshot: StatusSnapshot):
+        ap = snapshot.ap
+        hostname = ap.hostname or host
+
+        ap_series = _Series(
+            encode_labels(host=host, hostname=hostname, essid=ap.essid),
+            {
+                "umonitor_ap_client_count": _number(ap.client_count),
+                "umonitor_ap_airtime_usage_percent": _number(ap.airtime_total_usage),
+                "umonitor_ap_airtime_tx_percent": _number(ap.airtime_tx_usage),
+                "umonitor_ap_airtime_rx_percent": _number(ap.airtime_rx_usage),
+                "umonitor_ap_noise_floor_dbm": _number(ap.noise_floor),
+                "umonitor_ap_throughput_tx_kbps": _number(ap.total_throughput_tx),
+                "umonitor_ap_throughput_rx_kbps": _number(ap.total_throughput_rx),
+                "umonitor_ap_frequency_mhz": _number(ap.frequency),
+                "umonitor_ap_channel_width_mhz": _number(ap.chanbw),
+                "umonitor_ap_cpu_load_percent": _number(ap.cpuload),
+                "umonitor_ap_uptime_seconds": _number(ap.uptime),
+            },
+        )
+
+        cpes: Dict[str, _Series] = {}
+        for sta in snapshot.stations:
+            if not sta.cpe_mac:
+                continue
+            cpes[sta.cpe_mac] = _Series(
+                encode_labels(ap=host, mac=sta.cpe_mac, hostname=sta.cpe_hostname, ip=sta.ip_address),
+                {
+                    "umonitor_cpe_signal_dbm": _number(sta.signal),
+                    "umonitor_cpe_chain0_dbm": _number(sta.signal_chain0),
+                    "umonitor_cpe_chain1_dbm": _number(sta.signal_chain1),
+                    "umonitor_cpe_noise_floor_dbm": _number(sta.noisefloor),
+                    "umonitor_cpe_cinr_rx_db": _number(sta.airmax_cinr_rx),
+                    "umonitor_cpe_cinr_tx_db": _number(sta.airmax_cinr_tx),
+                    "umonitor_cpe_dl_capacity_kbps": _number(sta.dl_capacity),
+                    "umonitor_cpe_ul_capacity_kbps": _number(sta.ul_capacity),
+                    "umonitor_cpe_distance_meters": _number(sta.distance),
+                    "umonitor_cpe_tx_power_dbm": _number(sta.cpe_tx_power),
+                },
+            )
+
+        with self._lock:
+            self._aps[host] = ap_series
+            self._cpes[host] = cpes
+            self._up[("ap", host)] = (encode_labels(kind="ap", host=host), 1)
+
+    def update_router(self, host: str, data: Dict[str, Any]):
+        series = _Series(
+            encode_labels(host=host, hostname=data.get("name") or host, model=data.get("board-name")),
+            {
+                "umonitor_router_cpu_load_percent": _number(data.get("cpu-load")),
+                "umonitor_router_free_memory_bytes": _number(data.get("free-memory")),
+                "umonitor_router_total_memory_bytes": _number(data.get("total-memory")),
+                "umonitor_router_free_hdd_bytes": _number(data.get("free-hdd-space")),
+                "umonitor_router_uptime_seconds": _number(parse_routeros_uptime(data.get("uptime"))),
+                "umonitor_router_ppp_active_sessions": _number(data.get("ppp_active_count")),
+            },
+        )
+        with self._lock:
+            self._routers[host] = series
+            self._up[("router", host)] = (encode_labels(kind="router", host=host), 1)
+
+    def update_liveness(self, summaries: Dict[str, Tuple[str, Dict[str, Any]]]):
+        """Sustituye las series de ICMP por el resumen actual del liveness ({host: (tipo, resumen)})."""
+        series = [
+            _Series(encode_labels(kind=kind, host=host), {
+                "umonitor_device_icmp_loss_percent": _number(summary.get("loss_pct")),
+                "umonitor_device_icmp_rtt_avg_ms": _number(summary.get("rtt_avg_ms")),
+                "umonitor_device_icmp_rtt_last_ms": _number(summary.get("rtt_last_ms")),
+            })
+            for host, (kind, summary) in summaries.items()
+        ]
+        with self._lock:
+            self._liveness = series
+
+    def mark_down(self, kind: str, host: str):
+        """Un dispositivo caído deja de exportar telemetría y queda con up=0."""
+        with self._lock:
+            if kind == "ap":
+                self._aps.pop(host, None)
+                self._cpes.pop(host, None)
+            else:
+                self._routers.pop(host, None)
+            self._up[(kind, host)] = (encode_labels(kind=kind, host=host), 0)
+
+    def retain(self, ap_hosts, router_hosts):
+        """Olvida los dispositivos que ya no están en el inventario activo."""
+        ap_hosts, router_hosts = set(ap_hosts), set(router_hosts)
+        with self._lock:
+            for host in [h for h in self._aps if h not in ap_hosts]:
+                self._aps.pop(host, None)
+                self._cpes.pop(host, None)
+            for host in [h for h in self._routers if h not in router_hosts]:
+                self._routers.pop(host, None)
+            for key in [k for k in self._up if k[1] not in (ap_hosts if k[0] == "ap" else router_hosts)]:
+                del self._up[key]
+
+    def render(self) -> str:
+        with self._lock:
+            aps = list(self._aps.values())
+            cpes = [s for per_ap in self._cpes.values() for s in per_ap.values()]
+            routers = list(self._routers.values())
+            up = list(self._up.values())
+            liveness = list(self._liveness)
+
+        lines: List[str] = []
+        for families, series in ((AP_METRICS, aps), (CPE_METRICS, cpes), (ROUTER_METRICS, routers),
+                                 (LIVENESS_METRICS, liveness)):
+            for name, documentation in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{s.labels} {format_sample(s.values[name])}" for s in series if s.values[name] is not None)
+        name, documentation = UP_METRIC
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{labels} {value}" for labels, value in up)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str = TELEMETRY_FILE):
+        """Escribe el render en `path` de forma atómica (lo sirve la API)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+class TelemetryFileReader:
+    """Lector del archivo de telemetría en la API; solo relee si cambió."""
+    def __init__(self, path: str = TELEMETRY_FILE):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._content = b""
+        self._lock = threading.Lock()
+
+    def read(self) -> bytes:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return b""
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, "rb") as f:
+                    self._content = f.read()
+                self._mtime = mtime
+            return self._content
+
+
+# Caché del proceso del monitor
+telemetry_cache = TelemetryCache()
@@ -0,0 +1,103 @@
+# app/core/traffic_accounting.py
+
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .telemetry import parse_routeros_uptime
+from ..db import traffic_db
+
+# --- Constantes ---
+# Ancho de los contadores de /queue/simple en RouterOS
+COUNTER_MODULUS = 2 ** 64
+COUNTER_FIELDS = ("bytes_up", "bytes_down", "packets_up", "packets_down")
+# Colas dinámicas de sesiones PPP: '<pppoe-usuario>', '<l2tp-usuario>'...
+_PPP_QUEUE_RE = re.compile(r"^<\w+-(.+)>$")
+
+
+def subscriber_for_queue(queue_name: str) -> str:
+    """Abonado de una cola: el usuario PPP en las dinámicas, el nombre de la cola en las estáticas."""
+    match = _PPP_QUEUE_RE.match(queue_name)
+    return match.group(1) if match else queue_name
+
+
+def counter_delta(previous: Optional[int], current: Optional[int]) -> int:
+    """
+    Diferencia entre dos lecturas de un contador. Si baja, o se dio la vuelta
+    (solo verosímil si la lectura anterior estaba en la mitad alta del rango)
+    o se reinició, y entonces todo lo contado desde cero es nuevo.
+    """
+    if current is None:
+        return 0
+    if previous is None or current >= previous:
+        return current - (previous or 0)
+    if previous >= COUNTER_MODULUS // 2:
+        return COUNTER_MODULUS - previous + current
+    return current
+
+
+def compute_deltas(state: Dict[str, Dict[str, Any]], queues: List[Dict[str, Any]],
+                   sampled_at: datetime, router_uptime: Optional[int]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Compara las colas leídas con el estado anterior (por nombre de cola).
+
+    - Sin estado previo del router solo se toma la referencia (no se sabe
+      desde cuándo cuentan los contadores).
+    - Una cola nueva, o recreada (otro .id: p. ej. la sesión PPP reconectó),
+      o un router reiniciado desde la lectura anterior, cuenta desde cero.
+    - Las colas padre no se contabilizan: su tráfico es la suma de sus hijas.
+
+    Devuelve (consumos por cola, nuevo estado).
+    """
+    parents = {queue["parent"] for queue in queues if queue.get("parent") and queue["parent"] != "none"}
+    previous_sample = max((row["sampled_at"] for row in state.values()), default=None)
+    rebooted = False
+    if previous_sample is not None and router_uptime is not None:
+        rebooted = router_uptime < (sampled_at - datetime.fromisoformat(str(previous_sample))).total_seconds()
+
+    deltas: List[Dict[str, Any]] = []
+    new_state: List[Dict[str, Any]] = []
+    for queue in queues:
+        name = queue.get("name")
+        if not name or name in parents:
+            continue
+        subscriber = subscriber_for_queue(name)
+        new_state.append({"queue_name": name, "queue_id": queue.get("id"), "subscriber": subscriber,
+                          **{field: queue.get(field) for field in COUNTER_FIELDS}})
+        if previous_sample is None:
+            continue
+        previous = state.get(name)
+        from_zero = previous is None or rebooted or previous["queue_id"] != queue.get("id")
+        usage = {field: counter_delta(None if from_zero else previous[field], queue.get(field))
+                 for field in COUNTER_FIELDS}
+        if any(usage.values()):
+            deltas.append({"subscriber": subscriber, **usage})
+    return deltas, new_state
+
+
+class TrafficAccounting:
+    """
+    Contabilidad por abonado a partir de los contadores de /queue/simple que
+    el monitor ya lee en cada ciclo (get_router_telemetry): la diferencia con
+    la lectura anterior se acumula en el consumo por hora y por mes.
+    """
+    def __init__(self):
+        self.enabled = False
+
+    def configure(self, enabled: bool):
+        self.enabled = enabled
+
+    def record(self, router_host: str, data: Dict[str, Any], sampled_at: datetime):
+        if not self.enabled or data.get("queues") is None:
+            return
+        try:
+            state = traffic_db.get_counter_state(router_host)
+            deltas, new_state = compute_deltas(state, data["queues"], sampled_at,
+                                               parse_routeros_uptime(data.get("uptime")))
+            traffic_db.save_counter_cycle(router_host, new_state, deltas, sampled_at)
+        except Exception as e:
+            logging.error(f"Contabilidad de tráfico: no se pudo registrar {router_host}: {e}")
+
+
+traffic_accounting = TrafficAccounting()
@@ -6,8 +6,10 @@ from typing import List, Dict, Any, Optional
 import logging
 
 from .base import get_db_connection
+from .versions_db import bump_versions
 # --- CAMBIO: Importar las funciones de cifrado ---
 from ..core.security import encrypt_data, decrypt_data
+from ..core.airos_parser import StatusSnapshot
 
 # --- NUEVA FUNCIÓN (Movida desde monitor.py y mejorada) ---
 def get_enabled_aps_for_monitor() -> list:
@@ -17,7 +19,7 @@ def get_enabled_aps_for_monitor() -> list:
     aps_to_monitor = []
     try:
         conn = get_db_connection()
-        cursor = conn.execute("SELECT host, username, password FROM aps WHERE is_enabled = TRUE")
+        cursor = conn.execute("SELECT host, username, password, zona_id FROM aps WHERE is_enabled = TRUE")
         
         for row in cursor.fetchall():
             creds = dict(row)
@@ -30,6 +32,22 @@ def get_enabled_aps_for_monitor() -> list:
         logging.error(f"No se pudo obtener la lista de APs de la base de datos: {e}")
     return aps_to_monitor
 
+def get_enabled_ap_hosts() -> List[str]:
+    """Obtiene solo los hosts de los APs activos (sin descifrar credenciales)."""
+    conn = get_db_connection()
+    cursor = conn.execute("SELECT host FROM aps WHERE is_enabled = TRUE")
+    hosts = [row['host'] for row in cursor.fetchall()]
+    conn.close()
+    return hosts
+
+def get_ap_hosts_by_zona(zona_id: int) -> List[str]:
+    """Obtiene los hosts de los APs activos de una zona."""
+    conn = get_db_connection()
+    cursor = conn.execute("SELECT host FROM aps WHERE zona_id = ? AND is_enabled = TRUE ORDER BY host", (zona_id,))
+    hosts = [row['host'] for row in cursor.fetchall()]
+    conn.close()
+    return hosts
+
 # --- Funciones para el Monitor ---
 def get_ap_status(host: str) -> Optional[str]:
     """Obtiene el último estado conocido de un AP."""
@@ -40,27 +58,34 @@ def get_ap_status(host: str) -> Optional[str]:
     conn.close()
     return result[0] if result else None
 
-def update_ap_status(host: str, status: str, data: Optional[Dict[str, Any]] = None):
-    """Actualiza el estado de un AP, y opcionalmente sus metadatos si está online."""
+def get_ap_hostname(host: str) -> Optional[str]:
+    """Obtiene solo el hostname conocido de un AP (consulta ligera para alertas)."""
+    conn = get_db_connection()
+    cursor = conn.execute("SELECT hostname FROM aps WHERE host = ?", (host,))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0] if result else None
+
+def update_ap_status(host: str, status: str, data: Optional[StatusSnapshot] = None):
+    """Actualiza el estado de un AP, y opcionalmente sus metadatos (del snapshot parseado) si está online."""
     conn = get_db_connection()
     cursor = conn.cursor()
     now = datetime.utcnow()
     
     if status == 'online' and data:
-        host_info = data.get("host", {})
-        interfaces = data.get("interfaces", [{}, {}])
-        mac = interfaces[1].get("hwaddr") if len(interfaces) > 1 else None
+        ap = data.ap
         cursor.execute("""
         UPDATE aps 
         SET mac = ?, hostname = ?, model = ?, firmware = ?, last_status = ?, last_seen = ?, last_checked = ?
         WHERE host = ?
         """, (
-            mac, host_info.get("hostname"), host_info.get("devmodel"), 
-            host_info.get("fwversion"), status, now, now, host
+            ap.mac, ap.hostname, ap.model, 
+            ap.firmware, status, now, now, host
         ))
     else: # AP está offline o no hay datos
         cursor.execute("UPDATE aps SET last_status = ?, last_checked = ? WHERE host = ?", (status, now, host))
         
+    bump_versions("aps", conn=conn)
     conn.commit()
     conn.close()
 
@@ -68,7 +93,7 @@ def update_ap_status(host: str, status: str, data: Optional[Dict[str, Any]] = No
 def get_ap_credentials(host: str) -> Optional[Dict[str, Any]]:
     """Obtiene el usuario y la contraseña de un AP para la conexión en vivo."""
     conn = get_db_connection()
-    cursor = conn.execute("SELECT username, password FROM aps WHERE host = ?", (host,))
+    cursor = conn.execute("SELECT username, password, zona_id FROM aps WHERE host = ?", (host,))
     creds = cursor.fetchone()
     conn.close()
     
@@ -94,6 +119,7 @@ def create_ap_in_db(ap_data: Dict[str, Any]) -> Dict[str, Any]:
                 ap_data['zona_id'], ap_data['is_enabled'], ap_data['monitor_interval']
             )
         )
+        bump_versions("aps", conn=conn)
         conn.commit()
     except sqlite3.IntegrityError as e:
         conn.close()
@@ -185,6 +211,7 @@ def update_ap_in_db(host: str, updates: Dict[str, Any]) -> int:
     values.append(host)
     
     cursor = conn.execute(f"UPDATE aps SET {set_clause} WHERE host = ?", tuple(values))
+    bump_versions("aps", conn=conn)
     conn.commit()
     rowcount = cursor.rowcount
     conn.close()
@@ -194,6 +221,7 @@ def delete_ap_from_db(host: str) -> int:
     """Elimina un AP de la base de datos y devuelve el número de filas afectadas."""
     conn = get_db_connection()
     cursor = conn.execute("DELETE FROM aps WHERE host = ?", (host,))
+    bump_versions("aps", conn=conn)
     conn.commit()
     rowcount = cursor.rowcount
     conn.close()
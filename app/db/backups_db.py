@@ -0,0 +1,61 @@
+# app/db/backups_db.py
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from .base import get_db_connection
+
+def record_backup(router_host: str, sha256: str, size_bytes: int, taken_at: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Registra una copia. Si coincide con la última versión del router solo se
+    actualiza su 'last_seen_at'; si no, se crea una versión nueva.
+    Devuelve la versión con 'changed' indicando cuál de los dos casos fue.
+    """
+    now = taken_at or datetime.utcnow()
+    conn = get_db_connection()
+    try:
+        last = conn.execute(
+            "SELECT id, sha256 FROM router_backups WHERE router_host = ? ORDER BY taken_at DESC, id DESC LIMIT 1",
+            (router_host,)
+        ).fetchone()
+        if last and last['sha256'] == sha256:
+            conn.execute("UPDATE router_backups SET last_seen_at = ? WHERE id = ?", (now, last['id']))
+            backup_id, changed = last['id'], False
+        else:
+            cursor = conn.execute(
+                "INSERT INTO router_backups (router_host, sha256, size_bytes, taken_at, last_seen_at) VALUES (?, ?, ?, ?, ?)",
+                (router_host, sha256, size_bytes, now, now)
+            )
+            backup_id, changed = cursor.lastrowid, True
+        conn.commit()
+    finally:
+        conn.close()
+    return {**get_backup(backup_id), "changed": changed}
+
+def get_backup(backup_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT * FROM router_backups WHERE id = ?", (backup_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def list_backups(router_host: str, limit: int = 100) -> List[Dict[str, Any]]:
+    """Versiones de un router, de la más reciente a la más antigua."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            "SELECT * FROM router_backups WHERE router_host = ? ORDER BY taken_at DESC, id DESC LIMIT ?",
+            (router_host, limit)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def get_last_seen_by_router() -> Dict[str, str]:
+    """Última copia comprobada de cada router (para decidir cuáles tocan)."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("SELECT router_host, MAX(last_seen_at) AS last_seen_at FROM router_backups GROUP BY router_host")
+        return {row['router_host']: row['last_seen_at'] for row in cursor.fetchall()}
+    finally:
+        conn.close()
@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 from typing import Optional  # <-- CORRECCIÓN: Importación añadida
 
+from .instrumentation import connect
+
 # --- Constantes de la Base de Datos ---
 INVENTORY_DB_FILE = "inventory.sqlite"
 
@@ -12,10 +14,9 @@ def get_db_connection() -> sqlite3.Connection:
     """
     Establece una conexión con la base de datos de inventario
     y configura el row_factory para acceder a las columnas por nombre.
+    La conexión está instrumentada (latencia por sentencia y consultas lentas).
     """
-    conn = sqlite3.connect(INVENTORY_DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return connect(INVENTORY_DB_FILE)
 
 def get_stats_db_connection() -> Optional[sqlite3.Connection]:
     """
@@ -28,6 +29,4 @@ def get_stats_db_connection() -> Optional[sqlite3.Connection]:
     if not os.path.exists(stats_db_file):
         return None
         
-    conn = sqlite3.connect(stats_db_file, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
\ No newline at end of file
+    return connect(stats_db_file)
\ No newline at end of file
@@ -2,6 +2,7 @@
 import sqlite3
 from typing import List, Dict, Any, Optional
 from .base import get_db_connection
+from .versions_db import bump_versions
 
 def get_all_clients_with_cpe_count() -> List[Dict[str, Any]]:
     """Obtiene todos los clientes con su conteo de CPEs asociados."""
@@ -23,15 +24,17 @@ def create_client(client_data: Dict[str, Any]) -> Dict[str, Any]:
     conn = get_db_connection()
     try:
         cursor = conn.execute(
-            """INSERT INTO clients (name, address, phone_number, whatsapp_number, email, service_status, suspension_method, billing_day, notes, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))""",
+            """INSERT INTO clients (name, address, phone_number, whatsapp_number, email, service_status, suspension_method, billing_day, notes, pppoe_username, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))""",
             (
                 client_data.get('name'), client_data.get('address'), client_data.get('phone_number'),
                 client_data.get('whatsapp_number'), client_data.get('email'), client_data.get('service_status'),
-                client_data.get('suspension_method'), client_data.get('billing_day'), client_data.get('notes')
+                client_data.get('suspension_method'), client_data.get('billing_day'), client_data.get('notes'),
+                client_data.get('pppoe_username')
             )
         )
         new_client_id = cursor.lastrowid
+        bump_versions("clients", conn=conn)
         conn.commit()
 
         cursor = conn.execute("SELECT c.*, 0 as cpe_count FROM clients c WHERE c.id = ?", (new_client_id,))
@@ -52,16 +55,21 @@ def update_client(client_id: int, updates: Dict[str, Any]) -> Optional[Dict[str,
     values = list(updates.values())
     values.append(client_id)
     
-    cursor = conn.execute(f"UPDATE clients SET {set_clause} WHERE id = ?", tuple(values))
-    conn.commit()
-    
-    if cursor.rowcount == 0:
-        conn.close()
-        return None
+    try:
+        cursor = conn.execute(f"UPDATE clients SET {set_clause} WHERE id = ?", tuple(values))
+        bump_versions("clients", conn=conn)
+        conn.commit()
         
-    cursor = conn.execute("SELECT c.*, (SELECT COUNT(*) FROM cpes WHERE client_id = c.id) as cpe_count FROM clients c WHERE c.id = ?", (client_id,))
-    updated_client_row = cursor.fetchone()
-    conn.close()
+        if cursor.rowcount == 0:
+            return None
+            
+        cursor = conn.execute("SELECT c.*, (SELECT COUNT(*) FROM cpes WHERE client_id = c.id) as cpe_count FROM clients c WHERE c.id = ?", (client_id,))
+        updated_client_row = cursor.fetchone()
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
     if not updated_client_row:
         return None
     return dict(updated_client_row)
@@ -74,6 +82,7 @@ def delete_client(client_id: int) -> int:
         conn.execute("UPDATE cpes SET client_id = NULL WHERE client_id = ?", (client_id,))
         # Luego eliminar el cliente
         cursor = conn.execute("DELETE FROM clients WHERE id = ?", (client_id,))
+        bump_versions("clients", "cpes", conn=conn)
         conn.commit()
         return cursor.rowcount
     except sqlite3.Error as e:
@@ -4,6 +4,7 @@ import os
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from .base import get_db_connection
+from .versions_db import bump_versions
 
 def get_unassigned_cpes() -> List[Dict[str, Any]]:
     """Obtiene una lista de todos los CPEs que no están asignados a ningún cliente."""
@@ -13,6 +14,14 @@ def get_unassigned_cpes() -> List[Dict[str, Any]]:
     conn.close()
     return rows
 
+def get_cpe_ips() -> List[str]:
+    """Obtiene las IPs conocidas de los CPEs (para el liveness ICMP)."""
+    conn = get_db_connection()
+    cursor = conn.execute("SELECT DISTINCT ip_address FROM cpes WHERE ip_address IS NOT NULL AND ip_address != ''")
+    ips = [row['ip_address'] for row in cursor.fetchall()]
+    conn.close()
+    return ips
+
 def get_cpe_by_mac(mac: str) -> Optional[Dict[str, Any]]:
     """Obtiene un CPE por su dirección MAC."""
     conn = get_db_connection()
@@ -26,6 +35,7 @@ def assign_cpe_to_client(mac: str, client_id: int) -> int:
     conn = get_db_connection()
     try:
         cursor = conn.execute("UPDATE cpes SET client_id = ? WHERE mac = ?", (client_id, mac))
+        bump_versions("cpes", conn=conn)
         conn.commit()
         return cursor.rowcount
     except sqlite3.IntegrityError:
@@ -38,6 +48,7 @@ def unassign_cpe(mac: str) -> int:
     """Desasigna un CPE de cualquier cliente. Devuelve el número de filas afectadas."""
     conn = get_db_connection()
     cursor = conn.execute("UPDATE cpes SET client_id = NULL WHERE mac = ?", (mac,))
+    bump_versions("cpes", conn=conn)
     conn.commit()
     rowcount = cursor.rowcount
     conn.close()
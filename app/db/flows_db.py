@@ -0,0 +1,87 @@
+# app/db/flows_db.py
+import sqlite3
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from .base import get_db_connection
+from .instrumentation import connect
+from .init_db import _setup_stats_db
+from .stats_db import _stats_db_file_for
+from .traffic_db import _stats_db_files
+
+def get_subscriber_addresses() -> List[Tuple[str, str]]:
+    """
+    Direcciones IP conocidas de los abonados: las de las sesiones PPP
+    (índice 'ppp_sessions', con el usuario) y las de los CPEs (con su MAC).
+    Si una IP aparece en ambas, gana la sesión PPP (va la última).
+    """
+    conn = get_db_connection()
+    try:
+        cpes = conn.execute("SELECT ip_address, mac FROM cpes WHERE ip_address IS NOT NULL AND ip_address != ''").fetchall()
+        sessions = conn.execute("SELECT address, username FROM ppp_sessions WHERE address IS NOT NULL").fetchall()
+        return [(row['ip_address'], row['mac']) for row in cpes] + [(row['address'], row['username']) for row in sessions]
+    finally:
+        conn.close()
+
+def save_flow_aggregates(rows: Sequence[Tuple]) -> int:
+    """
+    Suma un lote de agregados (bucket, ip, abonado, protocolo, bytes_up,
+    bytes_down, packets_up, packets_down, flows) a 'flow_usage', con una
+    transacción por DB mensual. Devuelve las filas escritas.
+    """
+    by_month: Dict[str, List[Tuple]] = {}
+    for row in rows:
+        by_month.setdefault(_stats_db_file_for(row[0]), []).append(row)
+    for stats_db_file, month_rows in by_month.items():
+        _setup_stats_db(stats_db_file)
+        conn = connect(stats_db_file)
+        try:
+            conn.executemany("""
+                INSERT INTO flow_usage (bucket, subscriber_ip, subscriber, protocol, bytes_up, bytes_down,
+                                        packets_up, packets_down, flows)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(bucket, subscriber_ip, protocol) DO UPDATE SET
+                    subscriber = excluded.subscriber,
+                    bytes_up = bytes_up + excluded.bytes_up, bytes_down = bytes_down + excluded.bytes_down,
+                    packets_up = packets_up + excluded.packets_up, packets_down = packets_down + excluded.packets_down,
+                    flows = flows + excluded.flows
+            """, [(row[0].strftime('%Y-%m-%d %H:%M:%S'), *row[1:]) for row in month_rows])
+            conn.commit()
+        finally:
+            conn.close()
+    return len(rows)
+
+def get_flow_usage(start: datetime, end: datetime, subscriber: Optional[str] = None,
+                   limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Tráfico por abonado y protocolo en [start, end), de mayor a menor. Con
+    `subscriber` (usuario PPP, MAC de CPE o IP) solo el de ese abonado.
+    """
+    totals: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+    query = """
+        SELECT subscriber_ip, subscriber, protocol, SUM(bytes_up) AS bytes_up, SUM(bytes_down) AS bytes_down,
+               SUM(packets_up) AS packets_up, SUM(packets_down) AS packets_down, SUM(flows) AS flows
+        FROM flow_usage WHERE bucket >= ? AND bucket < ?
+    """
+    params: List[Any] = [start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')]
+    if subscriber:
+        query += " AND (subscriber = ? OR subscriber_ip = ?)"
+        params += [subscriber, subscriber]
+    query += " GROUP BY subscriber_ip, subscriber, protocol"
+    for stats_db_file in _stats_db_files(start, end):
+        conn = connect(stats_db_file)
+        try:
+            rows = conn.execute(query, params).fetchall()
+        except sqlite3.OperationalError:
+            # DB mensual anterior al colector de flujos
+            rows = []
+        finally:
+            conn.close()
+        for row in rows:
+            key = (row['subscriber_ip'], row['subscriber'], row['protocol'])
+            total = totals.setdefault(key, {"subscriber_ip": key[0], "subscriber": key[1], "protocol": key[2],
+                                            "bytes_up": 0, "bytes_down": 0, "packets_up": 0, "packets_down": 0,
+                                            "flows": 0})
+            for column in ("bytes_up", "bytes_down", "packets_up", "packets_down", "flows"):
+                total[column] += row[column]
+    return sorted(totals.values(), key=lambda total: total["bytes_up"] + total["bytes_down"], reverse=True)[:limit]
@@ -1,6 +1,7 @@
 # app/db/init_db.py
 import sqlite3
 from datetime import datetime
+from typing import Optional
 from .base import get_db_connection, INVENTORY_DB_FILE
 
 def _get_current_stats_db_file() -> str:
@@ -27,7 +28,15 @@ def _setup_inventory_db():
     """)
     default_settings = [
         ('telegram_bot_token', ''), ('telegram_chat_id', ''),
-        ('default_monitor_interval', '300'), ('dashboard_refresh_interval', '60')
+        ('default_monitor_interval', '300'), ('dashboard_refresh_interval', '60'),
+        ('live_cache_ttl', '10'), ('zone_max_concurrency', '4'),
+        ('liveness_interval', '5'), ('liveness_include_cpes', '0'),
+        ('metrics_token', ''), ('slow_query_ms', '200'),
+        ('profile_monitor_cycle', '0'), ('snapshot_capture_enabled', '0'),
+        ('ppp_session_index_enabled', '0'), ('job_max_workers', '4'),
+        ('router_backup_enabled', '0'), ('router_backup_interval_hours', '24'),
+        ('traffic_accounting_enabled', '0'), ('flow_collector_enabled', '0'),
+        ('flow_collector_port', '2055')
     ]
     cursor.executemany("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", default_settings)
     cursor.execute("""
@@ -104,6 +113,12 @@ def _setup_inventory_db():
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP
     )
     """)
+    # Usuario PPPoE del cliente: enlaza su consumo (colas '<pppoe-usuario>') con la ficha
+    client_columns = [col[1] for col in cursor.execute("PRAGMA table_info(clients)").fetchall()]
+    if 'pppoe_username' not in client_columns:
+        cursor.execute("ALTER TABLE clients ADD COLUMN pppoe_username TEXT;")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_pppoe_username ON clients (pppoe_username) "
+                   "WHERE pppoe_username IS NOT NULL;")
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS cpes (
         mac TEXT PRIMARY KEY, hostname TEXT, model TEXT, firmware TEXT, ip_address TEXT, client_id INTEGER,
@@ -119,15 +134,87 @@ def _setup_inventory_db():
         FOREIGN KEY (zona_id) REFERENCES zonas (id) ON DELETE SET NULL
     )
     """)
+    # Índice de sesiones PPP activas de toda la flota (lo mantiene el monitor con 'listen')
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ppp_sessions (
+        router_host TEXT NOT NULL, session_id TEXT NOT NULL, username TEXT, address TEXT,
+        caller_id TEXT, service TEXT, uptime TEXT, updated_at DATETIME,
+        PRIMARY KEY (router_host, session_id),
+        FOREIGN KEY (router_host) REFERENCES routers (host) ON DELETE CASCADE
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ppp_sessions_username ON ppp_sessions (username);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ppp_sessions_address ON ppp_sessions (address);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ppp_sessions_caller_id ON ppp_sessions (caller_id);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_aps_zona ON aps (zona_id);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_cpes_ip ON cpes (ip_address);")
-    
+
+    # Diario de trabajos en segundo plano (aprovisionamiento, configuración...).
+    # 'params' va cifrado (puede llevar contraseñas) y se borra al terminar.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, target TEXT, params TEXT,
+        status TEXT NOT NULL DEFAULT 'queued', progress INTEGER NOT NULL DEFAULT 0, message TEXT,
+        result TEXT, attempts INTEGER NOT NULL DEFAULT 0, created_by TEXT,
+        created_at DATETIME, started_at DATETIME, finished_at DATETIME
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_target ON jobs (target);")
+
+    # Plantillas de configuración parametrizadas (cuerpo JSON: direcciones IP, NAT, PPPoE y planes)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS config_templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, description TEXT,
+        body TEXT NOT NULL, created_at DATETIME, updated_at DATETIME
+    )
+    """)
+
+    # Versiones de la configuración (/export) de cada router. El texto vive en
+    # backups/objects/ direccionado por su sha256: solo se añade fila cuando cambia.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS router_backups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, router_host TEXT NOT NULL, sha256 TEXT NOT NULL,
+        size_bytes INTEGER, taken_at DATETIME NOT NULL, last_seen_at DATETIME NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_router_backups_host ON router_backups (router_host, taken_at);")
+
+    # Contabilidad de tráfico: última lectura de los contadores de cada cola
+    # (para calcular la diferencia en el siguiente ciclo) y consumo mensual por abonado.
+    # El consumo por hora va en la DB mensual de estadísticas.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS traffic_counter_state (
+        router_host TEXT NOT NULL, queue_name TEXT NOT NULL, queue_id TEXT, subscriber TEXT,
+        bytes_up INTEGER, bytes_down INTEGER, packets_up INTEGER, packets_down INTEGER,
+        sampled_at DATETIME NOT NULL,
+        PRIMARY KEY (router_host, queue_name)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS traffic_usage_monthly (
+        month TEXT NOT NULL, subscriber TEXT NOT NULL, router_host TEXT NOT NULL,
+        bytes_up INTEGER NOT NULL DEFAULT 0, bytes_down INTEGER NOT NULL DEFAULT 0,
+        packets_up INTEGER NOT NULL DEFAULT 0, packets_down INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, subscriber, router_host)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_traffic_usage_monthly_subscriber ON traffic_usage_monthly (subscriber, month);")
+
+    # Contadores de versión por tabla (ETag / GET condicional)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS data_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
     conn.commit()
     conn.close()
 
-def _setup_stats_db():
-    # ... (sin cambios en esta función)
-    stats_db_file = _get_current_stats_db_file()
+def _setup_stats_db(stats_db_file: Optional[str] = None):
+    # Por defecto, la DB del mes actual; el generador de datos la usa para meses pasados
+    stats_db_file = stats_db_file or _get_current_stats_db_file()
     stats_conn = sqlite3.connect(stats_db_file)
     stats_conn.row_factory = sqlite3.Row
     cursor = stats_conn.cursor()
@@ -157,6 +244,41 @@ def _setup_stats_db():
         cpe_hostname TEXT, reason_code INTEGER, connection_duration INTEGER
     )
     """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS router_stats_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME NOT NULL, router_host TEXT, uptime INTEGER,
+        cpu_load INTEGER, free_memory INTEGER, total_memory INTEGER, free_hdd INTEGER,
+        ppp_active_count INTEGER, queue_count INTEGER, queue_upload_bytes INTEGER, queue_download_bytes INTEGER
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS router_interface_stats_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME NOT NULL, router_host TEXT, interface TEXT,
+        rx_bytes INTEGER, tx_bytes INTEGER, running BOOLEAN
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS traffic_usage_hourly (
+        hour DATETIME NOT NULL, subscriber TEXT NOT NULL, router_host TEXT NOT NULL,
+        bytes_up INTEGER NOT NULL DEFAULT 0, bytes_down INTEGER NOT NULL DEFAULT 0,
+        packets_up INTEGER NOT NULL DEFAULT 0, packets_down INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hour, subscriber, router_host)
+    )
+    """)
+    # Tráfico por IP de abonado, protocolo e intervalo según los flujos NetFlow v9/IPFIX
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS flow_usage (
+        bucket DATETIME NOT NULL, subscriber_ip TEXT NOT NULL, subscriber TEXT, protocol INTEGER NOT NULL,
+        bytes_up INTEGER NOT NULL DEFAULT 0, bytes_down INTEGER NOT NULL DEFAULT 0,
+        packets_up INTEGER NOT NULL DEFAULT 0, packets_down INTEGER NOT NULL DEFAULT 0,
+        flows INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, subscriber_ip, protocol)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flow_usage_subscriber ON flow_usage (subscriber, bucket);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_traffic_usage_hourly_subscriber ON traffic_usage_hourly (subscriber, hour);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_router_stats_host_ts ON router_stats_history (router_host, timestamp);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_router_iface_stats_host_ts ON router_interface_stats_history (router_host, timestamp);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_cpe_stats_mac ON cpe_stats_history (cpe_mac);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_cpe_stats_ip ON cpe_stats_history (ip_address);")
     stats_conn.commit()
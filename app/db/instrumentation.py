@@ -0,0 +1,266 @@
+# app/db/instrumentation.py
+# Conexiones SQLite instrumentadas: latencia y filas por sentencia, etiquetadas
+# con la función que la ejecuta, más un registro de consultas lentas con su
+# EXPLAIN QUERY PLAN. Las usan get_db_connection() y get_stats_db_connection().
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# --- Constantes ---
+DEFAULT_SLOW_QUERY_MS = 200
+SLOW_LOG_SIZE = 200
+SETTINGS_REFRESH_SECONDS = 60
+MONITOR_DB_STATS_FILE = "monitor_db_stats.json"
+STATS_WRITE_INTERVAL = 30
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT", "REPLACE")
+
+
+def _normalize(sql: str) -> str:
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+def _caller() -> str:
+    """Primera función fuera de este módulo y de sqlite3 en la pila: 'modulo.funcion'."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module != __name__ and not module.startswith("sqlite3"):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+class QueryStats:
+    """Agregados por (función llamante, sentencia) y registro de consultas lentas del proceso."""
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=SLOW_LOG_SIZE)
+        self._lock = threading.Lock()
+        self._slow_ms = DEFAULT_SLOW_QUERY_MS
+        self._slow_ms_loaded_at = 0.0
+
+    def slow_threshold_ms(self) -> int:
+        """Umbral 'slow_query_ms' de los ajustes, releído cada minuto sin instrumentar."""
+        now = time.monotonic()
+        if now - self._slow_ms_loaded_at > SETTINGS_REFRESH_SECONDS:
+            self._slow_ms_loaded_at = now
+            try:
+                from .base import INVENTORY_DB_FILE
+                conn = sqlite3.connect(INVENTORY_DB_FILE)
+                try:
+                    row = conn.execute("SELECT value FROM settings WHERE key = 'slow_query_ms'").fetchone()
+                finally:
+                    conn.close()
+                if row and str(row[0]).isdigit():
+                    self._slow_ms = int(row[0])
+            except sqlite3.Error:
+                pass
+        return self._slow_ms
+
+    def record(self, caller: str, sql: str, seconds: float, rows: int = 0, calls: int = 1,
+               lock_wait: float = 0.0, locked: bool = False):
+        key = (caller, sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    "caller": caller, "sql": sql, "calls": 0, "total_ms": 0.0,
+                    "max_ms": 0.0, "rows": 0, "lock_wait_ms": 0.0, "locked_errors": 0,
+                }
+            ms = seconds * 1000
+            entry["calls"] += calls
+            entry["total_ms"] += ms
+            entry["rows"] += rows
+            entry["lock_wait_ms"] += lock_wait * 1000
+            if locked:
+                entry["locked_errors"] += 1
+            if ms > entry["max_ms"]:
+                entry["max_ms"] = ms
+
+    def record_slow(self, caller: str, sql: str, ms: float, plan: Optional[List[str]]):
+        logging.warning(f"Consulta lenta ({ms:.0f} ms) en {caller}: {sql[:200]}")
+        with self._lock:
+            self._slow.append({
+                "timestamp": time.time(), "caller": caller, "sql": sql,
+                "duration_ms": round(ms, 2), "plan": plan,
+            })
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = [dict(e) for e in self._stats.values()]
+        entries.sort(key=lambda e: e["total_ms"], reverse=True)
+        for entry in entries:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["calls"], 3) if entry["calls"] else 0.0
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+            entry["lock_wait_ms"] = round(entry["lock_wait_ms"], 3)
+        return entries[:limit]
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+    def write_snapshot(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"statements": self.top(limit=500), "slow_queries": self.slow_queries()}, f)
+        os.replace(tmp_path, path)
+
+
+query_stats = QueryStats()
+
+
+def _explain(conn: sqlite3.Connection, sql: str, parameters: Any) -> Optional[List[str]]:
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    try:
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        return [str(row[-1]) for row in rows]
+    except sqlite3.Error:
+        return None
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mide ejecución y lectura de filas de cada sentencia."""
+
+    def _start(self, sql: str, parameters: Any):
+        self._caller = _caller()
+        self._sql = _normalize(sql)
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._slow_logged = False
+
+    def _account(self, seconds: float, rows: int = 0, calls: int = 0, lock_wait: float = 0.0, locked: bool = False):
+        if not getattr(self, "_sql", None):
+            return
+        self._elapsed += seconds
+        query_stats.record(self._caller, self._sql, seconds, rows=rows, calls=calls,
+                           lock_wait=lock_wait, locked=locked)
+        ms = self._elapsed * 1000
+        if not self._slow_logged and ms >= query_stats.slow_threshold_ms():
+            self._slow_logged = True
+            plan = _explain(self.connection, self._sql, self._parameters) if self._parameters is not None else None
+            query_stats.record_slow(self._caller, self._sql, ms, plan)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except sqlite3.OperationalError as e:
+            elapsed = time.perf_counter() - started
+            locked = "locked" in str(e)
+            # Con 'database is locked' todo el tiempo se fue esperando el lock
+            self._account(elapsed, calls=1, lock_wait=elapsed if locked else 0.0, locked=locked)
+            raise
+        self._account(time.perf_counter() - started, calls=1)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._account(time.perf_counter() - started, calls=1, rows=max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(time.perf_counter() - started, rows=1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(time.perf_counter() - started, rows=len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(time.perf_counter() - started, rows=len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._account(time.perf_counter() - started)
+            raise
+        self._account(time.perf_counter() - started, rows=1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Conexión cuyos cursores están instrumentados. El tiempo de commit se
+    contabiliza como espera de lock: en SQLite el commit es donde se espera
+    el lock de escritura (y el fsync), así que es una aproximación útil.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        caller = _caller()
+        started = time.perf_counter()
+        locked = False
+        try:
+            super().commit()
+        except sqlite3.OperationalError as e:
+            locked = "locked" in str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            query_stats.record(caller, "COMMIT", elapsed, lock_wait=elapsed, locked=locked)
+
+
+def connect(database: str) -> sqlite3.Connection:
+    """sqlite3.connect con la conexión instrumentada y el row_factory del proyecto."""
+    conn = sqlite3.connect(database, check_same_thread=False, factory=InstrumentedConnection)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def read_stats_snapshot(path: str = MONITOR_DB_STATS_FILE) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def start_stats_writer(path: str = MONITOR_DB_STATS_FILE, interval: float = STATS_WRITE_INTERVAL):
+    """Hilo demonio que vuelca las estadísticas SQL del proceso (lo usa el monitor)."""
+    def _loop():
+        while True:
+            time.sleep(interval)
+            try:
+                query_stats.write_snapshot(path)
+            except OSError as e:
+                logging.warning(f"No se pudieron escribir las estadísticas SQL en {path}: {e}")
+    threading.Thread(target=_loop, name="DbStatsWriter", daemon=True).start()
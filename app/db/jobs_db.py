@@ -0,0 +1,122 @@
+# app/db/jobs_db.py
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from .base import get_db_connection
+from ..core.security import encrypt_data, decrypt_data
+
+_PUBLIC_COLUMNS = ("id, kind, target, status, progress, message, result, attempts, created_by, "
+                   "created_at, started_at, finished_at")
+
+def _job_from_row(row) -> Dict[str, Any]:
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job.get('result') else None
+    return job
+
+def create_job(kind: str, target: Optional[str], params: Dict[str, Any], created_by: Optional[str] = None) -> int:
+    """Registra un trabajo en cola. Los parámetros se guardan cifrados."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            "INSERT INTO jobs (kind, target, params, status, created_by, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (kind, target, encrypt_data(json.dumps(params)), created_by, datetime.utcnow())
+        )
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_db_connection()
+    try:
+        row = conn.execute(f"SELECT {_PUBLIC_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+    finally:
+        conn.close()
+
+def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, target: Optional[str] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+    conditions, params = [], []
+    for column, value in (("status", status), ("kind", kind), ("target", target)):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    query = f"SELECT {_PUBLIC_COLUMNS} FROM jobs"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id DESC LIMIT ?"
+    conn = get_db_connection()
+    try:
+        return [_job_from_row(row) for row in conn.execute(query, params + [limit]).fetchall()]
+    finally:
+        conn.close()
+
+def claim_job(job_id: int) -> Optional[Tuple[str, Optional[str], Dict[str, Any]]]:
+    """
+    Pasa un trabajo de 'queued' a 'running' de forma atómica y devuelve
+    (kind, target, params). None si otro hilo ya lo tomó o no existe.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ? AND status = 'queued'",
+            (datetime.utcnow(), job_id)
+        )
+        conn.commit()
+        if cursor.rowcount == 0:
+            return None
+        row = conn.execute("SELECT kind, target, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        params = json.loads(decrypt_data(row['params'])) if row['params'] else {}
+        return row['kind'], row['target'], params
+    finally:
+        conn.close()
+
+def update_progress(job_id: int, progress: int, message: Optional[str] = None):
+    conn = get_db_connection()
+    try:
+        conn.execute("UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ?",
+                     (progress, message, job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def finish_job(job_id: int, status: str, message: Optional[str], result: Optional[Dict[str, Any]] = None):
+    """Cierra un trabajo ('succeeded' o 'failed') y borra sus parámetros."""
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            """UPDATE jobs SET status = ?, message = ?, result = ?, params = NULL, finished_at = ?,
+                      progress = CASE WHEN ? = 'succeeded' THEN 100 ELSE progress END
+               WHERE id = ?""",
+            (status, message, json.dumps(result) if result is not None else None, datetime.utcnow(), status, job_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def requeue_interrupted_jobs(max_attempts: int) -> int:
+    """
+    Al arrancar: los trabajos que quedaron 'running' (el proceso murió) vuelven
+    a la cola si les quedan intentos; si no, se marcan como fallidos.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            """UPDATE jobs SET status = 'failed', params = NULL, finished_at = ?,
+                      message = 'Interrumpido demasiadas veces (reinicios del servicio).'
+               WHERE status = 'running' AND attempts >= ?""",
+            (datetime.utcnow(), max_attempts)
+        )
+        cursor = conn.execute("UPDATE jobs SET status = 'queued', message = 'Reencolado tras reinicio.' WHERE status = 'running'")
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def get_queued_job_ids() -> List[int]:
+    conn = get_db_connection()
+    try:
+        return [row['id'] for row in conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id").fetchall()]
+    finally:
+        conn.close()
@@ -0,0 +1,129 @@
+# app/db/ppp_sessions_db.py
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+from .base import get_db_connection
+
+def _session_row(router_host: str, session: Dict[str, Any], now: datetime) -> tuple:
+    caller_id = session.get("caller-id")
+    return (
+        router_host, session.get("id") or session.get(".id"), session.get("name"), session.get("address"),
+        caller_id.upper() if caller_id else None, session.get("service"), session.get("uptime"), now,
+    )
+
+def replace_router_sessions(router_host: str, sessions: Iterable[Dict[str, Any]]) -> int:
+    """
+    Resincronización completa: sustituye todas las sesiones de un router por
+    la tabla /ppp/active recién leída, en una transacción.
+    """
+    now = datetime.utcnow()
+    rows = [_session_row(router_host, session, now) for session in sessions]
+    conn = get_db_connection()
+    try:
+        conn.execute("DELETE FROM ppp_sessions WHERE router_host = ?", (router_host,))
+        conn.executemany("""
+            INSERT OR REPLACE INTO ppp_sessions
+                (router_host, session_id, username, address, caller_id, service, uptime, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
+def apply_session_events(router_host: str, events: Iterable[Dict[str, Any]]):
+    """
+    Aplica los cambios recibidos por 'listen' en orden: una fila con '.dead'
+    elimina la sesión; cualquier otra la inserta o actualiza.
+    """
+    now = datetime.utcnow()
+    conn = get_db_connection()
+    try:
+        for event in events:
+            session_id = event.get("id") or event.get(".id")
+            if not session_id:
+                continue
+            if event.get(".dead") in ("yes", "true"):
+                conn.execute("DELETE FROM ppp_sessions WHERE router_host = ? AND session_id = ?",
+                             (router_host, session_id))
+            else:
+                # 'listen' puede enviar solo las propiedades que cambian: se conservan las demás
+                conn.execute("""
+                    INSERT INTO ppp_sessions
+                        (router_host, session_id, username, address, caller_id, service, uptime, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(router_host, session_id) DO UPDATE SET
+                        username = COALESCE(excluded.username, username),
+                        address = COALESCE(excluded.address, address),
+                        caller_id = COALESCE(excluded.caller_id, caller_id),
+                        service = COALESCE(excluded.service, service),
+                        uptime = COALESCE(excluded.uptime, uptime),
+                        updated_at = excluded.updated_at
+                """, _session_row(router_host, event, now))
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Error en ppp_sessions_db.apply_session_events para {router_host}: {e}")
+    finally:
+        conn.close()
+
+def delete_router_sessions(router_host: str) -> int:
+    """Olvida las sesiones de un router que ya no se vigila."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("DELETE FROM ppp_sessions WHERE router_host = ?", (router_host,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def delete_sessions_except(router_hosts: Iterable[str]) -> int:
+    """Borra las sesiones de los routers que no están en la lista (eliminados o desactivados)."""
+    hosts = list(router_hosts)
+    conn = get_db_connection()
+    try:
+        placeholders = ",".join("?" for _ in hosts)
+        query = "DELETE FROM ppp_sessions"
+        if hosts:
+            query += f" WHERE router_host NOT IN ({placeholders})"
+        cursor = conn.execute(query, hosts)
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def find_sessions(username: Optional[str] = None, address: Optional[str] = None,
+                  caller_id: Optional[str] = None, router_host: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Búsqueda en el índice local (cada filtro usa su índice). Los filtros se
+    combinan con AND; la MAC (caller-id) se compara en mayúsculas.
+    """
+    conditions, params = [], []
+    for column, value in (("s.username", username), ("s.address", address),
+                          ("s.caller_id", caller_id.upper() if caller_id else None),
+                          ("s.router_host", router_host)):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    query = """
+        SELECT s.router_host, r.hostname AS router_hostname, s.session_id, s.username, s.address,
+               s.caller_id, s.service, s.uptime, s.updated_at
+        FROM ppp_sessions s LEFT JOIN routers r ON r.host = s.router_host
+    """
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY s.router_host, s.username"
+    conn = get_db_connection()
+    try:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+def count_sessions_by_router() -> Dict[str, int]:
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("SELECT router_host, COUNT(*) AS sessions FROM ppp_sessions GROUP BY router_host")
+        return {row['router_host']: row['sessions'] for row in cursor.fetchall()}
+    finally:
+        conn.close()
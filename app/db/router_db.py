@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional, List
 
 # --- CAMBIO: Importación actualizada para usar 'base.py' ---
 from .base import get_db_connection
+from .versions_db import bump_versions
 # --- CAMBIO: Importar las funciones de cifrado ---
 from ..core.security import encrypt_data, decrypt_data
 
@@ -62,6 +63,7 @@ def create_router_in_db(router_data: Dict[str, Any]) -> Dict[str, Any]:
                 router_data['zona_id'], router_data['api_port'], router_data['is_enabled']
             )
         )
+        bump_versions("routers", conn=conn)
         conn.commit()
     except sqlite3.IntegrityError as e:
         conn.close()
@@ -94,6 +96,7 @@ def update_router_in_db(host: str, updates: Dict[str, Any]) -> int:
         
         query = f"UPDATE routers SET {set_clause} WHERE host = ?"
         cursor = conn.execute(query, tuple(values))
+        bump_versions("routers", conn=conn)
         conn.commit()
         return cursor.rowcount
     except sqlite3.Error as e:
@@ -107,6 +110,7 @@ def delete_router_from_db(host: str) -> int:
     conn = get_db_connection()
     try:
         cursor = conn.execute("DELETE FROM routers WHERE host = ?", (host,))
+        bump_versions("routers", conn=conn)
         conn.commit()
         return cursor.rowcount
     except sqlite3.Error as e:
@@ -160,7 +164,7 @@ def get_enabled_routers_from_db() -> List[Dict[str, Any]]:
     try:
         conn = get_db_connection()
         cursor = conn.execute(
-            """SELECT host, username, password, api_ssl_port 
+            """SELECT host, username, password, api_ssl_port, zona_id 
                FROM routers 
                WHERE is_enabled = TRUE AND api_port = api_ssl_port"""
         )
@@ -173,4 +177,26 @@ def get_enabled_routers_from_db() -> List[Dict[str, Any]]:
         conn.close()
     except sqlite3.Error as e:
         logging.error(f"No se pudo obtener la lista de Routers de la base de datos: {e}")
-    return routers_to_monitor
\ No newline at end of file
+    return routers_to_monitor
+def get_enabled_router_hosts() -> List[str]:
+    """
+    Obtiene solo los hosts de los Routers que vigila el monitor (activos y aprovisionados).
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("SELECT host FROM routers WHERE is_enabled = TRUE AND api_port = api_ssl_port")
+        return [row['host'] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def get_enabled_router_hosts_by_zona(zona_id: int) -> List[str]:
+    """Hosts de los Routers activos y aprovisionados de una zona."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            "SELECT host FROM routers WHERE zona_id = ? AND is_enabled = TRUE AND api_port = api_ssl_port ORDER BY host",
+            (zona_id,)
+        )
+        return [row['host'] for row in cursor.fetchall()]
+    finally:
+        conn.close()
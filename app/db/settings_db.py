@@ -1,5 +1,6 @@
 # app/db/settings_db.py
 from .base import get_db_connection
+from .versions_db import bump_versions
 
 def get_all_settings() -> dict:
     """Obtiene toda la configuración de la base de datos."""
@@ -14,6 +15,7 @@ def update_settings(settings_to_update: dict):
     conn = get_db_connection()
     update_data = [(value, key) for key, value in settings_to_update.items()]
     conn.executemany("UPDATE settings SET value = ? WHERE key = ?", update_data)
+    bump_versions("settings", conn=conn)
     conn.commit()
     conn.close()
 
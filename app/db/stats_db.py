@@ -2,119 +2,207 @@
 import sqlite3
 import os
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 from .base import get_db_connection, get_stats_db_connection
+from .instrumentation import connect
 from .init_db import _setup_stats_db # Usamos la función de configuración
+from .versions_db import bump_versions
+from ..core.airos_parser import StatusSnapshot, parse_status, AP_HISTORY_FIELDS, STATION_HISTORY_FIELDS
+from ..core.telemetry import parse_routeros_uptime
 
-def _update_cpe_inventory(data: dict):
+def _stats_db_file_for(timestamp: datetime) -> str:
+    """DB mensual a la que pertenece una muestra (stats_YYYY_MM.sqlite)."""
+    return f"stats_{timestamp.strftime('%Y_%m')}.sqlite"
+
+def _update_cpe_inventory(snapshots: List[Tuple[StatusSnapshot, datetime]]):
     """Actualiza la tabla de inventario de CPEs (dispositivos) en la DB de inventario."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    now = datetime.utcnow()
     
-    for cpe in data.get("wireless", {}).get("sta", []):
-        remote = cpe.get("remote", {})
-        cursor.execute("""
-        INSERT INTO cpes (mac, hostname, model, firmware, ip_address, first_seen, last_seen)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(mac) DO UPDATE SET
-            hostname = excluded.hostname, model = excluded.model,
-            firmware = excluded.firmware, ip_address = excluded.ip_address,
-            last_seen = excluded.last_seen
-        """, (
-            cpe.get("mac"), remote.get("hostname"), remote.get("platform"),
-            cpe.get("version"), cpe.get("lastip"), now, now
-        ))
+    rows = [
+        (sta.cpe_mac, sta.cpe_hostname, sta.model, sta.firmware, sta.ip_address, seen_at, seen_at)
+        for snapshot, seen_at in snapshots for sta in snapshot.stations
+    ]
+    cursor.executemany("""
+    INSERT INTO cpes (mac, hostname, model, firmware, ip_address, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(mac) DO UPDATE SET
+        hostname = excluded.hostname, model = excluded.model,
+        firmware = excluded.firmware, ip_address = excluded.ip_address,
+        last_seen = excluded.last_seen
+    """, rows)
+    # Contador propio: el upsert no cambia asignaciones, así que no invalida /clients
+    bump_versions("cpe_inventory", conn=conn)
     conn.commit()
     conn.close()
 
-def save_full_snapshot(ap_host: str, data: dict):
+def _insert_snapshot(cursor: sqlite3.Cursor, ap_host: str, snapshot: StatusSnapshot, timestamp: datetime):
+    """Inserta las filas de AP, CPEs y desconexiones de un snapshot (sin commit)."""
+    cursor.execute("""
+        INSERT INTO ap_stats_history (
+            timestamp, ap_host, uptime, cpuload, freeram, client_count, noise_floor,
+            total_throughput_tx, total_throughput_rx, airtime_total_usage, 
+            airtime_tx_usage, airtime_rx_usage, frequency, chanbw, essid,
+            total_tx_bytes, total_rx_bytes, gps_lat, gps_lon, gps_sats
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (timestamp, ap_host) + snapshot.ap[:AP_HISTORY_FIELDS])
+
+    cursor.executemany("""
+        INSERT INTO cpe_stats_history (
+            timestamp, ap_host, cpe_mac, cpe_hostname, ip_address, signal, 
+            signal_chain0, signal_chain1, noisefloor, cpe_tx_power, distance, 
+            dl_capacity, ul_capacity, airmax_cinr_rx, airmax_usage_rx, 
+            airmax_cinr_tx, airmax_usage_tx, throughput_rx_kbps, throughput_tx_kbps, 
+            total_rx_bytes, total_tx_bytes, cpe_uptime, eth_plugged, eth_speed, eth_cable_len
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(timestamp, ap_host) + sta[:STATION_HISTORY_FIELDS] for sta in snapshot.stations])
+        
+    cursor.executemany("""
+        INSERT INTO disconnection_events (timestamp, ap_host, cpe_mac, cpe_hostname, reason_code, connection_duration)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(timestamp, ap_host) + event for event in snapshot.disconnects])
+
+def save_full_snapshot(ap_host: str, data: Union[StatusSnapshot, dict], timestamp: Optional[datetime] = None):
     """
     Función central que guarda un snapshot completo de datos en la DB de estadísticas.
+    Acepta el StatusSnapshot ya parseado o el dict crudo de status.cgi.
+    `timestamp` permite reingestar snapshots capturados (por defecto, ahora).
     """
     if not data: return
     
-    _update_cpe_inventory(data)
-    _setup_stats_db()
+    snapshot = data if isinstance(data, StatusSnapshot) else parse_status(data)
+    timestamp = timestamp or datetime.utcnow()
+    _update_cpe_inventory([(snapshot, timestamp)])
+    stats_db_file = _stats_db_file_for(timestamp)
+    _setup_stats_db(stats_db_file)
     
-    conn = get_stats_db_connection()
-    if not conn:
-        print(f"Error: No se pudo conectar a la base de datos de estadísticas para {ap_host}.")
-        return
-
-    cursor = conn.cursor()
-    timestamp = datetime.utcnow()
-    ap_hostname = data.get("host", {}).get("hostname", ap_host)
-
-    wireless_info = data.get("wireless", {})
-    throughput_info = wireless_info.get("throughput", {})
-    polling_info = wireless_info.get("polling", {})
-    ath0_status = data.get("interfaces", [{}, {}])[1].get("status", {})
-    gps_info = data.get("gps", {})
+    conn = connect(stats_db_file)
+    ap_hostname = snapshot.ap.hostname or ap_host
+    try:
+        _insert_snapshot(conn.cursor(), ap_host, snapshot, timestamp)
+        conn.commit()
+        # Se incrementa después del commit para que ningún ETag nuevo apunte a datos viejos
+        bump_versions("ap_stats")
+        print(f"Datos de '{ap_hostname}' y sus CPEs guardados en la base de datos de estadísticas.")
     
+    except sqlite3.Error as e:
+        print(f"Error de base de datos al guardar snapshot para {ap_host}: {e}")
+    finally:
+        conn.close()
+
+def save_snapshots_batch(snapshots: List[Tuple[str, Union[StatusSnapshot, dict], datetime]],
+                         update_inventory: bool = True) -> int:
+    """
+    Guarda muchos snapshots (host, data, timestamp) con una transacción por
+    DB mensual. Lo usa el replay de capturas. Devuelve los snapshots guardados.
+    """
+    by_month: Dict[str, List[Tuple[str, StatusSnapshot, datetime]]] = {}
+    for ap_host, data, timestamp in snapshots:
+        if data:
+            snapshot = data if isinstance(data, StatusSnapshot) else parse_status(data)
+            by_month.setdefault(_stats_db_file_for(timestamp), []).append((ap_host, snapshot, timestamp))
+    if not by_month:
+        return 0
+
+    if update_inventory:
+        _update_cpe_inventory([(snapshot, timestamp) for items in by_month.values() for _, snapshot, timestamp in items])
+
+    saved = 0
+    for stats_db_file, items in by_month.items():
+        _setup_stats_db(stats_db_file)
+        conn = connect(stats_db_file)
+        try:
+            cursor = conn.cursor()
+            for ap_host, snapshot, timestamp in items:
+                _insert_snapshot(cursor, ap_host, snapshot, timestamp)
+            conn.commit()
+            saved += len(items)
+        finally:
+            conn.close()
+    bump_versions("ap_stats")
+    return saved
+
+def _int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def save_router_snapshot(router_host: str, data: Dict[str, Any], timestamp: Optional[datetime] = None):
+    """
+    Guarda la telemetría de un ciclo de un Router (get_router_telemetry):
+    una fila de recursos/PPP/colas y una por interfaz, en una transacción.
+    """
+    if not data: return
+
+    timestamp = timestamp or datetime.utcnow()
+    stats_db_file = _stats_db_file_for(timestamp)
+    _setup_stats_db(stats_db_file)
+
+    conn = connect(stats_db_file)
     try:
+        cursor = conn.cursor()
         cursor.execute("""
-            INSERT INTO ap_stats_history (
-                timestamp, ap_host, uptime, cpuload, freeram, client_count, noise_floor,
-                total_throughput_tx, total_throughput_rx, airtime_total_usage, 
-                airtime_tx_usage, airtime_rx_usage, frequency, chanbw, essid,
-                total_tx_bytes, total_rx_bytes, gps_lat, gps_lon, gps_sats
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO router_stats_history (
+                timestamp, router_host, uptime, cpu_load, free_memory, total_memory, free_hdd,
+                ppp_active_count, queue_count, queue_upload_bytes, queue_download_bytes
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            timestamp, ap_host, data.get("host", {}).get("uptime"), data.get("host", {}).get("cpuload"),
-            data.get("host", {}).get("freeram"), wireless_info.get("count"), wireless_info.get("noisef"),
-            throughput_info.get("tx"), throughput_info.get("rx"),
-            polling_info.get("use"), polling_info.get("tx_use"), polling_info.get("rx_use"),
-            wireless_info.get("frequency"), wireless_info.get("chanbw"), wireless_info.get("essid"),
-            ath0_status.get("tx_bytes"), ath0_status.get("rx_bytes"),
-            gps_info.get("lat"), gps_info.get("lon"), gps_info.get("sats")
+            timestamp, router_host, parse_routeros_uptime(data.get("uptime")),
+            _int_or_none(data.get("cpu-load")), _int_or_none(data.get("free-memory")),
+            _int_or_none(data.get("total-memory")), _int_or_none(data.get("free-hdd-space")),
+            data.get("ppp_active_count"), data.get("queue_count"),
+            data.get("queue_upload_bytes"), data.get("queue_download_bytes"),
         ))
-
-        for cpe in wireless_info.get("sta", []):
-            remote = cpe.get("remote", {})
-            stats = cpe.get("stats", {})
-            airmax = cpe.get("airmax", {})
-            eth_info = remote.get("ethlist", [{}])[0]
-            chainrssi = cpe.get('chainrssi', [None, None, None])
-
-            cursor.execute("""
-                INSERT INTO cpe_stats_history (
-                    timestamp, ap_host, cpe_mac, cpe_hostname, ip_address, signal, 
-                    signal_chain0, signal_chain1, noisefloor, cpe_tx_power, distance, 
-                    dl_capacity, ul_capacity, airmax_cinr_rx, airmax_usage_rx, 
-                    airmax_cinr_tx, airmax_usage_tx, throughput_rx_kbps, throughput_tx_kbps, 
-                    total_rx_bytes, total_tx_bytes, cpe_uptime, eth_plugged, eth_speed, eth_cable_len
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                timestamp, ap_host, cpe.get("mac"), remote.get("hostname"),
-                cpe.get("lastip"), cpe.get("signal"), chainrssi[0], chainrssi[1], 
-                cpe.get("noisefloor"), remote.get("tx_power"), cpe.get("distance"),
-                airmax.get("dl_capacity"), airmax.get("ul_capacity"),
-                airmax.get('rx', {}).get('cinr'), airmax.get('rx', {}).get('usage'), 
-                airmax.get('tx', {}).get('cinr'), airmax.get('tx', {}).get('usage'), 
-                remote.get('rx_throughput'), remote.get('tx_throughput'), 
-                stats.get('rx_bytes'), stats.get('tx_bytes'), remote.get('uptime'), 
-                eth_info.get('plugged'), eth_info.get('speed'), eth_info.get('cable_len')
-            ))
-            
-        for event in wireless_info.get("sta_disconnected", []):
-            cursor.execute("""
-                INSERT INTO disconnection_events (timestamp, ap_host, cpe_mac, cpe_hostname, reason_code, connection_duration)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                timestamp, ap_host, event.get("mac"), event.get("hostname"),
-                event.get("reason_code"), event.get("disconnect_duration")
-            ))
-
+        cursor.executemany("""
+            INSERT INTO router_interface_stats_history (timestamp, router_host, interface, rx_bytes, tx_bytes, running)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            (timestamp, router_host, iface["name"], iface["rx_bytes"], iface["tx_bytes"], iface["running"])
+            for iface in data.get("interfaces") or []
+        ])
         conn.commit()
-        print(f"Datos de '{ap_hostname}' y sus CPEs guardados en la base de datos de estadísticas.")
-    
+        bump_versions("router_stats")
     except sqlite3.Error as e:
-        print(f"Error de base de datos al guardar snapshot para {ap_host}: {e}")
+        print(f"Error de base de datos al guardar la telemetría del Router {router_host}: {e}")
     finally:
-        if conn:
+        conn.close()
+
+def delete_history_for_hosts(ranges: Dict[str, Tuple[datetime, datetime]]) -> int:
+    """
+    Borra el histórico de cada AP solo entre su primer y su último timestamp
+    ({host: (primero, último)}, ambos incluidos), en las DBs mensuales
+    afectadas. Lo usa el replay antes de reingestar lo capturado: el resto de
+    APs y horas quedan intactos.
+    """
+    if not ranges:
+        return 0
+    by_month: Dict[str, List[Tuple[str, datetime, datetime]]] = {}
+    for host, (start, end) in ranges.items():
+        month = datetime(start.year, start.month, 1)
+        while month <= end:
+            by_month.setdefault(_stats_db_file_for(month), []).append((host, start, end))
+            month = datetime(month.year + (month.month // 12), (month.month % 12) + 1, 1)
+
+    deleted = 0
+    for stats_db_file, month_ranges in by_month.items():
+        if not os.path.exists(stats_db_file):
+            continue
+        conn = connect(stats_db_file)
+        try:
+            for table in ("ap_stats_history", "cpe_stats_history", "disconnection_events"):
+                for host, start, end in month_ranges:
+                    cursor = conn.execute(
+                        f"DELETE FROM {table} WHERE ap_host = ? AND timestamp >= ? AND timestamp <= ?",
+                        (host, start, end))
+                    deleted += cursor.rowcount
+            conn.commit()
+        finally:
             conn.close()
+    if deleted:
+        bump_versions("ap_stats")
+    return deleted
 
 def get_cpes_for_ap_from_stats(host: str) -> List[Dict[str, Any]]:
     """
@@ -0,0 +1,67 @@
+# app/db/templates_db.py
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from .base import get_db_connection
+
+def _template_from_row(row) -> Dict[str, Any]:
+    template = dict(row)
+    template['body'] = json.loads(template['body'])
+    return template
+
+def create_template(name: str, description: Optional[str], body: Dict[str, Any]) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            "INSERT INTO config_templates (name, description, body, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (name, description, json.dumps(body), now, now)
+        )
+        conn.commit()
+        template_id = cursor.lastrowid
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Ya existe una plantilla llamada '{name}'.")
+    finally:
+        conn.close()
+    return get_template(template_id)
+
+def get_template(template_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT * FROM config_templates WHERE id = ?", (template_id,)).fetchone()
+        return _template_from_row(row) if row else None
+    finally:
+        conn.close()
+
+def get_all_templates() -> List[Dict[str, Any]]:
+    conn = get_db_connection()
+    try:
+        return [_template_from_row(row) for row in conn.execute("SELECT * FROM config_templates ORDER BY name").fetchall()]
+    finally:
+        conn.close()
+
+def update_template(template_id: int, updates: Dict[str, Any]) -> int:
+    if 'body' in updates:
+        updates['body'] = json.dumps(updates['body'])
+    updates['updated_at'] = datetime.utcnow()
+    set_clause = ", ".join(f"{key} = ?" for key in updates)
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(f"UPDATE config_templates SET {set_clause} WHERE id = ?", (*updates.values(), template_id))
+        conn.commit()
+        return cursor.rowcount
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Ya existe una plantilla llamada '{updates.get('name')}'.")
+    finally:
+        conn.close()
+
+def delete_template(template_id: int) -> int:
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("DELETE FROM config_templates WHERE id = ?", (template_id,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
@@ -0,0 +1,199 @@
+# app/db/traffic_db.py
+import os
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+from .base import get_db_connection
+from .instrumentation import connect
+from .init_db import _setup_stats_db
+from .stats_db import _stats_db_file_for
+
+_COUNTER_COLUMNS = ("bytes_up", "bytes_down", "packets_up", "packets_down")
+
+def get_counter_state(router_host: str) -> Dict[str, Dict[str, Any]]:
+    """Última lectura de los contadores de cada cola del router, por nombre de cola."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("SELECT * FROM traffic_counter_state WHERE router_host = ?", (router_host,))
+        return {row['queue_name']: dict(row) for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+def _sum_by_subscriber(deltas: Iterable[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """Un abonado puede tener varias colas en el mismo router: se suman."""
+    totals: Dict[str, List[int]] = {}
+    for delta in deltas:
+        row = totals.setdefault(delta["subscriber"], [0, 0, 0, 0])
+        for i, column in enumerate(_COUNTER_COLUMNS):
+            row[i] += delta[column]
+    return totals
+
+def save_counter_cycle(router_host: str, state: List[Dict[str, Any]], deltas: List[Dict[str, Any]],
+                       sampled_at: datetime):
+    """
+    Guarda una lectura: sustituye el estado de contadores del router y suma
+    los consumos al mes (inventario, en la misma transacción) y a la hora
+    (DB mensual de estadísticas).
+    """
+    totals = _sum_by_subscriber(deltas)
+    month = sampled_at.strftime('%Y-%m')
+    conn = get_db_connection()
+    try:
+        conn.execute("DELETE FROM traffic_counter_state WHERE router_host = ?", (router_host,))
+        conn.executemany("""
+            INSERT INTO traffic_counter_state
+                (router_host, queue_name, queue_id, subscriber, bytes_up, bytes_down, packets_up, packets_down, sampled_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(router_host, row["queue_name"], row["queue_id"], row["subscriber"],
+               *(row[column] for column in _COUNTER_COLUMNS), sampled_at) for row in state])
+        conn.executemany("""
+            INSERT INTO traffic_usage_monthly (month, subscriber, router_host, bytes_up, bytes_down, packets_up, packets_down)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(month, subscriber, router_host) DO UPDATE SET
+                bytes_up = bytes_up + excluded.bytes_up, bytes_down = bytes_down + excluded.bytes_down,
+                packets_up = packets_up + excluded.packets_up, packets_down = packets_down + excluded.packets_down
+        """, [(month, subscriber, router_host, *usage) for subscriber, usage in totals.items()])
+        conn.commit()
+    finally:
+        conn.close()
+    if not totals:
+        return
+
+    stats_db_file = _stats_db_file_for(sampled_at)
+    _setup_stats_db(stats_db_file)
+    hour = sampled_at.strftime('%Y-%m-%d %H:00:00')
+    conn = connect(stats_db_file)
+    try:
+        conn.executemany("""
+            INSERT INTO traffic_usage_hourly (hour, subscriber, router_host, bytes_up, bytes_down, packets_up, packets_down)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(hour, subscriber, router_host) DO UPDATE SET
+                bytes_up = bytes_up + excluded.bytes_up, bytes_down = bytes_down + excluded.bytes_down,
+                packets_up = packets_up + excluded.packets_up, packets_down = packets_down + excluded.packets_down
+        """, [(hour, subscriber, router_host, *usage) for subscriber, usage in totals.items()])
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Error en traffic_db.save_counter_cycle (consumo por hora) para {router_host}: {e}")
+    finally:
+        conn.close()
+
+def _stats_db_files(start: datetime, end: datetime) -> List[str]:
+    """DBs mensuales existentes que cubren [start, end)."""
+    files = []
+    month = datetime(start.year, start.month, 1)
+    while month < end:
+        stats_db_file = _stats_db_file_for(month)
+        if os.path.exists(stats_db_file):
+            files.append(stats_db_file)
+        month = datetime(month.year + (month.month // 12), (month.month % 12) + 1, 1)
+    return files
+
+def get_hourly_usage(subscriber: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Consumo por hora de un abonado en [start, end), sumando todos los routers."""
+    rows: List[Dict[str, Any]] = []
+    for stats_db_file in _stats_db_files(start, end):
+        conn = connect(stats_db_file)
+        try:
+            cursor = conn.execute("""
+                SELECT hour AS period, SUM(bytes_up) AS bytes_up, SUM(bytes_down) AS bytes_down,
+                       SUM(packets_up) AS packets_up, SUM(packets_down) AS packets_down
+                FROM traffic_usage_hourly WHERE subscriber = ? AND hour >= ? AND hour < ?
+                GROUP BY hour ORDER BY hour
+            """, (subscriber, start.strftime('%Y-%m-%d %H:00:00'), end.strftime('%Y-%m-%d %H:%M:%S')))
+            rows.extend(dict(row) for row in cursor.fetchall())
+        except sqlite3.OperationalError:
+            # DB mensual anterior a la contabilidad de tráfico
+            pass
+        finally:
+            conn.close()
+    return rows
+
+def get_monthly_usage(subscriber: str, start_month: str, end_month: str) -> List[Dict[str, Any]]:
+    """Consumo mensual de un abonado entre dos meses 'YYYY-MM' (ambos incluidos)."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT month AS period, SUM(bytes_up) AS bytes_up, SUM(bytes_down) AS bytes_down,
+                   SUM(packets_up) AS packets_up, SUM(packets_down) AS packets_down
+            FROM traffic_usage_monthly WHERE subscriber = ? AND month >= ? AND month <= ?
+            GROUP BY month ORDER BY month
+        """, (subscriber, start_month, end_month))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def _with_clients(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Añade el cliente enlazado (clients.pppoe_username) a cada fila de consumo."""
+    subscribers = [row["subscriber"] for row in rows]
+    if not subscribers:
+        return rows
+    conn = get_db_connection()
+    try:
+        placeholders = ",".join("?" for _ in subscribers)
+        cursor = conn.execute(f"SELECT id, name, pppoe_username FROM clients WHERE pppoe_username IN ({placeholders})",
+                              subscribers)
+        clients = {row['pppoe_username']: row for row in cursor.fetchall()}
+    finally:
+        conn.close()
+    for row in rows:
+        client = clients.get(row["subscriber"])
+        row["client_id"] = client['id'] if client else None
+        row["client_name"] = client['name'] if client else None
+    return rows
+
+def get_top_talkers_by_month(month: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Abonados con más tráfico (subida + bajada) en un mes 'YYYY-MM'."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT subscriber, SUM(bytes_up) AS bytes_up, SUM(bytes_down) AS bytes_down,
+                   SUM(packets_up) AS packets_up, SUM(packets_down) AS packets_down,
+                   GROUP_CONCAT(DISTINCT router_host) AS routers
+            FROM traffic_usage_monthly WHERE month = ?
+            GROUP BY subscriber ORDER BY SUM(bytes_up) + SUM(bytes_down) DESC LIMIT ?
+        """, (month, limit))
+        rows = [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    return _with_clients(rows)
+
+def get_top_talkers_between(start: datetime, end: datetime, limit: int = 10) -> List[Dict[str, Any]]:
+    """Abonados con más tráfico en [start, end), a partir del consumo por hora."""
+    totals: Dict[str, Dict[str, Any]] = {}
+    for stats_db_file in _stats_db_files(start, end):
+        conn = connect(stats_db_file)
+        try:
+            cursor = conn.execute("""
+                SELECT subscriber, router_host, SUM(bytes_up) AS bytes_up, SUM(bytes_down) AS bytes_down,
+                       SUM(packets_up) AS packets_up, SUM(packets_down) AS packets_down
+                FROM traffic_usage_hourly WHERE hour >= ? AND hour < ?
+                GROUP BY subscriber, router_host
+            """, (start.strftime('%Y-%m-%d %H:00:00'), end.strftime('%Y-%m-%d %H:%M:%S')))
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        finally:
+            conn.close()
+        for row in rows:
+            total = totals.setdefault(row['subscriber'], {"subscriber": row['subscriber'], "routers": set(),
+                                                          **{column: 0 for column in _COUNTER_COLUMNS}})
+            total["routers"].add(row['router_host'])
+            for column in _COUNTER_COLUMNS:
+                total[column] += row[column]
+    top = sorted(totals.values(), key=lambda total: total["bytes_up"] + total["bytes_down"], reverse=True)[:limit]
+    for total in top:
+        total["routers"] = ",".join(sorted(total["routers"]))
+    return _with_clients(top)
+
+def get_client_subscriber(client_id: int) -> Optional[str]:
+    """Usuario PPPoE enlazado a un cliente (None si no tiene); KeyError si el cliente no existe."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT pppoe_username FROM clients WHERE id = ?", (client_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise KeyError(client_id)
+    return row['pppoe_username']
@@ -8,6 +8,7 @@ from .base import get_db_connection
 class UserInDB(BaseModel):
     username: str
     hashed_password: str
+    role: str = 'admin'
     disabled: bool = False
 
 # --- Funciones de Acceso a Datos ---
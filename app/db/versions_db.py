@@ -0,0 +1,64 @@
+# app/db/versions_db.py
+import sqlite3
+import logging
+from typing import Dict, Optional
+
+from .base import get_db_connection
+
+# --- Contadores de versión por tabla ---
+# Cada función que modifica datos incrementa el contador de la(s) tabla(s)
+# afectada(s). Los endpoints GET construyen su ETag a partir de estos
+# contadores y pueden responder 304 sin ejecutar la consulta pesada.
+# Vive en la DB de inventario para que el monitor (otro proceso) y la API
+# compartan los mismos valores.
+
+def bump_versions(*tables: str, conn: Optional[sqlite3.Connection] = None):
+    """
+    Incrementa el contador de versión de una o más tablas.
+    Si se pasa 'conn', el cambio se hace dentro de su transacción (el llamador
+    hace el commit); si no, se abre una conexión propia.
+    """
+    if not tables:
+        return
+    params = [(table,) for table in tables]
+    query = """
+        INSERT INTO data_versions (table_name, version) VALUES (?, 1)
+        ON CONFLICT(table_name) DO UPDATE SET version = version + 1
+    """
+    if conn is not None:
+        conn.executemany(query, params)
+        return
+
+    own_conn = get_db_connection()
+    try:
+        own_conn.executemany(query, params)
+        own_conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Error en versions_db.bump_versions para {tables}: {e}")
+    finally:
+        own_conn.close()
+
+def get_versions(*tables: str) -> Dict[str, int]:
+    """Obtiene los contadores de versión actuales (0 si la tabla nunca cambió)."""
+    conn = get_db_connection()
+    try:
+        placeholders = ", ".join(["?"] * len(tables))
+        cursor = conn.execute(
+            f"SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})",
+            tables
+        )
+        versions = {row['table_name']: row['version'] for row in cursor.fetchall()}
+    except sqlite3.Error as e:
+        logging.error(f"Error en versions_db.get_versions para {tables}: {e}")
+        versions = {}
+    finally:
+        conn.close()
+    return {table: versions.get(table, 0) for table in tables}
+
+def get_etag(*tables: str, extra: str = "") -> str:
+    """Construye un ETag débil a partir de las versiones de las tablas indicadas."""
+    versions = get_versions(*tables)
+    tag = "-".join(f"{table}.{version}" for table, version in versions.items())
+    if extra:
+        tag = f"{tag}-{extra}"
+    return f'W/"{tag}"'
@@ -3,6 +3,7 @@ import sqlite3
 import os
 from typing import List, Dict, Any, Optional
 from .base import get_db_connection
+from .versions_db import bump_versions
 from ..core.security import encrypt_data, decrypt_data
 
 # --- Funciones de Zonas (CRUD Básico) ---
@@ -12,6 +13,7 @@ def create_zona(nombre: str) -> Dict[str, Any]:
     try:
         cursor = conn.execute("INSERT INTO zonas (nombre) VALUES (?)", (nombre,))
         new_id = cursor.lastrowid
+        bump_versions("zonas", conn=conn)
         conn.commit()
     except sqlite3.IntegrityError:
         conn.close()
@@ -39,6 +41,7 @@ def update_zona_details(zona_id: int, updates: Dict[str, Any]) -> Optional[Dict[
     
     try:
         cursor = conn.execute(f"UPDATE zonas SET {set_clause} WHERE id = ?", tuple(values))
+        bump_versions("zonas", conn=conn)
         conn.commit()
         if cursor.rowcount == 0:
             return None
@@ -61,6 +64,7 @@ def delete_zona(zona_id: int) -> int:
         raise ValueError("No se puede eliminar la zona porque contiene Routers.")
 
     cursor_delete = conn.execute("DELETE FROM zonas WHERE id = ?", (zona_id,))
+    bump_versions("zonas", conn=conn)
     conn.commit()
     rowcount = cursor_delete.rowcount
     conn.close()
@@ -9,12 +9,15 @@ from fastapi.templating import Jinja2Templates
 from datetime import timedelta
 from fastapi.middleware.cors import CORSMiddleware
 
+from .core.request_metrics import RequestMetricsMiddleware
+
 from .auth import (
     User, get_current_active_user, verify_password,
     create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, Token
 )
 from .db import users_db
-from .api import routers_api, users_api, clients_api, cpes_api, zonas_api, settings_api, aps_api, stats_api
+from .api import routers_api, users_api, clients_api, cpes_api, zonas_api, settings_api, aps_api, stats_api, metrics_api, admin_api, jobs_api, templates_api
+from .core.jobs import job_runner
 
 app = FastAPI(title="µMonitor Pro", version="0.4.0") # Versión actualizada
 
@@ -23,6 +26,8 @@ app.add_middleware(
     CORSMiddleware, allow_origins=origins, allow_credentials=True,
     allow_methods=["*"], allow_headers=["*"],
 )
+# Latencia por ruta, tamaño de respuesta y peticiones en curso (y perfilado bajo demanda)
+app.add_middleware(RequestMetricsMiddleware)
 
 current_dir = os.path.dirname(__file__)
 static_dir = os.path.join(current_dir, '..', 'static')
@@ -139,4 +144,17 @@ app.include_router(clients_api.router, prefix="/api", tags=["Clients"])
 app.include_router(zonas_api.router, prefix="/api", tags=["Zonas"])
 app.include_router(users_api.router, prefix="/api", tags=["Users"])
 app.include_router(settings_api.router, prefix="/api", tags=["Settings"])
-app.include_router(stats_api.router, prefix="/api", tags=["Stats"])
\ No newline at end of file
+app.include_router(stats_api.router, prefix="/api", tags=["Stats"])
+app.include_router(metrics_api.router, prefix="/api", tags=["Metrics"])
+app.include_router(admin_api.router, prefix="/api", tags=["Admin"])
+app.include_router(jobs_api.router, prefix="/api", tags=["Jobs"])
+app.include_router(templates_api.router, prefix="/api", tags=["Templates"])
+
+# --- Trabajos en segundo plano: reanudar los pendientes al arrancar ---
+@app.on_event("startup")
+def start_job_runner():
+    job_runner.start()
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    job_runner.stop()
\ No newline at end of file
@@ -1,27 +1,42 @@
 # app/monitor.py
 
+import os
 import time
 import logging
 import ssl 
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
 # --- IMPORTACIONES MODULARIZADAS ---
 from .core.ap_client import UbiquitiClient
-from routeros_api import RouterOsApiPool
-from routeros_api.api import RouterOsApi
-from .core.mikrotik_client import get_system_resources
+from .core.airos_parser import parse_status
+from .core.mikrotik_client import router_api_session, get_router_telemetry
 from .core.alerter import send_telegram_alert
+from .core.limiter import device_limiter, run_fair_by_zone
+from .core.circuit_breaker import circuit_breaker, tcp_probe
+from .core.liveness import liveness_sweeper
+from .core.telemetry import telemetry_cache, TELEMETRY_FILE
+from .core.snapshot_capture import snapshot_capture
+from .core.ppp_session_index import ppp_session_index
+from .core.router_backup import backup_scheduler
+from .core.traffic_accounting import traffic_accounting
+from .db.instrumentation import start_stats_writer, MONITOR_DB_STATS_FILE
+from .core.profiler import StackSampler, MONITOR_PROFILE_FILE
+from .core.metrics import (
+    MONITOR_METRICS_FILE, start_snapshot_writer, POLL_DURATION, POLL_RESULTS,
+    DEVICE_LAST_POLL_SECONDS, POLLS_IN_FLIGHT, POLL_QUEUE_DEPTH, CYCLE_DURATION,
+    CYCLE_LAST_TIMESTAMP, SNAPSHOT_SAVE_DURATION
+)
 
-from .db.settings_db import get_setting
+from .db.settings_db import get_setting, update_settings
 from .db.aps_db import (
     get_ap_status, 
     update_ap_status, 
     get_enabled_aps_for_monitor,
-    get_ap_by_host_with_stats
+    get_ap_hostname,
+    get_ap_credentials
 )
-from .db.stats_db import save_full_snapshot
+from .db.stats_db import save_full_snapshot, save_router_snapshot
 from .db.router_db import (
     get_router_status, 
     update_router_status, 
@@ -31,44 +46,36 @@ from .db.router_db import (
 
 # --- Constantes ---
 MAX_WORKERS = 10
+AP_PROBE_PORT = 443
 
 # --- FUNCIÓN CORREGIDA ---
-def process_router(router_config: dict):
+def process_router(router_config: dict) -> str:
     """
     Realiza el proceso completo de verificación para un solo Router MikroTik.
+    Devuelve el resultado del sondeo para las métricas ('success', 'skipped', 'timeout'...).
     """
     host = router_config["host"]
+    # Con el circuito abierto solo se hace un sondeo TCP barato al vencer el retroceso
+    if not circuit_breaker.allow_poll(host, probe=lambda: tcp_probe(host, router_config["api_ssl_port"])):
+        logging.info(f"Router {host} omitido: sigue sin responder (circuito abierto).")
+        return "skipped"
     logging.info(f"--- Verificando Router en {host} ---")
     
-    pool: Optional[RouterOsApiPool] = None # <-- Usar un Pool
     status_data = None
+    result = "error"
     try:
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
-        pool = RouterOsApiPool(
-            host=host,
-            # --- INICIO DE LA CORRECCIÓN ---
-            username=router_config["username"], # <-- Se llamaba 'user', ahora es 'username'
-            # --- FIN DE LA CORRECCIÓN ---
-            password=router_config["password"],
-            port=router_config["api_ssl_port"],
-            use_ssl=True,
-            ssl_context=ssl_context,
-            plaintext_login=True
-        )
-        api = pool.get_api()
-        status_data = get_system_resources(api)
+        # Turno del dispositivo y de su zona, compartido con la API
+        with device_limiter.acquire(host, router_config.get("zona_id")):
+            # Una sola sesión por ciclo para todas las lecturas del router
+            with router_api_session(host, router_config["username"], router_config["password"],
+                                    router_config["api_ssl_port"]) as api:
+                status_data = get_router_telemetry(api)
+        polled_at = datetime.utcnow()
         
     except Exception as e:
-        # El error que ves en el log ("unexpected keyword argument 'user'")
-        # ocurre aquí, en la línea de 'pool = RouterOsApiPool(...)'
         logging.warning(f"No se pudo conectar al Router {host} vía API-SSL: {e}")
         status_data = None
-    finally:
-        if pool:
-            pool.disconnect()
+        result = "timeout" if isinstance(e, TimeoutError) else "error"
     
     # --- El resto de la lógica no cambia ---
     previous_status = get_router_status(host)
@@ -77,32 +84,49 @@ def process_router(router_config: dict):
         current_status = 'online'
         hostname = status_data.get("name", host)
         logging.info(f"Estado de Router '{hostname}' ({host}): ONLINE")
+        circuit_breaker.record_success(host)
         
+        save_router_snapshot(host, status_data, polled_at)
+        # Consumo por abonado a partir de los contadores de las colas ya leídos
+        traffic_accounting.record(host, status_data, polled_at)
         update_router_status(host, current_status, data=status_data)
+        telemetry_cache.update_router(host, status_data)
         
         if previous_status == 'offline':
             message = f"✅ *ROUTER RECUPERADO*\n\nEl Router *{hostname}* (`{host}`) ha vuelto a estar en línea."
             send_telegram_alert(message)
+        return "success"
     else:
-        current_status = 'offline'
-        logging.warning(f"Estado de Router {host}: OFFLINE")
-        
-        update_router_status(host, current_status)
-        
-        if previous_status != 'offline':
-            router_info = get_router_by_host(host)
-            hostname = router_info.get('hostname') if (router_info and router_info.get('hostname')) else host
-            
-            message = f"❌ *ALERTA: ROUTER CAÍDO*\n\nNo se pudo establecer conexión API-SSL con el Router *{hostname}* (`{host}`)."
-            send_telegram_alert(message)
+        circuit_breaker.record_failure(host)
+        handle_router_offline(host, previous_status, "No se pudo establecer conexión API-SSL con el Router")
+        return result
 # --- FIN DE CORRECCIÓN ---
 
 
-def process_ap(ap_config: dict):
+def handle_router_offline(host: str, previous_status: Optional[str], reason: str):
+    """Marca un Router como offline y alerta si es una transición."""
+    logging.warning(f"Estado de Router {host}: OFFLINE")
+    update_router_status(host, 'offline')
+    telemetry_cache.mark_down("router", host)
+    
+    if previous_status != 'offline':
+        router_info = get_router_by_host(host)
+        hostname = router_info.get('hostname') if (router_info and router_info.get('hostname')) else host
+        
+        message = f"❌ *ALERTA: ROUTER CAÍDO*\n\n{reason} *{hostname}* (`{host}`)."
+        send_telegram_alert(message)
+
+
+def process_ap(ap_config: dict) -> str:
     """
     Realiza el proceso completo de verificación para un solo AP.
+    Devuelve el resultado del sondeo para las métricas ('success', 'skipped', 'auth_failure'...).
     """
     host = ap_config["host"]
+    # Con el circuito abierto solo se hace un sondeo TCP barato al vencer el retroceso
+    if not circuit_breaker.allow_poll(host, probe=lambda: tcp_probe(host, AP_PROBE_PORT)):
+        logging.info(f"AP {host} omitido: sigue sin responder (circuito abierto).")
+        return "skipped"
     logging.info(f"--- Verificando AP en {host} ---")
     
     client = UbiquitiClient(
@@ -111,51 +135,159 @@ def process_ap(ap_config: dict):
         password=ap_config["password"]
     )
     
-    status_data = client.get_status_data()
+    # Turno del dispositivo y de su zona, compartido con la API
+    with device_limiter.acquire(host, ap_config.get("zona_id")):
+        raw_status = client.get_status_raw()
+    polled_at = datetime.utcnow()
     previous_status = get_ap_status(host)
+
+    snapshot = None
+    if raw_status:
+        try:
+            # Solo se conservan los campos necesarios; el dict completo se libera aquí
+            snapshot = parse_status(raw_status)
+        except ValueError as e:
+            logging.warning(f"Respuesta de status.cgi inválida de {host}: {e}")
+            client.last_error = "json_error"
     
-    if status_data:
+    if snapshot:
         current_status = 'online'
-        hostname = status_data.get("host", {}).get("hostname", host)
+        hostname = snapshot.ap.hostname or host
         logging.info(f"Estado de '{hostname}' ({host}): ONLINE")
+        circuit_breaker.record_success(host)
+        # La respuesta cruda se captura antes de guardarla, para poder reingestarla
+        snapshot_capture.append(host, raw_status, polled_at)
         
-        save_full_snapshot(host, status_data)
-        update_ap_status(host, current_status, data=status_data)
+        with SNAPSHOT_SAVE_DURATION.time():
+            save_full_snapshot(host, snapshot, polled_at)
+        update_ap_status(host, current_status, data=snapshot)
+        telemetry_cache.update_ap(host, snapshot)
         
         if previous_status == 'offline':
             message = f"✅ *AP RECUPERADO*\n\nEl AP *{hostname}* (`{host}`) ha vuelto a estar en línea."
             send_telegram_alert(message)
+        return "success"
     else:
-        current_status = 'offline'
-        logging.warning(f"Estado de {host}: OFFLINE")
-        
-        update_ap_status(host, current_status)
+        circuit_breaker.record_failure(host)
+        handle_ap_offline(host, previous_status, "No se pudo establecer conexión con el AP")
+        return client.last_error or "error"
+
+def handle_ap_offline(host: str, previous_status: Optional[str], reason: str):
+    """Marca un AP como offline y alerta si es una transición."""
+    logging.warning(f"Estado de {host}: OFFLINE")
+    update_ap_status(host, 'offline')
+    telemetry_cache.mark_down("ap", host)
+    
+    if previous_status != 'offline':
+        hostname = get_ap_hostname(host) or host
         
-        if previous_status != 'offline':
-            ap_info = get_ap_by_host_with_stats(host)
-            hostname = ap_info.get('hostname') if (ap_info and ap_info.get('hostname')) else host
-            
-            message = f"❌ *ALERTA: AP CAÍDO*\n\nNo se pudo establecer conexión con el AP *{hostname}* (`{host}`)."
-            send_telegram_alert(message)
+        message = f"❌ *ALERTA: AP CAÍDO*\n\n{reason} *{hostname}* (`{host}`)."
+        send_telegram_alert(message)
+
+def on_liveness_transition(host: str, kind: str, reachable: bool):
+    """
+    Recibe los cambios de alcance ICMP del liveness.
+    Caída: se marca offline y se alerta sin esperar al ciclo completo.
+    Recuperación: se sondea el dispositivo en el acto (que lo marca online y avisa).
+    """
+    if kind == 'ap':
+        if not reachable:
+            handle_ap_offline(host, get_ap_status(host), "Se perdió la respuesta a ping del AP")
+            return
+        credentials = get_ap_credentials(host)
+        if credentials:
+            circuit_breaker.forget(host)
+            run_poll("ap", process_ap, {"host": host, **credentials})
+    elif kind == 'router':
+        if not reachable:
+            handle_router_offline(host, get_router_status(host), "Se perdió la respuesta a ping del Router")
+            return
+        router_config = get_router_by_host(host)
+        if router_config:
+            circuit_breaker.forget(host)
+            run_poll("router", process_router, router_config)
+
+def run_poll(kind: str, poll, config: dict):
+    """Ejecuta un sondeo registrando su duración, resultado y los sondeos en curso."""
+    host = config["host"]
+    POLLS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    result = "error"
+    try:
+        result = poll(config)
+    finally:
+        POLLS_IN_FLIGHT.dec()
+        POLL_RESULTS.inc(kind=kind, result=result)
+        if result != "skipped":
+            elapsed = time.perf_counter() - started
+            POLL_DURATION.observe(elapsed, kind=kind)
+            DEVICE_LAST_POLL_SECONDS.set(elapsed, kind=kind, host=host)
 
 def main_loop():
     """Bucle principal que obtiene la lista de APs y Routers y los procesa."""
     logging.info("Iniciando nuevo ciclo de monitoreo...")
+    snapshot_capture.configure(get_setting('snapshot_capture_enabled') == '1')
+    traffic_accounting.configure(get_setting('traffic_accounting_enabled') == '1')
     
     aps_to_check = get_enabled_aps_for_monitor()
     routers_to_check = get_enabled_routers_from_db()
+    # Suscripciones 'listen' del índice de sesiones PPP (una por router, persistentes entre ciclos)
+    ppp_session_index.sync(routers_to_check, enabled=get_setting('ppp_session_index_enabled') == '1')
     
     if not aps_to_check and not routers_to_check:
         logging.warning("No se encontraron dispositivos (APs o Routers) activos para monitorear.")
         return
 
-    logging.info(f"Se encontraron {len(aps_to_check)} APs y {len(routers_to_check)} Routers activos. Procesando en paralelo...")
+    all_aps, all_routers = aps_to_check, routers_to_check
+    # Los dispositivos que el liveness ICMP ve caídos no se sondean completos
+    aps_to_check = [ap for ap in aps_to_check if liveness_sweeper.is_reachable(ap["host"]) is not False]
+    routers_to_check = [r for r in routers_to_check if liveness_sweeper.is_reachable(r["host"]) is not False]
+
+    logging.info(f"Se encontraron {len(aps_to_check)} APs y {len(routers_to_check)} Routers alcanzables. Procesando en paralelo...")
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        if aps_to_check:
-            executor.map(process_ap, aps_to_check)
-        if routers_to_check:
-            executor.map(process_router, routers_to_check)
+    def queued(kind, poll, config):
+        # Al arrancar, el sondeo sale de la cola del ciclo
+        def task():
+            POLL_QUEUE_DEPTH.dec()
+            run_poll(kind, poll, config)
+        return task
+
+    # Reparto justo por zona: ninguna zona ocupa más hilos que su límite
+    tasks = [(ap.get("zona_id"), queued("ap", process_ap, ap)) for ap in aps_to_check]
+    tasks += [(router.get("zona_id"), queued("router", process_router, router)) for router in routers_to_check]
+    POLL_QUEUE_DEPTH.set(len(tasks))
+    cycle_started = time.perf_counter()
+    run_fair_by_zone(tasks, max_workers=MAX_WORKERS, zone_limit=device_limiter.zone_limit())
+    CYCLE_DURATION.set(round(time.perf_counter() - cycle_started, 3))
+    CYCLE_LAST_TIMESTAMP.set(int(time.time()))
+    snapshot_capture.flush()
+    # Copia diaria de la configuración de los routers (en su propio hilo)
+    backup_scheduler.maybe_start(routers_to_check)
+
+    # Telemetría de dispositivos para /api/metrics/devices
+    telemetry_cache.retain([ap["host"] for ap in all_aps], [r["host"] for r in all_routers])
+    # Historial de RTT/pérdida del liveness ICMP (anillo por dispositivo)
+    telemetry_cache.update_liveness(liveness_sweeper.get_summaries())
+    try:
+        telemetry_cache.write(TELEMETRY_FILE)
+    except OSError as e:
+        logging.warning(f"No se pudo escribir la telemetría en {TELEMETRY_FILE}: {e}")
+
+def run_profiled_cycle():
+    """Ejecuta un ciclo bajo el perfilador de muestreo y guarda las pilas para la API."""
+    logging.info("Perfilando este ciclo de monitoreo (solicitado desde la API)...")
+    update_settings({"profile_monitor_cycle": "0"})
+    sampler = StackSampler()
+    sampler.start()
+    try:
+        main_loop()
+    finally:
+        sampler.stop()
+        tmp_path = f"{MONITOR_PROFILE_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(sampler.folded())
+        os.replace(tmp_path, MONITOR_PROFILE_FILE)
+        logging.info(f"Perfil del ciclo guardado en {MONITOR_PROFILE_FILE} ({sampler.samples} muestras).")
 
 def run_monitor():
     """Función que envuelve el bucle infinito para el monitoreo continuo."""
@@ -166,9 +298,16 @@ def run_monitor():
     )
     
     logging.info("Iniciando sistema de monitoreo (APs y Routers)...")
+    liveness_sweeper.start(on_transition=on_liveness_transition)
+    # La API lee este archivo para exponer las métricas del monitor en /metrics
+    start_snapshot_writer(MONITOR_METRICS_FILE)
+    start_stats_writer(MONITOR_DB_STATS_FILE)
     while True:
         try:
-            main_loop()
+            if get_setting('profile_monitor_cycle') == '1':
+                run_profiled_cycle()
+            else:
+                main_loop()
 
             interval_str = get_setting('default_monitor_interval')
             try:
@@ -181,6 +320,7 @@ def run_monitor():
             
         except KeyboardInterrupt:
             logging.info("Señal de interrupción recibida en el proceso de monitoreo.")
+            ppp_session_index.stop()
             break
         except Exception as e:
             logging.exception(f"Ocurrió un error inesperado en el bugle principal: {e}")
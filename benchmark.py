@@ -0,0 +1,229 @@
+# benchmark.py
+# Benchmarks de las rutas calientes de ingesta y consulta sobre datos sintéticos.
+#
+#   python benchmark.py --scale small --output results.json
+#   python benchmark.py --scale fleet --baseline baseline.json --threshold 0.20
+#
+# Trabaja en un directorio temporal (inventory.sqlite y stats_YYYY_MM.sqlite
+# propios), nunca sobre los datos reales. Con --baseline compara contra un
+# resultado anterior y termina con código 1 si alguna medida empeora más que
+# el umbral.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_DIR)
+
+from generate_fleet import generate_fleet  # noqa: E402
+
+# --- Escalas predefinidas ---
+# Los datos los crea generate_fleet.py. El histórico de CPEs se limita a las
+# últimas horas: un mes a 60 s para 50k CPEs serían ~2.000 millones de filas.
+# Para el histórico completo, generarlo aparte y pasarlo con --data-dir.
+PRESETS = {
+    "small": {"aps": 50, "cpes_per_ap": 20, "days": 1, "interval": 300, "cpe_history_hours": 6},
+    "medium": {"aps": 500, "cpes_per_ap": 25, "days": 7, "interval": 300, "cpe_history_hours": 6},
+    "fleet": {"aps": 2000, "cpes_per_ap": 25, "days": 30, "interval": 60, "cpe_history_hours": 24},
+}
+DEFAULT_REPEAT = 20
+DEFAULT_THRESHOLD = 0.20
+# Medidas de rendimiento (mayor es mejor); el resto son latencias (menor es mejor)
+THROUGHPUT_KEYS = ("snapshots_per_second", "cpe_rows_per_second")
+
+
+# --- Medición ---
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Ejecuta fn `repeat` veces (tras una de calentamiento) y devuelve percentiles en ms."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * (len(samples) - 1) + 0.5))], 3),
+        "max_ms": round(samples[-1], 3),
+        "runs": repeat,
+    }
+
+
+def bench_ingest(hosts: List[str], snapshots: int, cpes_per_ap: int) -> Dict[str, float]:
+    """Throughput de save_full_snapshot con payloads de status.cgi del simulador."""
+    from app.core.device_simulator import SimulatedAP, DeviceProfile
+    from app.db import stats_db
+
+    profile = DeviceProfile(stations=cpes_per_ap)
+    payloads = [(host, SimulatedAP(host, 443, profile, index=i).status())
+                for i, host in enumerate(hosts[:min(len(hosts), 50)])]
+    started = time.perf_counter()
+    # save_full_snapshot imprime una línea por AP; no interesa en el benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(snapshots):
+            host, payload = payloads[n % len(payloads)]
+            stats_db.save_full_snapshot(host, payload)
+    elapsed = time.perf_counter() - started
+    return {
+        "snapshots": snapshots,
+        "seconds": round(elapsed, 3),
+        "snapshots_per_second": round(snapshots / elapsed, 2),
+        "cpe_rows_per_second": round(snapshots * cpes_per_ap / elapsed, 2),
+    }
+
+
+def run_benchmarks(hosts: List[str], cpes_per_ap: int, repeat: int, snapshots: int) -> Dict[str, Dict[str, float]]:
+    from fastapi.testclient import TestClient
+    from app.auth import get_password_hash, create_access_token
+    from app.db import aps_db, cpes_db, stats_db, users_db
+    from app.main import app
+
+    try:
+        users_db.create_user("benchmark", get_password_hash("benchmark"))
+    except ValueError:
+        pass
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'benchmark'})}"}
+    host = hosts[len(hosts) // 2]
+
+    def api_get(path: str) -> Callable[[], Any]:
+        def _call():
+            response = client.get(path, headers=headers)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} devolvió {response.status_code}: {response.text[:200]}")
+        return _call
+
+    results: Dict[str, Dict[str, float]] = {}
+    db_calls = {
+        "db.get_all_aps_with_stats": aps_db.get_all_aps_with_stats,
+        "db.get_all_cpes_globally": cpes_db.get_all_cpes_globally,
+        "db.get_cpes_for_ap_from_stats": lambda: stats_db.get_cpes_for_ap_from_stats(host),
+    }
+    api_calls = {
+        "api.top_aps_by_airtime": api_get("/api/stats/top-aps-by-airtime?limit=10"),
+        "api.top_cpes_by_signal": api_get("/api/stats/top-cpes-by-signal?limit=10"),
+        "api.ap_history_24h": api_get(f"/api/aps/{host}/history?period=24h"),
+        "api.ap_history_7d": api_get(f"/api/aps/{host}/history?period=7d"),
+        "api.ap_history_30d": api_get(f"/api/aps/{host}/history?period=30d"),
+        "api.aps": api_get("/api/aps"),
+        "api.ap_detail": api_get(f"/api/aps/{host}"),
+        "api.ap_cpes": api_get(f"/api/aps/{host}/cpes"),
+        "api.cpes_all": api_get("/api/cpes/all"),
+        "api.clients": api_get("/api/clients"),
+    }
+    for name, fn in {**db_calls, **api_calls}.items():
+        print(f"  {name}...", flush=True)
+        results[name] = measure(fn, repeat)
+    print("  ingest.save_full_snapshot...", flush=True)
+    results["ingest.save_full_snapshot"] = bench_ingest(hosts, snapshots, cpes_per_ap)
+    return results
+
+
+# --- Comparación con la línea base ---
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Devuelve las regresiones: p50 más lento o throughput menor que la base en más de `threshold`."""
+    regressions = []
+    print(f"\n{'medida':45} {'base':>12} {'actual':>12} {'cambio':>9}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for key in ("p50_ms",) + THROUGHPUT_KEYS:
+            if key not in current or key not in previous or not previous[key]:
+                continue
+            change = (current[key] - previous[key]) / previous[key]
+            worse = -change if key in THROUGHPUT_KEYS else change
+            flag = "  REGRESIÓN" if worse > threshold else ""
+            print(f"{name + '.' + key:45} {previous[key]:>12.3f} {current[key]:>12.3f} {change:>+8.1%}{flag}")
+            if worse > threshold:
+                regressions.append(f"{name}.{key}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de ingesta y consulta de µMonitor Pro.")
+    parser.add_argument("--scale", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--aps", type=int, help="Sobrescribe el número de APs de la escala.")
+    parser.add_argument("--cpes-per-ap", type=int)
+    parser.add_argument("--days", type=int)
+    parser.add_argument("--interval", type=int, help="Segundos entre muestras del histórico.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Repeticiones por medida de latencia.")
+    parser.add_argument("--snapshots", type=int, default=200, help="Snapshots a guardar en la prueba de ingesta.")
+    parser.add_argument("--data-dir", help="Directorio de datos a reutilizar (se siembra si está vacío).")
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados.")
+    parser.add_argument("--baseline", help="Resultados anteriores (JSON) contra los que comparar.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Empeoramiento relativo tolerado antes de marcar regresión (0.20 = 20%%).")
+    args = parser.parse_args()
+
+    config = dict(PRESETS[args.scale])
+    for key in ("aps", "cpes_per_ap", "days", "interval"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    output = os.path.abspath(args.output) if args.output else None
+
+    data_dir = os.path.abspath(args.data_dir) if args.data_dir else tempfile.mkdtemp(prefix="umonitor-bench-")
+    os.makedirs(data_dir, exist_ok=True)
+    # Las rutas de las DBs son relativas: todo el benchmark corre dentro de data_dir
+    os.chdir(data_dir)
+
+    started = time.perf_counter()
+    if os.path.exists("inventory.sqlite"):
+        print(f"Reutilizando datos de {data_dir}")
+    else:
+        print(f"Generando {config['aps']} APs x {config['cpes_per_ap']} CPEs, {config['days']} días "
+              f"cada {config['interval']} s en {data_dir}...", flush=True)
+        generate_fleet(aps=config["aps"], cpes_per_ap=config["cpes_per_ap"], days=config["days"],
+                       interval=config["interval"], cpe_hours=config["cpe_history_hours"])
+    seed_seconds = time.perf_counter() - started
+    conn = sqlite3.connect("inventory.sqlite")
+    hosts = [row[0] for row in conn.execute("SELECT host FROM aps ORDER BY host")]
+    conn.close()
+
+    print("Midiendo...", flush=True)
+    results = run_benchmarks(hosts, config["cpes_per_ap"], args.repeat, args.snapshots)
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "scale": args.scale, "config": config, "seed_seconds": round(seed_seconds, 1),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(), "data_dir": data_dir,
+        },
+        "results": results,
+    }
+
+    for name, values in results.items():
+        print(f"{name:45} " + ", ".join(f"{k}={v}" for k, v in values.items()))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nSin regresiones respecto a la línea base.")
+
+
+if __name__ == "__main__":
+    main()
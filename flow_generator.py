@@ -0,0 +1,206 @@
+# flow_generator.py
+# Generador de tráfico NetFlow v9 / IPFIX para probar el colector de flujos.
+#
+#   python flow_generator.py --rate 50000 --duration 30 --subscribers 5000
+#   python flow_generator.py --ipfix --from-inventory --port 2055
+#   python flow_generator.py --bench --flows 2000000
+#
+# Envía por UDP datagramas como los de Traffic-Flow de RouterOS: la plantilla
+# cada --template-every datagramas y registros de flujos entre IPs de abonados
+# (--subnet o, con --from-inventory, las de las sesiones PPP y CPEs) e IPs de
+# Internet, en ambos sentidos. Con --bench no envía nada: decodifica y agrega
+# los mismos datagramas en este proceso e informa de los flujos por segundo
+# que alcanza un núcleo.
+import argparse
+import ipaddress
+import logging
+import random
+import socket
+import struct
+import sys
+import time
+from typing import List, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from app.core.flow_collector import (
+    FlowAggregator, DEFAULT_PORT, NETFLOW_V9, IPFIX, FIELD_BYTES, FIELD_PACKETS, FIELD_PROTOCOL,
+    FIELD_IPV4_SRC, FIELD_IPV4_DST
+)
+
+ENV_FILE = ".env"
+
+# --- Constantes ---
+TEMPLATE_ID = 256
+# Campos de la plantilla, como los envía RouterOS (los que el colector no usa se saltan)
+TEMPLATE_FIELDS = (
+    (22, 4),                # FIRST_SWITCHED
+    (21, 4),                # LAST_SWITCHED
+    (FIELD_PACKETS, 4),
+    (FIELD_BYTES, 4),
+    (10, 4),                # INPUT_SNMP
+    (14, 4),                # OUTPUT_SNMP
+    (15, 4),                # IPV4_NEXT_HOP
+    (FIELD_IPV4_SRC, 4),
+    (FIELD_IPV4_DST, 4),
+    (FIELD_PROTOCOL, 1),
+    (5, 1),                 # SRC_TOS
+    (7, 2),                 # L4_SRC_PORT
+    (11, 2),                # L4_DST_PORT
+    (6, 1),                 # TCP_FLAGS
+)
+RECORD = struct.Struct("!IIIIIIIIIBBHHB")
+V9_HEADER = struct.Struct("!HHIIII")
+IPFIX_HEADER = struct.Struct("!HHIII")
+SET_HEADER = struct.Struct("!HH")
+MAX_DATAGRAM_BYTES = 1400
+PACKET_POOL_SIZE = 256          # Datagramas distintos que se generan y se reenvían en bucle
+PROTOCOLS = (6, 6, 6, 17, 17, 1)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - [FlowGenerator] - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def subscriber_addresses(args) -> List[int]:
+    if args.from_inventory:
+        load_dotenv(ENV_FILE, encoding="utf-8")
+        from app.db.flows_db import get_subscriber_addresses
+        addresses = []
+        for address, _ in get_subscriber_addresses():
+            try:
+                ip = ipaddress.ip_address(address)
+            except ValueError:
+                continue
+            if ip.version == 4:
+                addresses.append(int(ip))
+        if not addresses:
+            sys.exit("El inventario no tiene IPs de abonados (sesiones PPP o CPEs).")
+        return addresses[:args.subscribers] if args.subscribers else addresses
+    network = ipaddress.ip_network(args.subnet)
+    hosts = min(args.subscribers, network.num_addresses - 2)
+    return [int(network.network_address) + 1 + i for i in range(hosts)]
+
+
+def template_set(ipfix: bool) -> bytes:
+    fields = b"".join(struct.pack("!HH", field_type, length) for field_type, length in TEMPLATE_FIELDS)
+    body = struct.pack("!HH", TEMPLATE_ID, len(TEMPLATE_FIELDS)) + fields
+    return SET_HEADER.pack(2 if ipfix else 0, SET_HEADER.size + len(body)) + body
+
+
+def data_set(rng: random.Random, subscribers: Sequence[int], count: int) -> bytes:
+    records = []
+    for _ in range(count):
+        subscriber = rng.choice(subscribers)
+        remote = rng.randint(0x01000000, 0xDF000000)
+        download = rng.random() < 0.7
+        packets = rng.randint(1, 2000)
+        records.append(RECORD.pack(
+            0, 0, packets, packets * rng.randint(60, 1500), 1, 2, 0,
+            remote if download else subscriber, subscriber if download else remote,
+            rng.choice(PROTOCOLS), 0, rng.randint(1024, 65535), rng.choice((443, 80, 53, 8080)), 0x18,
+        ))
+    body = b"".join(records)
+    return SET_HEADER.pack(TEMPLATE_ID, SET_HEADER.size + len(body)) + body
+
+
+def build_datagram(ipfix: bool, sets: bytes, flow_count: int, sequence: int, source_id: int) -> bytes:
+    now = int(time.time())
+    if ipfix:
+        return IPFIX_HEADER.pack(IPFIX, IPFIX_HEADER.size + len(sets), now, sequence, source_id) + sets
+    return V9_HEADER.pack(NETFLOW_V9, flow_count, int(time.monotonic() * 1000) & 0xFFFFFFFF, now,
+                          sequence, source_id) + sets
+
+
+def build_pool(args, subscribers: Sequence[int]) -> List[Tuple[bytes, int]]:
+    """Datagramas de datos ya empaquetados (con sus flujos): el envío solo reescribe la cabecera."""
+    rng = random.Random(args.seed)
+    header_size = IPFIX_HEADER.size if args.ipfix else V9_HEADER.size
+    per_datagram = min(args.flows_per_datagram,
+                       (MAX_DATAGRAM_BYTES - header_size - SET_HEADER.size) // RECORD.size)
+    return [(data_set(rng, subscribers, per_datagram), per_datagram) for _ in range(PACKET_POOL_SIZE)]
+
+
+def send(args, pool: List[Tuple[bytes, int]]):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = (args.host, args.port)
+    template = template_set(args.ipfix)
+    flows_per_datagram = pool[0][1]
+    datagrams_per_second = max(1.0, args.rate / flows_per_datagram)
+    started = time.perf_counter()
+    sent_flows = sequence = 0
+    logging.info(f"Enviando {args.rate} flujos/s ({'IPFIX' if args.ipfix else 'NetFlow v9'}) a "
+                 f"{args.host}:{args.port} durante {args.duration} s...")
+    while True:
+        elapsed = time.perf_counter() - started
+        if elapsed >= args.duration:
+            break
+        # Se envía lo que toca hasta ahora según el ritmo pedido
+        due = int(elapsed * datagrams_per_second) + 1 - sequence
+        if due <= 0:
+            time.sleep(min(0.001, 1 / datagrams_per_second))
+            continue
+        for _ in range(due):
+            sets, count = pool[sequence % len(pool)]
+            if sequence % args.template_every == 0:
+                sets = template + sets
+            sock.sendto(build_datagram(args.ipfix, sets, count, sequence, args.source_id), target)
+            sequence += 1
+            sent_flows += count
+    elapsed = time.perf_counter() - started
+    logging.info(f"Enviados {sequence} datagramas y {sent_flows} flujos en {elapsed:.1f} s "
+                 f"({sent_flows / elapsed:.0f} flujos/s).")
+
+
+def bench(args, pool: List[Tuple[bytes, int]], subscribers: Sequence[int]):
+    aggregator = FlowAggregator()
+    aggregator.set_addresses((str(ipaddress.IPv4Address(address)), f"sim-{address}") for address in subscribers)
+    template = template_set(args.ipfix)
+    datagrams = [build_datagram(args.ipfix, template + pool[0][0], pool[0][1], 0, args.source_id)]
+    datagrams += [build_datagram(args.ipfix, sets, count, i + 1, args.source_id) for i, (sets, count) in enumerate(pool)]
+    target_datagrams = max(1, args.flows // pool[0][1])
+    started = time.perf_counter()
+    for i in range(target_datagrams):
+        aggregator.feed(datagrams[i % len(datagrams)], "127.0.0.1")
+    elapsed = time.perf_counter() - started
+    stats = aggregator.stats
+    logging.info(f"Decodificados {stats['flows']} flujos en {elapsed:.2f} s: {stats['flows'] / elapsed:.0f} flujos/s "
+                 f"en un núcleo ({stats['attributed']} atribuidos, {len(aggregator.aggregates)} agregados).")
+    started = time.perf_counter()
+    rows = aggregator.drain()
+    logging.info(f"Conversión de {len(rows)} agregados a filas: {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de flujos NetFlow v9 / IPFIX para µMonitor Pro.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección del colector.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ipfix", action="store_true", help="Enviar IPFIX en lugar de NetFlow v9.")
+    parser.add_argument("--rate", type=int, default=20000, help="Flujos por segundo.")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos de envío.")
+    parser.add_argument("--subscribers", type=int, default=1000, help="Número de IPs de abonados.")
+    parser.add_argument("--subnet", default="100.64.0.0/16", help="Red de las IPs de abonados.")
+    parser.add_argument("--from-inventory", action="store_true",
+                        help="Usar las IPs de las sesiones PPP y CPEs del inventario (.env del proyecto).")
+    parser.add_argument("--flows-per-datagram", type=int, default=30)
+    parser.add_argument("--template-every", type=int, default=20, help="Reenviar la plantilla cada N datagramas.")
+    parser.add_argument("--source-id", type=int, default=0, help="source_id (v9) o dominio de observación (IPFIX).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bench", action="store_true", help="Medir el decodificador en este proceso, sin red.")
+    parser.add_argument("--flows", type=int, default=1_000_000, help="Flujos a decodificar con --bench.")
+    args = parser.parse_args()
+    if args.template_every < 1:
+        parser.error("--template-every debe ser al menos 1.")
+
+    subscribers = subscriber_addresses(args)
+    pool = build_pool(args, subscribers)
+    if args.bench:
+        bench(args, pool, subscribers)
+    else:
+        send(args, pool)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+# generate_fleet.py
+# Generador de datos sintéticos a escala de producción: zonas, APs, routers,
+# clientes y CPEs en inventory.sqlite, más series temporales correlacionadas
+# en los stats_YYYY_MM.sqlite de cada mes cubierto.
+#
+#   python generate_fleet.py --aps 2000 --cpes-per-ap 25 --days 30 --interval 60 --output-dir ./dataset
+#
+# Las series siguen una curva diaria de airtime/tráfico (pico por la noche),
+# la señal de cada CPE deriva como un paseo aleatorio con reversión a su
+# media, y cada AP sufre ráfagas de desconexión que sacan a parte de sus CPEs
+# de las muestras y dejan eventos en disconnection_events.
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- Constantes ---
+DEFAULT_BATCH_SIZE = 50000
+PEAK_HOUR = 21                    # Hora (UTC) de máximo uso en la curva diaria
+BURSTS_PER_AP_PER_DAY = 0.5       # Ráfagas de desconexión esperadas por AP y día
+BURST_MAX_STEPS = 6               # Duración máxima de una ráfaga, en muestras
+FAST_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -200000",
+    "PRAGMA locking_mode = EXCLUSIVE",
+)
+# Índices de cpe_stats_history: se crean al final, es más rápido que mantenerlos fila a fila
+STATS_BULK_INDEXES = ("idx_cpe_stats_mac", "idx_cpe_stats_ip")
+
+AP_COLUMNS = (
+    "timestamp, ap_host, uptime, cpuload, freeram, client_count, noise_floor, total_throughput_tx,"
+    " total_throughput_rx, airtime_total_usage, airtime_tx_usage, airtime_rx_usage, frequency, chanbw,"
+    " essid, total_tx_bytes, total_rx_bytes, gps_lat, gps_lon, gps_sats"
+)
+CPE_COLUMNS = (
+    "timestamp, ap_host, cpe_mac, cpe_hostname, ip_address, signal, signal_chain0, signal_chain1,"
+    " noisefloor, cpe_tx_power, distance, dl_capacity, ul_capacity, airmax_cinr_rx, airmax_usage_rx,"
+    " airmax_cinr_tx, airmax_usage_tx, throughput_rx_kbps, throughput_tx_kbps, total_rx_bytes,"
+    " total_tx_bytes, cpe_uptime, eth_plugged, eth_speed, eth_cable_len"
+)
+EVENT_COLUMNS = "timestamp, ap_host, cpe_mac, cpe_hostname, reason_code, connection_duration"
+
+
+def _insert_sql(table: str, columns: str) -> str:
+    placeholders = ", ".join("?" * len(columns.split(",")))
+    return f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+
+
+def _connect_fast(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    for pragma in FAST_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def diurnal_factor(hour: float) -> float:
+    """Uso relativo (0.1-1.0) según la hora: valle de madrugada, pico a las PEAK_HOUR."""
+    return 0.1 + 0.9 * (0.5 + 0.5 * math.cos(2 * math.pi * (hour - PEAK_HOUR) / 24)) ** 1.5
+
+
+class _BatchWriter:
+    """Acumula filas por tabla y las vuelca con executemany en una transacción por lote."""
+    def __init__(self, conn: sqlite3.Connection, batch_size: int):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending: Dict[str, List[tuple]] = {}
+        self.rows = 0
+
+    def add(self, sql: str, rows: List[tuple]):
+        batch = self.pending.setdefault(sql, [])
+        batch.extend(rows)
+        if len(batch) >= self.batch_size:
+            self._flush(sql)
+
+    def _flush(self, sql: str):
+        batch = self.pending.get(sql)
+        if not batch:
+            return
+        self.conn.execute("BEGIN")
+        self.conn.executemany(sql, batch)
+        self.conn.execute("COMMIT")
+        self.rows += len(batch)
+        batch.clear()
+
+    def close(self):
+        for sql in list(self.pending):
+            self._flush(sql)
+
+
+def _generate_inventory(rng: random.Random, zones: int, aps: int, cpes_per_ap: int, routers: int,
+                        now: datetime) -> Tuple[List[Dict[str, Any]], int]:
+    """Crea el inventario y devuelve los APs con sus CPEs (estado inicial de las series)."""
+    from app.db.init_db import setup_databases
+    from app.core.security import encrypt_data
+
+    setup_databases()
+    password = encrypt_data("ubnt")
+    now_ts = now.isoformat(" ")
+    conn = _connect_fast("inventory.sqlite")
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO zonas (nombre, direccion, coordenadas_gps) VALUES (?, ?, ?)",
+        [(f"Zona {z:03d}", f"Sector {z}", f"{-34.6 + rng.uniform(-0.5, 0.5):.5f},{-58.4 + rng.uniform(-0.5, 0.5):.5f}")
+         for z in range(1, zones + 1)])
+    zona_ids = [row[0] for row in conn.execute("SELECT id FROM zonas ORDER BY id DESC LIMIT ?", (zones,))]
+
+    fleet = []
+    for i in range(aps):
+        host = f"10.{(i >> 8) & 0xFF}.{i & 0xFF}.1"
+        ap = {
+            "host": host, "hostname": f"AP-{i:05d}", "zona_id": zona_ids[i % len(zona_ids)],
+            "mac": "FC:EC:DA:%02X:%02X:%02X" % ((i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF),
+            "load": rng.uniform(0.4, 1.0), "frequency": rng.choice((5180, 5500, 5745, 5800, 5825)),
+            "chanbw": rng.choice((20, 40, 80)), "noise": rng.randint(-100, -88),
+            "lat": -34.6 + rng.uniform(-0.5, 0.5), "lon": -58.4 + rng.uniform(-0.5, 0.5),
+            "boot": rng.randint(0, 90 * 86400), "tx_bytes": rng.randint(10 ** 9, 10 ** 12),
+            "rx_bytes": rng.randint(10 ** 9, 10 ** 12), "burst": 0, "cpes": [],
+        }
+        for j in range(cpes_per_ap):
+            base_signal = rng.uniform(-82, -50)
+            ap["cpes"].append({
+                "mac": "24:5A:4C:%02X:%02X:%02X" % (i >> 8 & 0xFF, i & 0xFF, j & 0xFF),
+                "hostname": f"CPE-{i:05d}-{j:03d}", "ip": f"172.{16 + ((i >> 8) % 16)}.{i & 0xFF}.{j + 2}",
+                "base": base_signal, "signal": base_signal, "distance": rng.randint(150, 9000),
+                "tx_power": rng.randint(8, 25), "plan": rng.choice((10000, 20000, 30000, 50000)),
+                "rx_bytes": rng.randint(10 ** 8, 10 ** 11), "tx_bytes": rng.randint(10 ** 7, 10 ** 10),
+                "uptime": rng.randint(0, 30 * 86400), "cable": rng.randint(2, 60), "online": True,
+            })
+        fleet.append(ap)
+
+    conn.executemany(
+        "INSERT INTO aps (host, username, password, zona_id, is_enabled, mac, hostname, model, firmware,"
+        " last_status, first_seen, last_seen, last_checked)"
+        " VALUES (?, 'ubnt', ?, ?, 1, ?, ?, 'Rocket 5AC Prism', 'XC.v8.7.11', 'online', ?, ?, ?)",
+        [(ap["host"], password, ap["zona_id"], ap["mac"], ap["hostname"], now_ts, now_ts, now_ts) for ap in fleet])
+    conn.executemany(
+        "INSERT INTO routers (host, api_port, api_ssl_port, username, password, zona_id, is_enabled, hostname,"
+        " model, firmware, last_status, last_checked)"
+        " VALUES (?, 8729, 8729, 'api-user', ?, ?, 1, ?, 'CCR2004-1G-12S+2XS', '7.15.3', 'online', ?)",
+        [(f"10.255.{r >> 8}.{r & 0xFF}", password, zona_ids[r % len(zona_ids)], f"RTR-{r:04d}", now_ts)
+         for r in range(1, routers + 1)])
+
+    # ~85% de los CPEs pertenecen a un cliente; algunos clientes tienen dos
+    statuses = ("active",) * 18 + ("suspended", "cancelled")
+    all_cpes = [cpe for ap in fleet for cpe in ap["cpes"]]
+    client_count = int(len(all_cpes) * 0.8)
+    conn.executemany(
+        "INSERT INTO clients (name, address, phone_number, service_status, billing_day, created_at)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"Cliente {c:06d}", f"Calle {rng.randint(1, 400)} {rng.randint(100, 9999)}",
+          f"+54911{rng.randint(10000000, 99999999)}", rng.choice(statuses), rng.randint(1, 28), now_ts)
+         for c in range(client_count)])
+    first_client = conn.execute("SELECT MIN(id) FROM (SELECT id FROM clients ORDER BY id DESC LIMIT ?)",
+                                (client_count,)).fetchone()[0] or 1
+    cpe_rows = []
+    for n, cpe in enumerate(all_cpes):
+        client_id = first_client + (n % client_count) if client_count and rng.random() < 0.85 else None
+        cpe_rows.append((cpe["mac"], cpe["hostname"], "LiteBeam 5AC", "WA.V8.7.11", cpe["ip"], client_id,
+                         now_ts, now_ts))
+    conn.executemany(
+        "INSERT INTO cpes (mac, hostname, model, firmware, ip_address, client_id, first_seen, last_seen)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", cpe_rows)
+    conn.execute("COMMIT")
+    conn.close()
+    return fleet, client_count
+
+
+def _open_stats_db(path: str, batch_size: int) -> _BatchWriter:
+    from app.db.init_db import _setup_stats_db
+
+    _setup_stats_db(path)
+    conn = _connect_fast(path)
+    for index in STATS_BULK_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+    return _BatchWriter(conn, batch_size)
+
+
+def _close_stats_db(path: str, writer: _BatchWriter):
+    from app.db.init_db import _setup_stats_db
+
+    writer.close()
+    writer.conn.close()
+    # Vuelve a crear los índices (CREATE INDEX IF NOT EXISTS) una vez cargados los datos
+    _setup_stats_db(path)
+
+
+def generate_fleet(aps: int = 200, cpes_per_ap: int = 20, routers: int = 10, zones: int = 20,
+                   days: float = 7, interval: int = 300, cpe_hours: Optional[float] = None,
+                   cpe_every: int = 1, seed: int = 42, batch_size: int = DEFAULT_BATCH_SIZE,
+                   progress: bool = True) -> Dict[str, Any]:
+    """
+    Genera el conjunto de datos en el directorio actual. `cpe_hours` limita el
+    histórico de CPEs a las últimas horas y `cpe_every` muestrea los CPEs cada
+    N muestras de AP. Devuelve un resumen con filas generadas y tiempos.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    now = datetime.utcnow().replace(microsecond=0)
+    fleet, client_count = _generate_inventory(rng, zones, aps, cpes_per_ap, routers, now)
+
+    steps = int(days * 86400 // interval)
+    start = now - timedelta(seconds=steps * interval)
+    cpe_from = now - timedelta(hours=cpe_hours) if cpe_hours is not None else start
+    burst_probability = BURSTS_PER_AP_PER_DAY * interval / 86400
+    ap_sql = _insert_sql("ap_stats_history", AP_COLUMNS)
+    cpe_sql = _insert_sql("cpe_stats_history", CPE_COLUMNS)
+    event_sql = _insert_sql("disconnection_events", EVENT_COLUMNS)
+    random_ = rng.random
+
+    current_file, writer = None, None
+    totals = {"ap_rows": 0, "cpe_rows": 0, "events": 0}
+    stats_files = []
+    for step in range(steps + 1):
+        moment = start + timedelta(seconds=step * interval)
+        stats_file = f"stats_{moment.strftime('%Y_%m')}.sqlite"
+        if stats_file != current_file:
+            if writer:
+                _close_stats_db(current_file, writer)
+            current_file, writer = stats_file, _open_stats_db(stats_file, batch_size)
+            stats_files.append(stats_file)
+        ts = moment.isoformat(" ")
+        epoch = step * interval
+        usage = diurnal_factor(moment.hour + moment.minute / 60)
+        sample_cpes = moment >= cpe_from and step % cpe_every == 0
+
+        ap_rows, cpe_rows, events = [], [], []
+        for ap in fleet:
+            cpes = ap["cpes"]
+            # Ráfagas de desconexión: parte de los CPEs desaparece unas muestras
+            if ap["burst"] > 0:
+                ap["burst"] -= 1
+                if ap["burst"] == 0:
+                    for cpe in cpes:
+                        if not cpe["online"]:
+                            cpe["online"], cpe["uptime"] = True, 0
+            elif cpes and random_() < burst_probability:
+                ap["burst"] = rng.randint(1, BURST_MAX_STEPS)
+                fraction = rng.uniform(0.2, 0.8)
+                reason = rng.choice((1, 2, 3, 4, 8))
+                for cpe in cpes:
+                    if random_() < fraction:
+                        cpe["online"] = False
+                        events.append((ts, ap["host"], cpe["mac"], cpe["hostname"], reason, cpe["uptime"]))
+
+            load = usage * ap["load"]
+            airtime = min(100, int(5 + 90 * load * (0.9 + 0.2 * random_())))
+            online = 0
+            total_rx = total_tx = 0
+            for cpe in cpes:
+                if not cpe["online"]:
+                    continue
+                online += 1
+                cpe["uptime"] += interval
+                # Paseo aleatorio con reversión a la media de cada CPE
+                cpe["signal"] += 0.1 * (cpe["base"] - cpe["signal"]) + (random_() - 0.5) * 1.6
+                rx_kbps = int(cpe["plan"] * load * random_())
+                tx_kbps = rx_kbps // 6
+                total_rx += rx_kbps
+                total_tx += tx_kbps
+                cpe["rx_bytes"] += rx_kbps * interval * 125
+                cpe["tx_bytes"] += tx_kbps * interval * 125
+                if sample_cpes:
+                    signal = int(cpe["signal"])
+                    margin = signal - ap["noise"]
+                    cpe_rows.append((
+                        ts, ap["host"], cpe["mac"], cpe["hostname"], cpe["ip"], signal, signal - 2, signal - 3,
+                        ap["noise"], cpe["tx_power"], cpe["distance"], max(0, margin * 7000), max(0, margin * 3500),
+                        max(0, margin - 5), min(100, airtime // 2), max(0, margin - 7), min(100, airtime // 3),
+                        rx_kbps, tx_kbps, cpe["rx_bytes"], cpe["tx_bytes"], cpe["uptime"], 1, 100, cpe["cable"],
+                    ))
+            ap["rx_bytes"] += total_rx * interval * 125
+            ap["tx_bytes"] += total_tx * interval * 125
+            ap_rows.append((
+                ts, ap["host"], ap["boot"] + epoch, int(10 + 50 * load), 60000 + int(20000 * random_()), online,
+                ap["noise"], total_tx, total_rx, airtime, airtime * 2 // 5, airtime * 3 // 5,
+                ap["frequency"], ap["chanbw"], f"ISP-{ap['hostname']}", ap["tx_bytes"], ap["rx_bytes"],
+                ap["lat"], ap["lon"], 9,
+            ))
+
+        writer.add(ap_sql, ap_rows)
+        if cpe_rows:
+            writer.add(cpe_sql, cpe_rows)
+        if events:
+            writer.add(event_sql, events)
+        totals["ap_rows"] += len(ap_rows)
+        totals["cpe_rows"] += len(cpe_rows)
+        totals["events"] += len(events)
+        if progress and step and step % max(1, steps // 20) == 0:
+            rows = totals["ap_rows"] + totals["cpe_rows"]
+            elapsed = time.perf_counter() - started
+            print(f"  {step * 100 // steps:3d}%  {rows:,} filas  ({rows / elapsed * 60:,.0f} filas/min)", flush=True)
+
+    if writer:
+        _close_stats_db(current_file, writer)
+
+    elapsed = time.perf_counter() - started
+    rows = totals["ap_rows"] + totals["cpe_rows"] + totals["events"]
+    return {
+        "aps": aps, "cpes": aps * cpes_per_ap, "routers": routers, "zones": zones, "clients": client_count,
+        "stats_files": stats_files, **totals, "seconds": round(elapsed, 1),
+        "rows_per_minute": int(rows / elapsed * 60) if elapsed else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de flota para µMonitor Pro.")
+    parser.add_argument("--aps", type=int, default=200)
+    parser.add_argument("--cpes-per-ap", type=int, default=20)
+    parser.add_argument("--routers", type=int, default=10)
+    parser.add_argument("--zones", type=int, default=20)
+    parser.add_argument("--days", type=float, default=7, help="Días de histórico hasta ahora.")
+    parser.add_argument("--interval", type=int, default=300, help="Segundos entre muestras.")
+    parser.add_argument("--cpe-hours", type=float, help="Limitar el histórico de CPEs a las últimas N horas.")
+    parser.add_argument("--cpe-every", type=int, default=1, help="Muestrear los CPEs cada N muestras de AP.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--output-dir", default=".", help="Directorio donde crear las bases de datos.")
+    parser.add_argument("--force", action="store_true", help="Borrar las bases de datos existentes en el directorio.")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    sys.path.insert(0, PROJECT_DIR)
+    os.chdir(args.output_dir)
+    existing = [f for f in os.listdir(".") if f == "inventory.sqlite" or (f.startswith("stats_") and f.endswith(".sqlite"))]
+    if existing:
+        if not args.force:
+            print(f"Ya existen bases de datos en {os.getcwd()}: {', '.join(sorted(existing))}. Usa --force para reemplazarlas.")
+            sys.exit(1)
+        for name in existing:
+            os.remove(name)
+
+    print(f"Generando {args.aps} APs x {args.cpes_per_ap} CPEs, {args.days} días cada {args.interval} s "
+          f"en {os.getcwd()}...", flush=True)
+    summary = generate_fleet(
+        aps=args.aps, cpes_per_ap=args.cpes_per_ap, routers=args.routers, zones=args.zones, days=args.days,
+        interval=args.interval, cpe_hours=args.cpe_hours, cpe_every=args.cpe_every, seed=args.seed,
+        batch_size=args.batch_size,
+    )
+    for key, value in summary.items():
+        print(f"{key:16} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -200,6 +200,8 @@ if __name__ == "__main__":
     # --- PASO 3: Importar módulos de la App ---
     # --- CAMBIO: Ya no importamos 'Config', 'Server', ni 'fastapi_app' aquí ---
     from app.monitor import run_monitor
+    from app.core.flow_collector import run_flow_collector
+    from app.db.settings_db import get_setting
     from app.db.base import INVENTORY_DB_FILE 
     from app.db.init_db import setup_databases
     from app.auth import get_password_hash
@@ -218,6 +220,10 @@ if __name__ == "__main__":
     print("-" * 50)
     
     process_monitor = multiprocessing.Process(target=run_monitor, name="MonitorProcess")
+    # Colector NetFlow/IPFIX opcional (ajuste 'flow_collector_enabled'; se lee al arrancar)
+    process_flows = None
+    if get_setting('flow_collector_enabled') == '1':
+        process_flows = multiprocessing.Process(target=run_flow_collector, name="FlowCollectorProcess")
     
     # --- CAMBIO: Se elimina el argumento 'args' ---
     process_api = multiprocessing.Process(
@@ -229,8 +235,12 @@ if __name__ == "__main__":
     try:
         process_monitor.start()
         process_api.start()
+        if process_flows:
+            process_flows.start()
         process_monitor.join()
         process_api.join()
+        if process_flows:
+            process_flows.join()
 
     except KeyboardInterrupt:
         # (Sin cambios)
@@ -244,6 +254,10 @@ if __name__ == "__main__":
         if process_monitor.is_alive():
              process_monitor.terminate()
              process_monitor.join(timeout=5)
+
+        if process_flows and process_flows.is_alive():
+            process_flows.terminate()
+            process_flows.join(timeout=5)
             
         logging.info("Todos los servicios han sido detenidos. Adiós.")
         sys.exit(0)
\ No newline at end of file
@@ -0,0 +1,129 @@
+# replay_snapshots.py
+# Reingesta de capturas crudas de status.cgi (ajuste 'snapshot_capture_enabled').
+#
+#   python replay_snapshots.py --from 2026-10-01 --to 2026-10-07 --replace
+#   python replay_snapshots.py --parse-only          # solo mide lectura y decodificación
+#
+# Lee los segmentos captures/YYYY-MM-DD/*.ndjson.zst (o .gz) en orden y los
+# pasa por stats_db.save_snapshots_batch con su timestamp original, en lotes
+# de una transacción por DB mensual. Con --replace, antes de reingestar un
+# día lee sus segmentos y borra el histórico de cada AP capturado solo entre
+# su primer y su último snapshot, para reconstruirlo tras un error de parseo
+# o de almacenamiento sin tocar lo que la captura no cubre. Se ejecuta en el
+# directorio de las bases de datos.
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+ENV_FILE = ".env"
+DEFAULT_BATCH_SIZE = 500
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - [Replay] - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def iter_records(day_segments: List[str], hosts: Set[str],
+                 totals: Optional[Dict[str, int]] = None) -> Iterator[Tuple[datetime, str, dict]]:
+    """Registros válidos de los segmentos de un día (filtrados por --host); cuenta bytes e inválidos en `totals`."""
+    from app.core.snapshot_capture import iter_segment_lines, parse_record
+    for path in day_segments:
+        for line in iter_segment_lines(path):
+            if totals is not None:
+                totals["bytes"] += len(line)
+            try:
+                timestamp, host, data = parse_record(line)
+            except (ValueError, KeyError) as e:
+                if totals is not None:
+                    logging.warning(f"Registro inválido en {path}: {e}")
+                    totals["skipped"] += 1
+                continue
+            if hosts and host not in hosts:
+                continue
+            yield timestamp, host, data
+
+
+def captured_ranges(day_segments: List[str], hosts: Set[str]) -> Dict[str, Tuple[datetime, datetime]]:
+    """{host: (primer, último timestamp)} de lo capturado en los segmentos."""
+    ranges: Dict[str, Tuple[datetime, datetime]] = {}
+    for timestamp, host, _ in iter_records(day_segments, hosts):
+        first, last = ranges.get(host, (timestamp, timestamp))
+        ranges[host] = (min(first, timestamp), max(last, timestamp))
+    return ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reingesta de snapshots capturados de status.cgi.")
+    parser.add_argument("--captures-dir", default=None, help="Directorio de capturas (por defecto, 'captures').")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="Primer día (YYYY-MM-DD).")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Último día (YYYY-MM-DD), incluido.")
+    parser.add_argument("--host", action="append", help="Reingestar solo estos APs (repetible).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Snapshots por lote.")
+    parser.add_argument("--replace", action="store_true",
+                        help="Borrar antes el histórico de los APs capturados, solo en el intervalo capturado.")
+    parser.add_argument("--update-inventory", action="store_true",
+                        help="Actualizar también el inventario de CPEs (last_seen, IP, hostname).")
+    parser.add_argument("--parse-only", action="store_true",
+                        help="No escribir nada: solo leer y decodificar (benchmark de ingesta).")
+    args = parser.parse_args()
+
+    load_dotenv(ENV_FILE, encoding="utf-8")
+    from app.core.snapshot_capture import CAPTURE_DIR, list_segments
+    from app.db import stats_db
+    from app.db.init_db import setup_databases
+
+    captures_dir = args.captures_dir or CAPTURE_DIR
+    segments = list_segments(captures_dir, args.start, args.end)
+    if not segments:
+        print(f"No hay segmentos en {captures_dir} para el rango indicado.")
+        sys.exit(1)
+    if not args.parse_only:
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup_databases()
+
+    hosts = set(args.host or [])
+    segments_by_day: Dict[str, List[str]] = defaultdict(list)
+    for path in segments:
+        segments_by_day[os.path.basename(os.path.dirname(path))].append(path)
+
+    started = time.perf_counter()
+    totals = {"snapshots": 0, "skipped": 0, "bytes": 0, "deleted": 0}
+    for day, day_segments in sorted(segments_by_day.items()):
+        if args.replace and not args.parse_only:
+            # Primera pasada: qué APs y qué intervalo cubre la captura de este día
+            totals["deleted"] += stats_db.delete_history_for_hosts(captured_ranges(day_segments, hosts))
+
+        batch: List[Tuple[str, dict, datetime]] = []
+        for timestamp, host, data in iter_records(day_segments, hosts, totals):
+            totals["snapshots"] += 1
+            if args.parse_only:
+                continue
+            batch.append((host, data, timestamp))
+            if len(batch) >= args.batch_size:
+                stats_db.save_snapshots_batch(batch, update_inventory=args.update_inventory)
+                batch.clear()
+        if batch:
+            stats_db.save_snapshots_batch(batch, update_inventory=args.update_inventory)
+        elapsed = time.perf_counter() - started
+        logging.info(f"{day}: {len(day_segments)} segmentos; acumulado {totals['snapshots']} snapshots "
+                     f"({totals['snapshots'] / elapsed:.0f}/s)")
+
+    elapsed = time.perf_counter() - started
+    print(f"Snapshots: {totals['snapshots']}  inválidos: {totals['skipped']}  filas borradas: {totals['deleted']}")
+    print(f"Tiempo: {elapsed:.1f} s  ({totals['snapshots'] / elapsed:.0f} snapshots/s, "
+          f"{totals['bytes'] / elapsed / 1e6:.1f} MB/s de JSON)")
+
+
+if __name__ == "__main__":
+    main()
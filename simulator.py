@@ -0,0 +1,121 @@
+# simulator.py
+# Granja local de APs AirOS y Routers RouterOS simulados para pruebas de carga.
+#
+#   python simulator.py --aps 2000 --routers 50 --stations 25 --latency-ms 40 --register
+#
+# Con --register se dan de alta en el inventario (con el .env del proyecto),
+# así el monitor y la API trabajan contra los equipos simulados.
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.core.device_simulator import (
+    DeviceFarm, DeviceProfile, DEFAULT_AP_NETWORK, DEFAULT_ROUTER_NETWORK,
+    AIROS_PORT, ROUTEROS_API_SSL_PORT, SIM_USERNAME, SIM_PASSWORD
+)
+
+ENV_FILE = ".env"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - [Simulator] - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def raise_open_files_limit(required: int):
+    """Cada dispositivo abre un socket de escucha más sus conexiones: sube RLIMIT_NOFILE."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= required:
+        return
+    target = required if hard == resource.RLIM_INFINITY else min(required, hard)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    if target < required:
+        logging.warning(f"Límite de ficheros abiertos {target} < {required}; algunos dispositivos pueden fallar.")
+
+
+def register_devices(farm: DeviceFarm, zona_id: Optional[int]):
+    """Da de alta los dispositivos simulados en el inventario (los ya existentes se ignoran)."""
+    load_dotenv(ENV_FILE, encoding="utf-8")
+    from app.db.init_db import setup_databases
+    from app.db import aps_db, router_db
+
+    setup_databases()
+    created = 0
+    for ap in farm.aps:
+        if aps_db.get_ap_credentials(ap.host):
+            continue
+        aps_db.create_ap_in_db({
+            "host": ap.host, "username": SIM_USERNAME, "password": SIM_PASSWORD,
+            "zona_id": zona_id, "is_enabled": True, "monitor_interval": None,
+        })
+        created += 1
+    for rtr in farm.routers:
+        if router_db.get_router_by_host(rtr.address):
+            continue
+        router_db.create_router_in_db({
+            "host": rtr.address, "username": SIM_USERNAME, "password": SIM_PASSWORD,
+            "zona_id": zona_id, "api_port": rtr.port, "is_enabled": True,
+        })
+        # api_port == api_ssl_port es como el inventario marca un router aprovisionado
+        router_db.update_router_in_db(rtr.address, {"api_ssl_port": rtr.port})
+        created += 1
+    logging.info(f"{created} dispositivos simulados registrados en la zona {zona_id}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de dispositivos AirOS/RouterOS para µMonitor Pro.")
+    parser.add_argument("--aps", type=int, default=100, help="Número de APs simulados.")
+    parser.add_argument("--routers", type=int, default=10, help="Número de Routers simulados.")
+    parser.add_argument("--stations", type=int, default=20, help="CPEs por AP.")
+    parser.add_argument("--ppp-secrets", type=int, default=200, help="Secrets PPPoE por Router.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia añadida por respuesta.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probabilidad de cortar la conexión.")
+    parser.add_argument("--html-login-rate", type=float, default=0.0,
+                        help="Probabilidad de responder la página HTML de login en status.cgi.")
+    parser.add_argument("--auth-failure-rate", type=float, default=0.0, help="Probabilidad de 401 en /api/auth.")
+    parser.add_argument("--ap-network", default=DEFAULT_AP_NETWORK)
+    parser.add_argument("--router-network", default=DEFAULT_ROUTER_NETWORK)
+    parser.add_argument("--ap-port", type=int, default=AIROS_PORT)
+    parser.add_argument("--router-port", type=int, default=ROUTEROS_API_SSL_PORT)
+    parser.add_argument("--register", action="store_true", help="Registrar los dispositivos en el inventario.")
+    parser.add_argument("--zona-id", type=int, default=None, help="Zona para los dispositivos registrados.")
+    args = parser.parse_args()
+
+    profile_args = dict(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, failure_rate=args.failure_rate)
+    farm = DeviceFarm(
+        ap_count=args.aps, router_count=args.routers,
+        ap_profile=DeviceProfile(stations=args.stations, html_login_rate=args.html_login_rate,
+                                 auth_failure_rate=args.auth_failure_rate, **profile_args),
+        router_profile=DeviceProfile(stations=0, **profile_args),
+        ppp_secrets_per_router=args.ppp_secrets,
+        ap_network=args.ap_network, router_network=args.router_network,
+        ap_port=args.ap_port, router_port=args.router_port,
+    )
+    raise_open_files_limit((args.aps + args.routers) * 4 + 256)
+
+    async def _serve():
+        await farm.start()
+        if args.register:
+            register_devices(farm, args.zona_id)
+        print(f"Simulador listo: {args.aps} APs y {args.routers} Routers (usuario '{SIM_USERNAME}'). Ctrl+C para salir.")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        print("\nSimulador detenido.")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
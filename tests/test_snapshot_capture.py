@@ -0,0 +1,30 @@
+# tests/test_snapshot_capture.py
+
+import json
+from datetime import datetime
+
+from app.core.snapshot_capture import SnapshotCapture, list_segments, iter_segment_lines, parse_record
+
+
+def test_multiline_body_is_captured_as_one_record(tmp_path):
+    body = {"host": {"hostname": "AP-1", "uptime": 3600}, "wireless": {"sta": [{"mac": "AA:BB:CC:00:00:01"}]}}
+    raw = json.dumps(body, indent=2).encode()
+    assert b"\n" in raw
+    timestamp = datetime(2026, 10, 1, 12, 0, 0)
+
+    capture = SnapshotCapture(root=str(tmp_path))
+    capture.configure(True)
+    capture.append("10.0.0.1", raw, timestamp)
+    capture.append("10.0.0.2", body, timestamp)
+    capture.close()
+
+    records = [parse_record(line) for path in list_segments(str(tmp_path)) for line in iter_segment_lines(path)]
+    assert records == [(timestamp, "10.0.0.1", body), (timestamp, "10.0.0.2", body)]
+
+
+def test_invalid_multiline_body_is_not_captured(tmp_path):
+    capture = SnapshotCapture(root=str(tmp_path))
+    capture.configure(True)
+    capture.append("10.0.0.1", b'{"host":\n[1,', datetime(2026, 10, 1, 12, 0, 0))
+    capture.close()
+    assert [line for path in list_segments(str(tmp_path)) for line in iter_segment_lines(path)] == []
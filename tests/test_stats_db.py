@@ -0,0 +1,35 @@
+# tests/test_stats_db.py
+
+import sqlite3
+from datetime import datetime
+
+from app.db.init_db import setup_databases, _setup_stats_db
+from app.db.stats_db import delete_history_for_hosts, _stats_db_file_for
+
+
+def _timestamps(stats_db_file):
+    conn = sqlite3.connect(stats_db_file)
+    try:
+        return conn.execute("SELECT ap_host, timestamp FROM ap_stats_history ORDER BY ap_host, timestamp").fetchall()
+    finally:
+        conn.close()
+
+
+def test_delete_history_for_hosts_only_touches_captured_hosts_and_range(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    setup_databases()
+    times = [datetime(2026, 10, 1, hour, 0, 0) for hour in (8, 10, 12, 14)]
+    stats_db_file = _stats_db_file_for(times[0])
+    _setup_stats_db(stats_db_file)
+    conn = sqlite3.connect(stats_db_file)
+    conn.executemany("INSERT INTO ap_stats_history (timestamp, ap_host) VALUES (?, ?)",
+                     [(timestamp, host) for host in ("10.0.0.1", "10.0.0.2") for timestamp in times])
+    conn.commit()
+    conn.close()
+
+    deleted = delete_history_for_hosts({"10.0.0.1": (times[1], times[2])})
+
+    assert deleted == 2
+    remaining = _timestamps(stats_db_file)
+    assert [row for row in remaining if row[0] == "10.0.0.1"] == [("10.0.0.1", str(times[0])), ("10.0.0.1", str(times[3]))]
+    assert len([row for row in remaining if row[0] == "10.0.0.2"]) == 4
@@ -0,0 +1,44 @@
+# tests/test_telemetry.py
+
+from app.core.telemetry import TelemetryCache, encode_labels, format_sample
+
+
+def test_render_keeps_large_values_exact():
+    cache = TelemetryCache()
+    cache.update_router("10.0.0.1", {
+        "name": "rtr", "board-name": "CCR", "free-memory": "123456789",
+        "total-memory": 4294967296, "free-hdd-space": "12345678901234567", "cpu-load": "7.25",
+        "uptime": "12w3d4h5m6s",
+    })
+    lines = cache.render().splitlines()
+    labels = encode_labels(host="10.0.0.1", hostname="rtr", model="CCR")
+    assert f"umonitor_router_free_memory_bytes{labels} 123456789" in lines
+    assert f"umonitor_router_total_memory_bytes{labels} 4294967296" in lines
+    assert f"umonitor_router_free_hdd_bytes{labels} 12345678901234567" in lines
+    assert f"umonitor_router_uptime_seconds{labels} {12 * 604800 + 3 * 86400 + 4 * 3600 + 5 * 60 + 6}" in lines
+    assert f"umonitor_router_cpu_load_percent{labels} 7.25" in lines
+
+
+def test_render_exports_liveness_history():
+    from app.core.liveness import DeviceLiveness
+
+    device = DeviceLiveness("router")
+    for sample in (2.5, None, 3.5, None):
+        device.samples.append(sample)
+    cache = TelemetryCache()
+    cache.update_liveness({"10.0.0.1": (device.kind, device.summary())})
+    lines = cache.render().splitlines()
+    labels = encode_labels(kind="router", host="10.0.0.1")
+    assert f"umonitor_device_icmp_loss_percent{labels} 50.0" in lines
+    assert f"umonitor_device_icmp_rtt_avg_ms{labels} 3.0" in lines
+    # Sin respuesta en la última muestra no hay valor que exportar
+    assert not any(line.startswith("umonitor_device_icmp_rtt_last_ms{") for line in lines)
+
+
+def test_format_sample_non_finite_values():
+    assert format_sample(float("nan")) == "NaN"
+    assert format_sample(float("inf")) == "+Inf"
+    assert format_sample(float("-inf")) == "-Inf"
+    assert format_sample("nan") == "NaN"
+    assert format_sample(0.1) == "0.1"
+    assert format_sample(10 ** 18) == str(10 ** 18)